@@ -10,6 +10,7 @@ from .models import (
     RecipeIngredient, MenuItem, MenuItemIngredient, Order, OrderItem,
     Requisition, RequisitionItem  # ADD THIS
 )
+from . import costing
 
 # Inline Classes
 class RecipeIngredientInline(admin.TabularInline):
@@ -79,6 +80,11 @@ class InventoryItemAdmin(admin.ModelAdmin):
             return ['created_at']
         return []
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'unit_price' in form.changed_data:
+            costing.propagate_price_change([obj.pk])
+
 
 @admin.register(InventoryHistory)
 class InventoryHistoryAdmin(admin.ModelAdmin):
@@ -138,7 +144,7 @@ class MenuItemIngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_number', 'customer', 'table', 'status', 'total_price', 'timestamp', 'time_taken']
+    list_display = ['order_number', 'customer', 'table', 'status', 'total_price', 'cogs_total', 'timestamp', 'time_taken']
     list_filter = ['status', 'timestamp']
     search_fields = ['order_number', 'customer']
     ordering = ['-timestamp']
@@ -146,8 +152,8 @@ class OrderAdmin(admin.ModelAdmin):
 
     def get_readonly_fields(self, request, obj=None):
         if obj:
-            return ['order_number', 'total_price', 'timestamp', 'time_taken']
-        return ['order_number', 'total_price', 'time_taken']
+            return ['order_number', 'total_price', 'cogs_total', 'timestamp', 'time_taken']
+        return ['order_number', 'total_price', 'cogs_total', 'time_taken']
 
     def time_taken(self, obj):
         return obj.time_taken()
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        # register the rollup, dashboard cache, menu sync, catalog,
+        # availability, event stream and menu engineering cache receivers
+        import myapp.rollups
+        import myapp.dashboard
+        import myapp.menu_sync
+        import myapp.catalog
+        import myapp.availability
+        import myapp.events
+        import myapp.menu_engineering
@@ -0,0 +1,162 @@
+import hashlib
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import catalog
+from .batching import CommitBatch
+from .models import (
+    InventoryItem, MenuItem, MenuItemAvailability, MenuItemIngredient, Recipe,
+    RecipeIngredient,
+)
+
+
+# ----------------------------------------------------------------------
+#  COMPUTATION
+# ----------------------------------------------------------------------
+def compute_portions(menu_item_ids):
+    """Return {menu_item_id: portions} from current stock (None = no ingredients).
+
+    Ingredients are expanded like ordering.ingredient_usage(): recipe
+    ingredients plus direct menu item ingredients, summed per item.
+    """
+    menu = dict(MenuItem.objects.filter(pk__in=menu_item_ids).values_list('id', 'recipe_id'))
+    needs = {menu_id: defaultdict(Decimal) for menu_id in menu}
+
+    by_recipe = defaultdict(list)
+    for menu_id, recipe_id in menu.items():
+        if recipe_id:
+            by_recipe[recipe_id].append(menu_id)
+    for recipe_id, inv_id, qty in RecipeIngredient.objects.filter(recipe_id__in=by_recipe).values_list(
+        'recipe_id', 'inventory_item_id', 'quantity'
+    ):
+        for menu_id in by_recipe[recipe_id]:
+            needs[menu_id][inv_id] += qty
+    for menu_id, inv_id, qty in MenuItemIngredient.objects.filter(menu_item_id__in=menu).values_list(
+        'menu_item_id', 'inventory_item_id', 'quantity_needed'
+    ):
+        needs[menu_id][inv_id] += qty
+
+    inv_ids = {inv_id for per_item in needs.values() for inv_id in per_item}
+    stock = dict(InventoryItem.objects.filter(pk__in=inv_ids).values_list('id', 'quantity'))
+
+    portions = {}
+    for menu_id, per_item in needs.items():
+        counts = [int(max(stock.get(inv_id, 0), 0) // qty) for inv_id, qty in per_item.items() if qty > 0]
+        portions[menu_id] = min(counts) if counts else None
+    return portions
+
+
+def menu_items_using(inventory_item_ids):
+    """Ids of menu items that consume any of ``inventory_item_ids``."""
+    ids = set(
+        MenuItemIngredient.objects.filter(inventory_item_id__in=inventory_item_ids)
+        .values_list('menu_item_id', flat=True)
+    )
+    ids.update(
+        MenuItem.objects.filter(recipe__ingredients__inventory_item_id__in=inventory_item_ids)
+        .values_list('id', flat=True)
+    )
+    return ids
+
+
+def refresh(menu_item_ids=None):
+    """Recompute the index rows of ``menu_item_ids`` (all menu items if None).
+
+    Only rows whose portion count changed are written, and the POS catalog
+    is invalidated only when something did change. Returns that count.
+    """
+    if menu_item_ids is None:
+        menu_item_ids = MenuItem.objects.values_list('id', flat=True)
+    portions = compute_portions(menu_item_ids)
+    if not portions:
+        return 0
+
+    with transaction.atomic():
+        current = dict(
+            MenuItemAvailability.objects.filter(menu_item_id__in=portions)
+            .values_list('menu_item_id', 'portions')
+        )
+        changed = [
+            MenuItemAvailability(menu_item_id=menu_id, portions=value)
+            for menu_id, value in portions.items()
+            if menu_id not in current or current[menu_id] != value
+        ]
+        MenuItemAvailability.objects.bulk_create(
+            changed, update_conflicts=True,
+            unique_fields=['menu_item'], update_fields=['portions', 'updated_at'],
+        )
+        if changed:
+            catalog.mark_stale()
+    return len(changed)
+
+
+# ----------------------------------------------------------------------
+#  READING
+# ----------------------------------------------------------------------
+def snapshot():
+    """Return {menu_item_id: portions} for every indexed menu item."""
+    return dict(MenuItemAvailability.objects.values_list('menu_item_id', 'portions'))
+
+
+def etag():
+    """Cheap validator: only changes when index rows are written or deleted."""
+    state = MenuItemAvailability.objects.aggregate(count=Count('pk'), last=Max('updated_at'))
+    raw = f"{state['count']}:{state['last'].isoformat() if state['last'] else ''}"
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+# ----------------------------------------------------------------------
+#  INCREMENTAL UPDATES (once per transaction, after commit)
+# ----------------------------------------------------------------------
+_menu_items = CommitBatch(refresh)
+_recipes = CommitBatch(
+    lambda recipe_ids: refresh(MenuItem.objects.filter(recipe_id__in=recipe_ids).values_list('id', flat=True))
+)
+_stock = CommitBatch(lambda inv_ids: refresh(menu_items_using(inv_ids)))
+
+
+def menu_items_changed(menu_item_ids):
+    """Queue ``menu_item_ids`` for recomputation; for bulk writes that skip signals."""
+    for pk in menu_item_ids:
+        _menu_items.add(pk)
+
+
+def stock_changed(inventory_item_ids):
+    """Queue the menu items using ``inventory_item_ids``; for set-based stock updates."""
+    for pk in inventory_item_ids:
+        _stock.add(pk)
+
+
+@receiver(post_save, sender=InventoryItem)
+def inventory_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _stock.add(instance.pk)
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _menu_items.add(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=MenuItemIngredient)
+def menu_item_ingredient_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _menu_items.add(instance.menu_item_id)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _recipes.add(instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # menu items are detached (SET_NULL) by a queryset update without signals
+    menu_items_changed(MenuItem.objects.filter(recipe=instance).values_list('id', flat=True))
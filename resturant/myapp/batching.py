@@ -0,0 +1,77 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class CommitBatch:
+    """Collect ids from per-row signals and handle them once on commit.
+
+    ``add()`` records an id. The first id added in a transaction registers
+    one transaction.on_commit callback and later ids just join its set, so
+    a transaction touching the same rows many times triggers one
+    ``handler(ids)`` call with the distinct ids. Ids added inside a
+    savepoint get their own set and callback (one more handler call if it
+    is released); if the savepoint rolls back, Django discards that
+    callback and the ids go with it. Outside a transaction the handler
+    runs immediately. Ids added inside ``suppressed()`` are dropped; the
+    caller then owns keeping the derived data right.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._local = threading.local()
+
+    def _state(self):
+        if not hasattr(self._local, 'pending'):
+            # savepoint ids at registration -> (ids, on_commit callback)
+            self._local.pending = {}
+            self._local.suppressed = 0
+        return self._local
+
+    def add(self, pk):
+        state = self._state()
+        if state.suppressed or pk is None:
+            return
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.handler({pk})
+            return
+
+        # atomic(savepoint=False) blocks (e.g. in Model.delete()) push None
+        # and cannot roll back on their own, so they share their parent's set
+        key = tuple(sid for sid in connection.savepoint_ids if sid)
+        entry = state.pending.get(key)
+        if entry is None or not self._scheduled(connection, entry[1]):
+            # Drop sets whose callback was discarded by a rollback
+            state.pending = {
+                k: e for k, e in state.pending.items() if self._scheduled(connection, e[1])
+            }
+            ids = set()
+
+            def callback():
+                self._flush(key, ids, callback)
+
+            entry = state.pending[key] = (ids, callback)
+            transaction.on_commit(callback)
+        entry[0].add(pk)
+
+    @staticmethod
+    def _scheduled(connection, callback):
+        return any(func is callback for _, func, _ in connection.run_on_commit)
+
+    def _flush(self, key, ids, callback):
+        state = self._state()
+        if key in state.pending and state.pending[key][1] is callback:
+            del state.pending[key]
+        if ids:
+            self.handler(ids)
+
+    @contextmanager
+    def suppressed(self):
+        state = self._state()
+        state.suppressed += 1
+        try:
+            yield
+        finally:
+            state.suppressed -= 1
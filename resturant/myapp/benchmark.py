@@ -0,0 +1,176 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from .metrics import record_queries
+from .models import DTable, MenuItem, Order
+
+
+# ----------------------------------------------------------------------
+#  SCENARIOS
+# ----------------------------------------------------------------------
+# Each scenario takes (client, rng, fixtures) and returns a response; the
+# requests go through the full middleware stack in-process.
+def pos_order(client, rng, fixtures):
+    cart = [
+        {'id': menu_id, 'quantity': rng.randint(1, 3)}
+        for menu_id in rng.sample(fixtures['menu_ids'], min(rng.randint(1, 3), len(fixtures['menu_ids'])))
+    ]
+    return client.post(reverse('pos'), {
+        'submit-order': '1',
+        'customer': f'Bench {rng.randrange(1000)}',
+        'table': rng.choice(fixtures['table_ids']),
+        'order_items': json.dumps(cart),
+    })
+
+
+def pos_view(client, rng, fixtures):
+    return client.get(reverse('pos'))
+
+
+def orders_view(client, rng, fixtures):
+    return client.get(reverse('orders'))
+
+
+def dashboard_view(client, rng, fixtures):
+    return client.get(reverse('dashboard'))
+
+
+def inventory_export(client, rng, fixtures):
+    return client.get(reverse('inventory_history'), {'export': 'csv'})
+
+
+SCENARIOS = {
+    'pos_order': pos_order,
+    'pos_view': pos_view,
+    'orders_view': orders_view,
+    'dashboard': dashboard_view,
+    'inventory_export': inventory_export,
+}
+
+
+def load_fixtures():
+    fixtures = {
+        'menu_ids': list(MenuItem.objects.values_list('id', flat=True)),
+        'table_ids': list(DTable.objects.values_list('id', flat=True)),
+    }
+    if not fixtures['menu_ids'] or not fixtures['table_ids']:
+        raise ValueError('The benchmark needs menu items and tables; generate data first.')
+    return fixtures
+
+
+# ----------------------------------------------------------------------
+#  RUNNER
+# ----------------------------------------------------------------------
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def run_scenario(name, user, requests=100, concurrency=1, warmup=5, seed=0):
+    """Run ``requests`` calls of scenario ``name`` over ``concurrency`` threads.
+
+    Each thread has its own logged-in Client and database connection.
+    Latency covers the whole response, including streamed bodies.
+    Returns a dict of latency percentiles (ms), queries per request,
+    throughput (requests/s) and error count.
+    """
+    scenario = SCENARIOS[name]
+    fixtures = load_fixtures()
+    lock = threading.Lock()
+    remaining = [requests]
+    samples = []
+    errors = []
+
+    def call(client, rng):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = scenario(client, rng, fixtures)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        elapsed = time.perf_counter() - start
+        return elapsed, recorder.count, response.status_code
+
+    def worker(index):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        rng = random.Random(f'{seed}:{name}:{index}')
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                try:
+                    elapsed, queries, status = call(client, rng)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                with lock:
+                    samples.append((elapsed, queries))
+                    if status >= 500:
+                        errors.append(f'HTTP {status}')
+        finally:
+            connection.close()
+
+    warm = Client(raise_request_exception=False)
+    warm.force_login(user)
+    warm_rng = random.Random(f'{seed}:{name}:warmup')
+    for _ in range(warmup):
+        call(warm, warm_rng)
+
+    orders_before = Order.objects.count()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[1] for s in samples]
+    result = {
+        'requests': len(samples),
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        'queries_avg': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+    }
+    if name == 'pos_order':
+        result['orders_placed'] = Order.objects.count() - orders_before
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def compare(current, baseline, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'queries_avg', 'throughput_rps')):
+    """Return {scenario: {metric: percent change}} against a baseline report."""
+    changes = {}
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((result[metric] - before[metric]) / before[metric] * 100, 1)
+            for metric in metrics if before.get(metric)
+        }
+    return changes
+
+
+def environment():
+    db = connections['default']
+    return {'vendor': db.vendor, 'database': str(db.settings_dict.get('NAME'))}
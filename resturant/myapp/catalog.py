@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .batching import CommitBatch
+from .models import MenuItem, MenuItemAvailability
+
+VERSION_KEY = 'catalog:version'
+
+
+# ----------------------------------------------------------------------
+#  SNAPSHOT
+# ----------------------------------------------------------------------
+def build_catalog():
+    """Menu items with price, category and portions makeable from current stock.
+
+    ``available`` comes from the availability index (myapp/availability.py)
+    and is None for items without ingredients or not indexed yet.
+    """
+    portions = dict(MenuItemAvailability.objects.values_list('menu_item_id', 'portions'))
+    items = [
+        {
+            'id': mi['id'],
+            'name': mi['name'],
+            'category': mi['category'],
+            'price': float(mi['price']),
+            'available': portions.get(mi['id']),
+        }
+        for mi in MenuItem.objects.order_by('category', 'name').values('id', 'name', 'category', 'price')
+    ]
+    return {'items': items}
+
+
+# ----------------------------------------------------------------------
+#  CACHE
+# ----------------------------------------------------------------------
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Mark the cached catalog stale; the next request rebuilds it."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def get_catalog():
+    """Return ``{'data', 'body', 'etag'}`` for the current catalog version.
+
+    The ETag is a hash of the JSON body, so it stays valid across cache
+    flushes and version counter resets.
+    """
+    key = f'catalog:{current_version()}'
+    entry = cache.get(key)
+    if entry is None:
+        data = build_catalog()
+        body = json.dumps(data, separators=(',', ':'))
+        entry = {'data': data, 'body': body, 'etag': f'"{hashlib.md5(body.encode()).hexdigest()}"'}
+        cache.set(key, entry, getattr(settings, 'POS_CATALOG_CACHE_TIMEOUT', 600))
+    return entry
+
+
+# ----------------------------------------------------------------------
+#  INVALIDATION (once per transaction, after commit)
+# ----------------------------------------------------------------------
+_changes = CommitBatch(lambda _: invalidate())
+
+
+def mark_stale():
+    """Invalidate once the current transaction commits, at most once per transaction."""
+    _changes.add(VERSION_KEY)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def catalog_source_changed(sender, **kwargs):
+    # Queryset updates and bulk writes bypass this; their callers call
+    # mark_stale(), as does availability.refresh() when portions change.
+    mark_stale()
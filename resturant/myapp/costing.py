@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Round
+
+from . import catalog, menu_engineering
+from .models import InventoryItem, MenuItem, Recipe, RecipeIngredient
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+# ----------------------------------------------------------------------
+#  SQL EXPRESSIONS
+# ----------------------------------------------------------------------
+def recipe_cost():
+    """Sum of quantity * unit_price over the outer recipe's ingredients."""
+    total = (
+        RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(total=Sum(F('quantity') * F('unit_price'), output_field=MONEY))
+        .values('total')
+    )
+    return Coalesce(Subquery(total, output_field=MONEY), Value(Decimal('0.00')), output_field=MONEY)
+
+
+def selling_price(cost):
+    # percentage * 0.01 rather than / 100: SQLite would divide integers
+    multiplier = Value(Decimal('1.0')) + F('profit_percentage') * Value(Decimal('0.01'))
+    return Round(ExpressionWrapper(cost * multiplier, output_field=MONEY), 2)
+
+
+# ----------------------------------------------------------------------
+#  RECOMPUTATION
+# ----------------------------------------------------------------------
+def recost_recipes(recipe_ids, reprice_menu=None):
+    """Recompute total_cost / selling_price for ``recipe_ids`` in one UPDATE.
+
+    Linked menu items are repriced to the new selling price as well unless
+    ``reprice_menu`` (default: settings.RECIPE_REPRICE_MENU_ITEMS) is false.
+    Returns the number of recipes updated.
+    """
+    if reprice_menu is None:
+        reprice_menu = settings.RECIPE_REPRICE_MENU_ITEMS
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+
+    with transaction.atomic():
+        cost = recipe_cost()
+        updated = Recipe.objects.filter(pk__in=recipe_ids).update(
+            total_cost=cost, selling_price=selling_price(cost)
+        )
+        if reprice_menu:
+            # Same floor the recipe -> menu item signal applies
+            price = Subquery(Recipe.objects.filter(pk=OuterRef('recipe_id')).values('selling_price')[:1])
+            MenuItem.objects.filter(recipe_id__in=recipe_ids).update(
+                price=Greatest(price, Value(Decimal('0.01')), output_field=MONEY)
+            )
+        catalog.mark_stale()
+        menu_engineering.mark_stale()
+    return updated
+
+
+def propagate_price_change(item_ids, reprice_menu=None):
+    """Carry new InventoryItem.unit_price values into every recipe using them.
+
+    The ingredient -> recipe lookup goes through the indexed
+    RecipeIngredient.inventory_item foreign key, so only the affected
+    recipes are touched no matter how large the menu is.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return 0
+
+    with transaction.atomic():
+        ingredients = RecipeIngredient.objects.filter(inventory_item_id__in=item_ids)
+        ingredients.update(unit_price=Subquery(
+            InventoryItem.objects.filter(pk=OuterRef('inventory_item_id')).values('unit_price')[:1]
+        ))
+        recipe_ids = ingredients.values_list('recipe_id', flat=True).distinct()
+        return recost_recipes(recipe_ids, reprice_menu=reprice_menu)
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import DailyInventoryMovement, DailyMenuItemSales, DailySales, InventoryHistory
+from .signals import order_status_changed
+
+VERSION_KEY = 'dashboard:version'
+
+
+# ----------------------------------------------------------------------
+#  PAYLOAD
+# ----------------------------------------------------------------------
+def build_context(today):
+    """Compute the dashboard template context for the month containing ``today``.
+
+    ``today`` is a business date (rollups.business_date), like the rollup rows.
+    """
+    current_year = today.year
+    current_month = today.month
+    current_month_name = today.strftime('%B')
+
+    # All figures come from the daily rollups (see myapp/rollups.py),
+    # a few hundred rows per year instead of every order and stock movement.
+    # ---------- CURRENT MONTH ----------
+    month_sales = DailySales.objects.filter(
+        date__year=current_year,
+        date__month=current_month
+    ).aggregate(orders=Sum('orders'), revenue=Sum('revenue'))
+    current_orders = month_sales['orders'] or 0
+    current_revenue = month_sales['revenue'] or Decimal('0.00')
+
+    current_expense = DailyInventoryMovement.objects.filter(
+        change_type='Added',
+        date__year=current_year,
+        date__month=current_month
+    ).aggregate(total=Sum('value'))['total'] or Decimal('0.00')
+
+    current_profit = current_revenue - current_expense
+
+    # ---------- LAST 3 YEARS ----------
+    years = [current_year - 2, current_year - 1, current_year]
+
+    revenue_data = {y: [0.0] * 12 for y in years}
+    orders_data  = {y: [0]   * 12 for y in years}
+    expense_data = {y: [0.0] * 12 for y in years}
+
+    # Revenue & Orders
+    sales = (
+        DailySales.objects.filter(date__year__in=years)
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('year', 'month')
+        .annotate(revenue=Sum('revenue'), count=Sum('orders'))
+        .order_by('year', 'month')
+    )
+    for s in sales:
+        y, m = s['year'], s['month'] - 1
+        revenue_data[y][m] = float(s['revenue'] or 0)
+        orders_data[y][m]  = s['count']
+
+    # Expense
+    expenses = (
+        DailyInventoryMovement.objects.filter(change_type='Added', date__year__in=years)
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('year', 'month')
+        .annotate(cost=Sum('value'))
+        .order_by('year', 'month')
+    )
+    for e in expenses:
+        y, m = e['year'], e['month'] - 1
+        expense_data[y][m] = float(e['cost'] or 0)
+
+    # ---------- TOP 5 MENU ITEMS (current year) ----------
+    top_items = (
+        DailyMenuItemSales.objects.filter(date__year=current_year)
+        .values('menu_item__name')
+        .annotate(total_qty=Sum('quantity'), total_sales=Sum('revenue'))
+        .order_by('-total_sales')[:5]
+    )
+    top_items_list = [
+        {
+            'name': i['menu_item__name'],
+            'quantity': i['total_qty'],
+            'sales': float(i['total_sales'] or 0)
+        }
+        for i in top_items
+    ]
+
+    # ---------- CONTEXT ----------
+    return {
+        'current_year': current_year,
+        'current_month': current_month_name,
+        'current_revenue': current_revenue,
+        'current_orders': current_orders,
+        'current_expense': current_expense,
+        'current_profit': current_profit,
+        'years': json.dumps(years),
+        'revenue_data': json.dumps(revenue_data),
+        'orders_data': json.dumps(orders_data),
+        'expense_data': json.dumps(expense_data),
+        'top_items': top_items_list,
+    }
+
+
+# ----------------------------------------------------------------------
+#  CACHE
+# ----------------------------------------------------------------------
+def _timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Mark every cached dashboard payload stale."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _refresh(key, today, version):
+    context = build_context(today)
+    cache.set(key, {'version': version, 'built_at': time.time(), 'context': context}, None)
+    return context
+
+
+def _refresh_in_background(key, today, version):
+    try:
+        _refresh(key, today, version)
+    finally:
+        cache.delete(f'{key}:refreshing')
+        connection.close()
+
+
+def get_context(today):
+    """Return the dashboard context for ``today``'s month, from cache when possible.
+
+    Entries are tagged with the invalidation version and a build time.
+    A fresh entry is served directly. A stale one is served as-is while
+    a single background thread rebuilds it when
+    DASHBOARD_CACHE_STALE_WHILE_REVALIDATE is on; otherwise the request
+    rebuilds it.
+    """
+    key = f'dashboard:{today.year}-{today.month:02d}'
+    version = current_version()
+    entry = cache.get(key)
+    if entry is None:
+        return _refresh(key, today, version)
+
+    fresh = entry['version'] == version and time.time() - entry['built_at'] < _timeout()
+    if fresh:
+        return entry['context']
+    if getattr(settings, 'DASHBOARD_CACHE_STALE_WHILE_REVALIDATE', True):
+        if cache.add(f'{key}:refreshing', 1, 60):
+            threading.Thread(
+                target=_refresh_in_background, args=(key, today, version), daemon=True
+            ).start()
+        return entry['context']
+    return _refresh(key, today, version)
+
+
+# ----------------------------------------------------------------------
+#  INVALIDATION (after commit, so a rebuild never caches pre-commit data)
+# ----------------------------------------------------------------------
+@receiver(order_status_changed)
+def order_ready_invalidates_dashboard(sender, status, **kwargs):
+    if status == 'Ready':
+        transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=InventoryHistory)
+def stock_added_invalidates_dashboard(sender, instance, created, **kwargs):
+    if created and instance.change_type == 'Added':
+        transaction.on_commit(invalidate)
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import DTable
+from .signals import order_status_changed
+
+TOPICS = {'orders', 'tables'}
+
+# Status an order moved to -> event name sent to screens
+ORDER_EVENTS = {'Pending': 'created', 'Started': 'started', 'Ready': 'ready', 'Canceled': 'cancelled'}
+
+
+# ----------------------------------------------------------------------
+#  BROKERS
+# ----------------------------------------------------------------------
+class Subscription:
+    def __init__(self, topics, maxsize=1000):
+        self.topics = set(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, event):
+        # runs on the subscriber's loop; a stalled screen just misses events
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class LocalBroker:
+    """In-process fan-out to the event streams served by this process.
+
+    Enough for a single ASGI worker. With several workers or nodes, use a
+    backend that relays between processes, such as PostgresBroker.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, topic, data):
+        self.deliver({'topic': topic, 'data': data})
+
+    def deliver(self, event):
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if event['topic'] in s.topics]
+        for sub in subscriptions:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # event loop already closed
+                self.unsubscribe(sub)
+
+    def subscribe(self, topics):
+        sub = Subscription(topics)
+        with self._lock:
+            self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.discard(sub)
+
+
+class PostgresBroker(LocalBroker):
+    """Relays events between processes with PostgreSQL LISTEN/NOTIFY.
+
+    publish() issues pg_notify on the Django connection; each process
+    keeps one listening connection (opened by its first subscriber) and
+    fans received events out locally.
+    """
+
+    channel = 'kitchen_events'
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, topic, data):
+        payload = json.dumps({'topic': topic, 'data': data}, cls=DjangoJSONEncoder)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self, topics):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+        return super().subscribe(topics)
+
+    def _listen(self):
+        import psycopg2
+
+        db = settings.DATABASES['default']
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(
+                    dbname=db['NAME'], user=db['USER'], password=db['PASSWORD'],
+                    host=db['HOST'], port=db['PORT'],
+                )
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.deliver(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                # database restart or network drop: reconnect shortly
+                if conn is not None:
+                    conn.close()
+                time.sleep(5)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'EVENT_BROKER', 'myapp.events.LocalBroker'))()
+    return _broker
+
+
+def publish(topic, data):
+    """Send an event to subscribed screens once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(topic, data))
+
+
+# ----------------------------------------------------------------------
+#  SERVER-SENT EVENTS
+# ----------------------------------------------------------------------
+async def stream(topics):
+    """Async generator of SSE frames for ``topics``; needs an ASGI server."""
+    broker = get_broker()
+    sub = broker.subscribe(topics)
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # keeps proxies from closing the connection and notices gone clients
+                yield ': keepalive\n\n'
+                continue
+            data = json.dumps(event['data'], cls=DjangoJSONEncoder)
+            yield f"event: {event['topic']}\ndata: {data}\n\n"
+    finally:
+        broker.unsubscribe(sub)
+
+
+# ----------------------------------------------------------------------
+#  EVENT SOURCES
+# ----------------------------------------------------------------------
+def table_changed(table):
+    publish('tables', {'id': table.pk, 'name': table.name, 'is_occupied': table.is_occupied})
+
+
+@receiver(order_status_changed)
+def order_event(sender, order_ids, status, **kwargs):
+    publish('orders', {'event': ORDER_EVENTS.get(status, status.lower()), 'status': status, 'order_ids': list(order_ids)})
+
+
+@receiver(post_save, sender=DTable)
+def table_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        table_changed(instance)
@@ -0,0 +1,91 @@
+import csv
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_MAX_ROWS = 50000
+
+HISTORY_COLUMNS = ['Date', 'Item', 'Qty', 'Units', 'Price', 'Value', 'Type', 'Reason']
+
+
+# ----------------------------------------------------------------------
+#  ROW SOURCES
+# ----------------------------------------------------------------------
+def history_rows(queryset):
+    """Yield InventoryHistory export rows without materializing the queryset.
+
+    Only the exported columns are selected and the database cursor is read
+    in chunks, so memory stays flat regardless of how many rows match.
+    """
+    rows = queryset.values_list(
+        'timestamp', 'item__name', 'quantity', 'units', 'unit_price', 'change_type', 'reason'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for timestamp, name, quantity, units, unit_price, change_type, reason in rows:
+        yield [
+            timezone.localtime(timestamp).strftime('%Y-%m-%d %H:%M'),
+            name,
+            float(quantity),
+            units,
+            float(unit_price),
+            float(quantity * unit_price),
+            change_type,
+            reason or 'Manual',
+        ]
+
+
+# ----------------------------------------------------------------------
+#  RESPONSES
+# ----------------------------------------------------------------------
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    """Build an .xlsx with a write-only workbook and send it once it is complete.
+
+    Unlike stream_csv this does not stream: an .xlsx is a zip archive whose
+    directory is only written at the end, so nothing can be sent until every
+    row has been written. Write-only mode keeps memory flat by flushing rows
+    to a temporary file, but the client waits for the whole export. Callers
+    should check xlsx_allowed() and fall back to CSV for large exports.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def xlsx_allowed(row_count):
+    """True if ``row_count`` rows are few enough to build as .xlsx before sending."""
+    return row_count <= getattr(settings, 'XLSX_EXPORT_MAX_ROWS', XLSX_MAX_ROWS)
@@ -0,0 +1,156 @@
+import math
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import DailyInventoryMovement, InventoryItem, ReorderSuggestion, RequisitionItem
+from .rollups import business_date
+
+CENT = Decimal('0.01')
+
+
+# ----------------------------------------------------------------------
+#  USAGE (one query over the daily inventory movement rollups)
+# ----------------------------------------------------------------------
+def usage_matrix(item_ids, start, days):
+    """Daily 'Used' quantity per item as a float array of shape (items, days).
+
+    Row i is ``item_ids[i]``; column j is business date ``start + j``.
+    Days without usage are 0.
+    """
+    item_ids = np.asarray(item_ids)
+    usage = np.zeros((len(item_ids), days))
+    rows = DailyInventoryMovement.objects.filter(
+        change_type='Used', item_id__in=item_ids.tolist(),
+        date__gte=start, date__lt=start + timedelta(days=days),
+    ).values_list('item_id', 'date', 'quantity')
+    for item_id, date, quantity in rows:
+        usage[np.searchsorted(item_ids, item_id), (date - start).days] = float(quantity)
+    return usage
+
+
+# ----------------------------------------------------------------------
+#  MODEL (every item in one pass)
+# ----------------------------------------------------------------------
+def forecast(usage, first_weekday, cover_days, alpha, safety_factor):
+    """Day-of-week seasonal exponential smoothing for every row of ``usage``.
+
+    Weekday indices are each weekday's mean usage over the overall mean.
+    The deseasonalised series is smoothed with an exponentially weighted
+    average (weights alpha * (1 - alpha)^age, normalised), giving a level
+    per item; forecast day d is level x index[weekday(d)]. Safety stock is
+    ``safety_factor`` standard deviations of deseasonalised daily usage,
+    scaled by sqrt(cover_days).
+
+    Returns (level, forecast over the cover period, safety stock), each an
+    array with one value per item.
+    """
+    items, days = usage.shape
+    weekdays = (first_weekday + np.arange(days)) % 7
+    one_hot = np.eye(7)[weekdays]                           # (days, 7)
+    seen = one_hot.sum(axis=0)
+    weekday_mean = np.divide(usage @ one_hot, seen, out=np.zeros((items, 7)), where=seen > 0)
+    mean = usage.mean(axis=1, keepdims=True)
+    index = np.divide(weekday_mean, mean, out=np.ones((items, 7)), where=mean > 0)
+    index[:, seen == 0] = 1.0
+
+    season = index[:, weekdays]
+    deseasonalised = np.divide(usage, season, out=np.zeros_like(usage), where=season > 0)
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1)
+    level = deseasonalised @ (weights / weights.sum())
+
+    ahead = (first_weekday + days + np.arange(cover_days)) % 7
+    expected = level * index[:, ahead].sum(axis=1)
+    spread = deseasonalised.std(axis=1, ddof=1) if days > 1 else np.zeros(items)
+    safety = safety_factor * spread * math.sqrt(cover_days)
+    return level, expected, safety
+
+
+def _decimals(values, places='0.01', rounding=ROUND_CEILING):
+    return [Decimal(repr(float(v))).quantize(Decimal(places), rounding=rounding) for v in values]
+
+
+def refresh(history_days=None, cover_days=None):
+    """Recompute the reorder suggestion of every inventory item; returns the item count.
+
+    Usage is read for the ``history_days`` complete business days before
+    today. Par level = forecast usage over ``cover_days`` + safety stock,
+    rounded up to the cent. Run nightly (forecast_demand) so the
+    requisition page only reads the stored rows.
+    """
+    history_days = history_days or getattr(settings, 'FORECAST_HISTORY_DAYS', 56)
+    cover_days = cover_days or getattr(settings, 'REORDER_COVER_DAYS', 7)
+    item_ids = np.array(sorted(InventoryItem.objects.values_list('id', flat=True)), dtype=np.int64)
+    if not len(item_ids):
+        return 0
+
+    start = business_date(timezone.now()) - timedelta(days=history_days)
+    level, expected, safety = forecast(
+        usage_matrix(item_ids, start, history_days), start.weekday(), cover_days,
+        alpha=getattr(settings, 'FORECAST_SMOOTHING', 0.3),
+        safety_factor=getattr(settings, 'REORDER_SAFETY_FACTOR', 1.65),
+    )
+    rows = [
+        ReorderSuggestion(
+            item_id=int(item_id), daily_usage=daily, forecast_usage=total,
+            safety_stock=buffer, par_level=total + buffer,
+        )
+        for item_id, daily, total, buffer in zip(
+            item_ids, _decimals(level, '0.001'), _decimals(expected), _decimals(safety),
+        )
+    ]
+    with transaction.atomic():
+        ReorderSuggestion.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['item'],
+            update_fields=['daily_usage', 'forecast_usage', 'safety_stock', 'par_level', 'computed_at'],
+        )
+    return len(rows)
+
+
+# ----------------------------------------------------------------------
+#  READING
+# ----------------------------------------------------------------------
+def suggestions(item_ids=None):
+    """Stored suggestions whose par level is above current stock, largest value first.
+
+    Each row carries ``shortfall`` (par level - quantity on hand), its
+    ``value`` at the current unit price and the inventory item; one query.
+    """
+    qs = (
+        ReorderSuggestion.objects.select_related('item')
+        .annotate(shortfall=F('par_level') - F('item__quantity'))
+        .annotate(value=F('shortfall') * F('item__unit_price'))
+        .filter(shortfall__gt=0)
+    )
+    if item_ids is not None:
+        qs = qs.filter(item_id__in=item_ids)
+    return qs.order_by('-value', 'item__name')
+
+
+def prefill(requisition, item_ids=None):
+    """Add a line for each suggestion (optionally only ``item_ids``) to a draft requisition.
+
+    Items already on the draft (matched by name) are skipped. Quantities
+    are the current shortfall at the item's current unit price. Returns
+    the added RequisitionItems.
+    """
+    existing = set(requisition.items.values_list('item_name', flat=True))
+    added = []
+    for s in suggestions(item_ids):
+        if s.item.name in existing:
+            continue
+        quantity = s.shortfall.quantize(CENT, rounding=ROUND_CEILING)
+        # bulk_create skips RequisitionItem.save(), which computes total_price
+        added.append(RequisitionItem(
+            requisition=requisition, item_name=s.item.name, units=s.item.units,
+            quantity=quantity, unit_price=s.item.unit_price, total_price=quantity * s.item.unit_price,
+        ))
+    RequisitionItem.objects.bulk_create(added)
+    requisition.total_price = requisition.items.aggregate(total=Sum('total_price'))['total'] or 0
+    requisition.save(update_fields=['total_price'])
+    return added
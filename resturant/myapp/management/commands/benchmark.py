@@ -0,0 +1,99 @@
+import contextlib
+import io
+import json
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import benchmark, synthetic
+
+COLUMNS = ['requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_avg', 'queries_max', 'throughput_rps']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the POS, kitchen, dashboard and export paths in-process and "
+        "report p50/p95/p99 latency, queries per request and throughput. "
+        "Optionally generates a synthetic dataset first and compares against "
+        "a saved baseline report. On SQLite keep --concurrency at 1 for "
+        "write scenarios: it serialises writers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(benchmark.SCENARIOS),
+                            help=f"Comma-separated, from: {', '.join(benchmark.SCENARIOS)}.")
+        parser.add_argument('--requests', type=int, default=100, help='Measured requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the data and the request mix.')
+        parser.add_argument('--generate', action='store_true',
+                            help='Create a synthetic dataset first (use an empty database).')
+        parser.add_argument('--menu-items', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=100)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--orders', type=int, default=1000, help='Historical orders to generate.')
+        parser.add_argument('--days', type=int, default=30, help='Days of order history to generate.')
+        parser.add_argument('--output', help='Write the report as JSON to this file.')
+        parser.add_argument('--baseline', help='Compare against a report written earlier with --output.')
+
+    def handle(self, *args, **options):
+        names = [n.strip() for n in options['scenarios'].split(',') if n.strip()]
+        unknown = set(names) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        report = {'started': datetime.now().isoformat(timespec='seconds'), **benchmark.environment()}
+        if options['generate']:
+            self.stdout.write('Generating data...')
+            try:
+                report['dataset'] = synthetic.generate(
+                    menu_items=options['menu_items'], ingredients=options['ingredients'],
+                    ingredients_per_recipe=options['ingredients_per_recipe'],
+                    orders=options['orders'], days=options['days'], seed=options['seed'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(', '.join(f'{v} {k}' for k, v in report['dataset'].items()))
+
+        user, _ = get_user_model().objects.get_or_create(
+            username='benchmark',
+            defaults={'is_staff': True, 'is_superuser': True, 'is_approved': True},
+        )
+
+        report['scenarios'] = {}
+        self.stdout.write(f"{'scenario':<18}" + ''.join(f'{c:>15}' for c in COLUMNS))
+        for name in names:
+            # the views print debug lines per request; keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    result = benchmark.run_scenario(
+                        name, user, requests=options['requests'], concurrency=options['concurrency'],
+                        warmup=options['warmup'], seed=options['seed'],
+                    )
+                except ValueError as e:
+                    raise CommandError(str(e))
+            report['scenarios'][name] = result
+            self.stdout.write(f'{name:<18}' + ''.join(f'{result[c]:>15}' for c in COLUMNS))
+            if 'orders_placed' in result:
+                self.stdout.write(f"    orders placed: {result['orders_placed']} of {result['requests']}")
+            if result.get('first_error'):
+                self.stdout.write(self.style.WARNING(f"    first error: {result['first_error']}"))
+
+        if baseline:
+            self.stdout.write('\nChange against baseline (%):')
+            for name, changes in benchmark.compare(report, baseline).items():
+                self.stdout.write(f'{name:<18}' + '  '.join(f'{m} {v:+.1f}' for m, v in changes.items()))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+        else:
+            self.stdout.write(self.style.SUCCESS('Benchmark finished.'))
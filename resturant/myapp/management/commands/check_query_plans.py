@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from myapp.models import InventoryHistory, Order, OrderItem, Requisition
+
+
+def hot_queries():
+    """(label, queryset) for the query shapes the busy views run on big tables."""
+    since = timezone.now() - timedelta(days=30)
+    return [
+        ('orders: active board',
+         Order.objects.filter(status__in=['Pending', 'Started']).order_by('-timestamp')),
+        ('orders: history page',
+         Order.objects.order_by('-timestamp', '-id')[:51]),
+        ('orders: history by status',
+         Order.objects.filter(status='Ready').order_by('-timestamp', '-id')[:51]),
+        ('order items: per order',
+         OrderItem.objects.filter(order_id__in=[1, 2, 3])),
+        ('inventory history: page',
+         InventoryHistory.objects.order_by('-timestamp', '-id')[:51]),
+        ('inventory history: by item',
+         InventoryHistory.objects.filter(item_id=1).order_by('-timestamp')[:51]),
+        ('inventory history: by type and period',
+         InventoryHistory.objects.filter(change_type='Added', timestamp__gte=since)),
+        ('inventory history: order usage',
+         InventoryHistory.objects.filter(order_id=1)),
+        ('requisitions: pending tab',
+         Requisition.objects.filter(is_archived=False).order_by('-created_at')),
+        ('requisitions: user draft',
+         Requisition.objects.filter(user_id=1, is_archived=False)),
+        ('requisitions: approved tab',
+         Requisition.objects.filter(
+             is_archived=True, operations_manager_approval='Approved',
+             finance_approval='Approved', director_approval='Approved',
+         ).order_by('-created_at')),
+    ]
+
+
+def full_scans(plan, table):
+    """Return the plan lines that read ``table`` without any index."""
+    lines = plan.splitlines()
+    if connection.vendor == 'postgresql':
+        return [l for l in lines if f'Seq Scan on {table}' in l]
+    if connection.vendor == 'sqlite':
+        return [l for l in lines if f'SCAN {table}' in l and 'USING' not in l]
+    return []
+
+
+def check_plans():
+    """EXPLAIN every hot query; returns (label, full scan plan lines) for each.
+
+    On PostgreSQL sequential scans are disabled while planning, so an
+    empty list means an index is usable at all, whatever the table sizes.
+    """
+    results = []
+    for label, queryset in hot_queries():
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        results.append((label, full_scans(plan, queryset.model._meta.db_table)))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot view queries and fail if any of them has to scan a "
+        "whole table. On PostgreSQL sequential scans are disabled while "
+        "planning, so the check reports whether an index is usable at all, "
+        "independent of current table sizes."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Unsupported database vendor: {connection.vendor}')
+
+        failures = []
+        for label, scans in check_plans():
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {label}'))
+                for line in scans:
+                    self.stdout.write(f'    {line.strip()}')
+            else:
+                self.stdout.write(f'index      {label}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries cannot use an index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import forecasting
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast ingredient usage from the daily inventory movement rollups and "
+        "store a par level per inventory item for the requisition page. Run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int,
+                            help='Complete days of usage to fit on (default FORECAST_HISTORY_DAYS).')
+        parser.add_argument('--cover-days', type=int,
+                            help='Days the stock should last (default REORDER_COVER_DAYS).')
+
+    def handle(self, *args, **options):
+        for name in ('history_days', 'cover_days'):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        count = forecasting.refresh(history_days=options['history_days'], cover_days=options['cover_days'])
+        below = forecasting.suggestions().count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reorder suggestions refreshed for {count} items ({below} below par)."
+        ))
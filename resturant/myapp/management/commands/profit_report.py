@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp import reports
+from myapp.rollups import business_date
+
+
+class Command(BaseCommand):
+    help = (
+        "Revenue, theoretical (recipe) and actual (inventory usage) COGS, margin "
+        "and food-cost % for a period, by order, menu item, category or day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD); defaults to the 1st of this month.')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD); defaults to today.')
+        parser.add_argument('--level', choices=reports.LEVELS, default='categories')
+        parser.add_argument('--output', help='Write the level to a .csv or .xlsx file instead of printing it.')
+
+    def handle(self, *args, **options):
+        today = business_date(timezone.now())
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else today.replace(day=1)
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else today
+        except ValueError:
+            raise CommandError('--start and --end must be dates in YYYY-MM-DD format.')
+        if end < start:
+            raise CommandError('--end is before --start.')
+
+        report = reports.build(start, end)
+        summary = report['summary']
+        self.stdout.write(
+            f"{start} to {end}: {summary['orders']} orders, revenue {summary['revenue']:,.2f}, "
+            f"actual COGS {summary['actual_cogs']:,.2f} (recipe {summary['theoretical_cogs']:,.2f}), "
+            f"margin {summary['actual_margin']:,.2f}, food cost {summary['actual_food_cost_pct']}%"
+        )
+
+        frame = report[options['level']]
+        output = options['output']
+        if not output:
+            self.stdout.write(frame.to_string(index=False))
+        elif output.endswith('.xlsx'):
+            frame.to_excel(output, index=False, engine='openpyxl')
+        elif output.endswith('.csv'):
+            frame.to_csv(output, index=False)
+        else:
+            raise CommandError('--output must end in .csv or .xlsx.')
+        if output:
+            self.stdout.write(self.style.SUCCESS(f'{len(frame)} rows written to {output}.'))
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import dashboard, menu_engineering, rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales and inventory rollups used by the dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format.')
+        rollups.rebuild(since=since)
+        dashboard.invalidate()
+        menu_engineering.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollups rebuilt{' since ' + options['since'] if since else ''}."
+        ))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp.models import (
+    Order, OrderCounter, Requisition, RequisitionCounter,
+    order_numbers, requisition_numbers,
+)
+
+
+def highest_number(values, prefix):
+    """Largest numeric suffix among values shaped like '<prefix>-0042'."""
+    last = 0
+    start = len(prefix) + 1
+    for value in values:
+        suffix = value[start:]
+        if suffix.isdigit():
+            last = max(last, int(suffix))
+    return last
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile the requisition and order counters with the numbers "
+        "actually in use. Counters that fell behind are moved forward; "
+        "--reclaim also winds back counters that are ahead (unused leased "
+        "blocks), which is only safe while no workers are running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reclaim', action='store_true',
+                            help='Also lower counters to the highest number in use.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.reconcile_requisitions(options)
+            self.reconcile_orders(options)
+        if not options['dry_run']:
+            requisition_numbers.reset()
+            order_numbers.reset()
+
+    def reconcile_requisitions(self, options):
+        numbers = Requisition.objects.filter(
+            requisition_number__startswith='REQ-'
+        ).values_list('requisition_number', flat=True).iterator()
+        used = highest_number(numbers, 'REQ')
+        counter = RequisitionCounter.objects.select_for_update().order_by('pk').first()
+        if counter is None:
+            counter = RequisitionCounter(last_number=0)
+        self.apply('REQ', counter, used, options)
+
+    def reconcile_orders(self, options):
+        keys = set(OrderCounter.objects.values_list('key', flat=True))
+        keys.add(OrderCounter.current_key())
+        for key in sorted(keys):
+            numbers = Order.objects.filter(
+                order_number__startswith=f'{key}-'
+            ).values_list('order_number', flat=True).iterator()
+            used = highest_number(numbers, key)
+            counter = OrderCounter.objects.select_for_update().filter(key=key).first()
+            if counter is None:
+                counter = OrderCounter(key=key, last_number=0)
+            self.apply(key, counter, used, options)
+
+    def apply(self, label, counter, used, options):
+        current = counter.last_number
+        if used > current or (options['reclaim'] and used < current):
+            target = used
+        else:
+            target = current
+        gap = current - used if current > used else 0
+        if target == current and counter.pk:
+            self.stdout.write(f"{label}: counter {current}, highest used {used} ({gap} unused) - ok")
+            return
+        self.stdout.write(self.style.WARNING(
+            f"{label}: counter {current} -> {target} (highest used {used})"
+        ))
+        if not options['dry_run']:
+            counter.last_number = target
+            counter.save()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from myapp import availability
+
+
+class Command(BaseCommand):
+    help = "Recompute the portions-available index for every menu item from current stock."
+
+    def handle(self, *args, **options):
+        changed = availability.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Availability refreshed ({changed} menu items changed)."))
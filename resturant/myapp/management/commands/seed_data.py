@@ -1,36 +1,37 @@
-# D:\python\kitchen\project2\mysite\myapp\management\commands\seed_data.py
-from django.core.management.base import BaseCommand
-from myapp.models import InventoryItem, Table, MenuItem
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import synthetic
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        InventoryItem.objects.bulk_create([
-            InventoryItem(name="Rice", quantity=50),
-            InventoryItem(name="Beef", quantity=20),
-            InventoryItem(name="Matoke", quantity=30),
-            InventoryItem(name="Vegetables", quantity=15),
-            InventoryItem(name="Fish", quantity=0),
-        ])
-        Table.objects.bulk_create([
-            Table(name="Table 1", is_occupied=True),
-            Table(name="Table 2"),
-            Table(name="Table 3"),
-            Table(name="Table 4", is_occupied=True),
-            Table(name="Table 5"),
-            Table(name="Table 6"),
-            Table(name="Table 7"),
-            Table(name="Table 8", is_occupied=True),
-            Table(name="Table 9"),
-            Table(name="Table 10"),
-            Table(name="Room 101", is_occupied=True),
-            Table(name="Room 102"),
-            Table(name="Room 103"),
-            Table(name="Room 104", is_occupied=True),
-            Table(name="Room 105"),
-        ])
-        MenuItem.objects.bulk_create([
-            MenuItem(name="Vegetable Samosas", price=5000, category="Starters"),
-            MenuItem(name="Matoke with Beef", price=15000, category="Main Course"),
-            MenuItem(name="Mango Sorbet", price=6000, category="Desserts"),
-        ])
-        self.stdout.write(self.style.SUCCESS('Data seeded successfully!'))
\ No newline at end of file
+    help = (
+        "Load a synthetic dataset (inventory, recipes, menu items, orders with "
+        "their items and inventory history, requisitions) into an empty "
+        "database. The same options and --seed always give the same data, so "
+        "production-scale problems can be reproduced locally, e.g. "
+        "--orders 1000000 --days 1095 --menu-items 300 --ingredients 800."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help='Orders to create.')
+        parser.add_argument('--days', type=int, default=30, help='Days of history the orders span.')
+        parser.add_argument('--menu-items', type=int, default=50, help='Recipes, each with its menu item.')
+        parser.add_argument('--ingredients', type=int, default=100, help='Inventory items.')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--tables', type=int, default=20)
+        parser.add_argument('--requisitions', type=int, help='Requisitions to create (default: two a day).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+
+    def handle(self, *args, **options):
+        try:
+            counts = synthetic.generate(
+                menu_items=options['menu_items'], ingredients=options['ingredients'],
+                ingredients_per_recipe=options['ingredients_per_recipe'], orders=options['orders'],
+                days=options['days'], tables=options['tables'], requisitions=options['requisitions'],
+                seed=options['seed'], progress=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            'Data seeded: ' + ', '.join(f"{n} {name.replace('_', ' ')}" for name, n in counts.items())
+        ))
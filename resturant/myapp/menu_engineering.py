@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .batching import CommitBatch
+from .models import DailyMenuItemSales, MenuItem, Recipe
+from .rollups import business_date
+
+VERSION_KEY = 'menu_engineering:version'
+
+# An item is "popular" when its share of units sold reaches this fraction
+# of an equal share (the usual 70% rule)
+POPULARITY_FACTOR = 0.7
+
+# (popular, high margin) -> class; the dict order is the display order
+CLASSES = {
+    (True, True): 'star',
+    (True, False): 'plowhorse',
+    (False, True): 'puzzle',
+    (False, False): 'dog',
+}
+
+
+# ----------------------------------------------------------------------
+#  ANALYSIS
+# ----------------------------------------------------------------------
+def analyze(start, end):
+    """Classify every menu item by popularity and contribution margin for a period.
+
+    Units and revenue come from the daily menu item rollups (one grouped
+    query however long the range); price and food cost (the recipe's
+    total_cost) from one more. Contribution margin per unit is price
+    minus food cost. An item is high-margin when that is at least the
+    menu's unit-weighted average, and popular when its unit share is at
+    least POPULARITY_FACTOR / number of items.
+    """
+    sales = pd.DataFrame.from_records(
+        list(
+            DailyMenuItemSales.objects.filter(date__gte=start, date__lte=end)
+            .values('menu_item_id')
+            .annotate(units=Sum('quantity'), revenue=Sum('revenue'))
+            .values_list('menu_item_id', 'units', 'revenue')
+        ),
+        columns=['id', 'units', 'revenue'],
+    ).set_index('id')
+    items = pd.DataFrame.from_records(
+        list(MenuItem.objects.values_list('id', 'name', 'category', 'price', 'recipe__total_cost')),
+        columns=['id', 'name', 'category', 'price', 'food_cost'],
+    ).set_index('id')
+
+    items['has_recipe'] = items['food_cost'].notna()
+    items['price'] = items['price'].astype(float)
+    items['food_cost'] = items['food_cost'].astype(float).fillna(0.0)
+    items['units'] = sales['units'].reindex(items.index).fillna(0).astype(int)
+    items['revenue'] = sales['revenue'].reindex(items.index).astype(float).fillna(0.0)
+    items['unit_margin'] = items['price'] - items['food_cost']
+    items['total_margin'] = items['unit_margin'] * items['units']
+
+    total_units = int(items['units'].sum())
+    popularity_threshold = POPULARITY_FACTOR / len(items) if len(items) else 0.0
+    margin_threshold = float(items['total_margin'].sum() / total_units) if total_units else 0.0
+    items['popularity'] = items['units'] / total_units if total_units else 0.0
+    popular = items['popularity'] >= popularity_threshold
+    profitable = items['unit_margin'] >= margin_threshold
+    items['class'] = np.select(
+        [popular & profitable, popular & ~profitable, ~popular & profitable],
+        [CLASSES[True, True], CLASSES[True, False], CLASSES[False, True]],
+        default=CLASSES[False, False],
+    )
+
+    items['class'] = pd.Categorical(items['class'], categories=list(CLASSES.values()), ordered=True)
+    items = items.round({'price': 2, 'food_cost': 2, 'revenue': 2, 'unit_margin': 2, 'total_margin': 2, 'popularity': 4})
+    items = items.sort_values(['class', 'total_margin'], ascending=[True, False]).reset_index()
+    items['class'] = items['class'].astype(str)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'thresholds': {
+            'popularity_share': round(popularity_threshold, 4),
+            'unit_margin': round(margin_threshold, 2),
+        },
+        'totals': {
+            'units': total_units,
+            'revenue': round(float(items['revenue'].sum()), 2),
+            'margin': round(float(items['total_margin'].sum()), 2),
+        },
+        'counts': {name: int((items['class'] == name).sum()) for name in CLASSES.values()},
+        'items': items.to_dict('records'),
+    }
+
+
+# ----------------------------------------------------------------------
+#  CACHE (per range)
+# ----------------------------------------------------------------------
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Mark every cached analysis stale (prices, recipe costs or rollups changed)."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def get_analysis(start, end):
+    """Return analyze(start, end), cached per range.
+
+    Past ranges change with prices, recipe costs, a rollup rebuild, or an
+    order readied after midnight being added to the day it was placed; all
+    of these bump the version. Ranges reaching today also gain sales as
+    orders complete, so they are cached for MENU_ENGINEERING_LIVE_TIMEOUT only.
+    """
+    key = f'menu_engineering:{current_version()}:{start.isoformat()}:{end.isoformat()}'
+    result = cache.get(key)
+    if result is None:
+        result = analyze(start, end)
+        if end >= business_date(timezone.now()):
+            timeout = getattr(settings, 'MENU_ENGINEERING_LIVE_TIMEOUT', 60)
+        else:
+            timeout = getattr(settings, 'MENU_ENGINEERING_CACHE_TIMEOUT', 86400)
+        cache.set(key, result, timeout)
+    return result
+
+
+_changes = CommitBatch(lambda _: invalidate())
+
+
+def mark_stale():
+    """Invalidate once the current transaction commits; for set-based price/cost updates."""
+    _changes.add(VERSION_KEY)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver(post_save, sender=Recipe)
+def menu_cost_changed(sender, raw=False, **kwargs):
+    if not raw:
+        mark_stale()
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import availability, catalog, menu_engineering
+from .batching import CommitBatch
+from .models import MenuItem, MenuItemIngredient, Recipe, RecipeIngredient
+
+CATEGORY_MAP = {
+    'Starter': 'Starters', 'Main Course': 'Main Course',
+    'Dessert': 'Desserts', 'Break Fast': 'Break Fast'
+}
+
+# Recipe fields copied onto the menu item; saves touching none of them are skipped
+SYNC_FIELDS = {'name', 'category', 'selling_price'}
+
+
+# ----------------------------------------------------------------------
+#  SYNC
+# ----------------------------------------------------------------------
+def sync_menu_items(recipe_ids):
+    """Bring the MenuItem and MenuItemIngredient rows of ``recipe_ids`` in line.
+
+    Recipes without ingredients are left alone. Everything is diffed in
+    memory and written with bulk inserts/updates/deletes, so the query
+    count does not grow with the number of recipes or ingredients. Rows
+    for ingredients no longer in the recipe are deleted only if the sync
+    created them (from_recipe); ingredients staff added directly stay.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+
+    wanted = {}
+    for recipe_id, inv_id, quantity in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by('id')
+        .values_list('recipe_id', 'inventory_item_id', 'quantity')
+    ):
+        wanted.setdefault(recipe_id, {})[inv_id] = quantity
+    if not wanted:
+        return
+
+    with transaction.atomic():
+        recipes = Recipe.objects.in_bulk(list(wanted))
+        menu_items = {}
+        for menu_item in MenuItem.objects.filter(recipe_id__in=recipes).order_by('-id'):
+            menu_items[menu_item.recipe_id] = menu_item
+
+        new, changed = [], []
+        for recipe in recipes.values():
+            fields = {
+                'name': recipe.name,
+                'category': CATEGORY_MAP.get(recipe.category, 'Main Course'),
+                'price': recipe.selling_price if recipe.selling_price > 0 else Decimal('0.01'),
+            }
+            menu_item = menu_items.get(recipe.pk)
+            if menu_item is None:
+                menu_items[recipe.pk] = MenuItem(recipe=recipe, **fields)
+                new.append(menu_items[recipe.pk])
+            elif any(getattr(menu_item, f) != v for f, v in fields.items()):
+                for f, v in fields.items():
+                    setattr(menu_item, f, v)
+                changed.append(menu_item)
+        MenuItem.objects.bulk_create(new)
+        MenuItem.objects.bulk_update(changed, ['name', 'category', 'price'])
+
+        by_menu_item = {menu_items[r].pk: wanted[r] for r in recipes}
+        add, update, remove = [], [], []
+        for row in MenuItemIngredient.objects.filter(menu_item_id__in=by_menu_item):
+            quantity = by_menu_item[row.menu_item_id].pop(row.inventory_item_id, None)
+            if quantity is None:
+                if row.from_recipe:
+                    remove.append(row.pk)
+            elif row.quantity_needed != quantity or not row.from_recipe:
+                row.quantity_needed = quantity
+                row.from_recipe = True
+                update.append(row)
+        for menu_item_id, ingredients in by_menu_item.items():
+            add.extend(
+                MenuItemIngredient(
+                    menu_item_id=menu_item_id, inventory_item_id=inv_id, quantity_needed=quantity, from_recipe=True,
+                )
+                for inv_id, quantity in ingredients.items()
+            )
+        MenuItemIngredient.objects.filter(pk__in=remove).delete()
+        MenuItemIngredient.objects.bulk_update(update, ['quantity_needed', 'from_recipe'])
+        MenuItemIngredient.objects.bulk_create(add)
+        if new or changed:
+            catalog.mark_stale()
+            menu_engineering.mark_stale()
+        if new or add or update or remove:
+            availability.menu_items_changed(by_menu_item)
+
+
+# Saves inside a transaction are collected and synced once on commit
+pending_syncs = CommitBatch(sync_menu_items)
+
+
+@receiver(post_save, sender=Recipe)
+def create_or_update_menu_item_for_recipe(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not SYNC_FIELDS & set(update_fields)):
+        return
+    pending_syncs.add(instance.pk)
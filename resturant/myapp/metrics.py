@@ -0,0 +1,195 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# Upper bounds of the histogram buckets (+Inf is implied)
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# "IN (%s, %s, %s)" -> "IN (...)" so the same query with different list
+# lengths shares one fingerprint
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more SQL queries than its configured budget."""
+
+    def __init__(self, view, count, budget, duplicates=()):
+        self.view = view
+        self.count = count
+        self.budget = budget
+        self.duplicates = duplicates
+        message = f"{view} ran {count} queries (budget {budget})."
+        if duplicates:
+            message += " Repeated: " + "; ".join(f"{n}x {sql[:200]}" for sql, n in duplicates)
+        super().__init__(message)
+
+
+# ----------------------------------------------------------------------
+#  PER-REQUEST RECORDING
+# ----------------------------------------------------------------------
+def fingerprint(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times the queries it sees.
+
+    Only the SQL text is kept (parameters are separate), so queries that
+    differ only in their values share a fingerprint; a fingerprint seen
+    more than once in a request usually means an N+1 loop.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Number of queries that repeated an earlier fingerprint."""
+        return sum(n - 1 for n in self.fingerprints.values() if n > 1)
+
+    def repeated(self, limit=5):
+        """The most repeated fingerprints as [(sql, count)]."""
+        return [(sql, n) for sql, n in self.fingerprints.most_common(limit) if n > 1]
+
+
+@contextmanager
+def record_queries():
+    """Record the queries run on every database connection of this thread."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(recorder))
+        yield recorder
+
+
+@contextmanager
+def query_budget(budget, label='block'):
+    """Raise QueryBudgetExceeded if the block runs more than ``budget`` queries."""
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > budget:
+        raise QueryBudgetExceeded(label, recorder.count, budget, recorder.repeated())
+
+
+# ----------------------------------------------------------------------
+#  AGGREGATES (per process)
+# ----------------------------------------------------------------------
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    """Request and query metrics by URL name, kept in this process.
+
+    Each worker process has its own registry, so with several workers
+    Prometheus should scrape each one (or run a single metrics worker).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.requests = Counter()  # (view, method, status)
+        self.duration = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.db_time = Counter()
+        self.duplicates = Counter()
+        self.over_budget = Counter()
+
+    def observe(self, view, method, status, duration, recorder, over_budget=False):
+        with self._lock:
+            self.requests[(view, method, str(status))] += 1
+            self.duration[view].observe(duration)
+            self.queries[view].observe(recorder.count)
+            self.db_time[view] += recorder.time
+            self.duplicates[view] += recorder.duplicates
+            if over_budget:
+                self.over_budget[view] += 1
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP http_requests_total Requests handled, by URL name.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (view, method, status), n in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{_labels(view=view, method=method, status=status)} {n}')
+            lines += _histogram(
+                'http_request_duration_seconds', 'Response time, by URL name.', self.duration
+            )
+            lines += _histogram(
+                'db_queries_per_request', 'SQL queries run per request, by URL name.', self.queries
+            )
+            lines += _counter(
+                'db_query_duration_seconds_total', 'Time spent in SQL queries, by URL name.', self.db_time
+            )
+            lines += _counter(
+                'db_duplicate_queries_total', 'Queries repeating an earlier query of the same request.',
+                self.duplicates,
+            )
+            lines += _counter(
+                'db_query_budget_exceeded_total', 'Requests that ran more queries than their budget.',
+                self.over_budget,
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _counter(name, help_text, values):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for view, value in sorted(values.items()):
+        lines.append(f'{name}{_labels(view=view)} {value:g}')
+    return lines
+
+
+def _histogram(name, help_text, histograms):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for view, h in sorted(histograms.items()):
+        for bound, n in zip(h.buckets, h.counts):
+            lines.append(f'{name}_bucket{_labels(view=view, le=f"{bound:g}")} {n}')
+        lines.append(f'{name}_bucket{_labels(view=view, le="+Inf")} {h.count}')
+        lines.append(f'{name}_sum{_labels(view=view)} {h.sum:g}')
+        lines.append(f'{name}_count{_labels(view=view)} {h.count}')
+    return lines
+
+
+registry = Registry()
@@ -0,0 +1,75 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from .metrics import QueryBudgetExceeded, record_queries, registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryMetricsMiddleware:
+    """Record query count, DB time, repeated queries and response time per URL name.
+
+    Figures go to ``metrics.registry`` (served at /metrics/) and, with
+    QUERY_METRICS_HEADERS on, to X-Query-Count / Server-Timing response
+    headers. Views listed in QUERY_BUDGETS (by URL name, or "name:METHOD"
+    to budget one method separately) are checked against their budget:
+    over-budget requests are logged, or raise QueryBudgetExceeded when
+    QUERY_BUDGET_ACTION is 'raise' (for tests).
+
+    Under ASGI the recorder is installed on the thread that runs the
+    request's sync code, where Django runs the ORM. Streaming responses
+    are timed up to the first byte.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        self.finish(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        recording = record_queries()
+        recorder = await sync_to_async(recording.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.__exit__)(None, None, None)
+        self.finish(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    def finish(self, request, response, duration, recorder):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(f'{view}:{request.method}', budgets.get(view))
+        over_budget = budget is not None and recorder.count > budget
+        registry.observe(view, request.method, response.status_code, duration, recorder, over_budget)
+
+        if getattr(settings, 'QUERY_METRICS_HEADERS', False):
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Duplicates'] = str(recorder.duplicates)
+            response['Server-Timing'] = (
+                f'db;dur={recorder.time * 1000:.1f};desc="{recorder.count} queries", '
+                f'total;dur={duration * 1000:.1f}'
+            )
+
+        if over_budget:
+            error = QueryBudgetExceeded(view, recorder.count, budget, recorder.repeated())
+            if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+                raise error
+            logger.warning(str(error))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:57
+
+from django.db import migrations, models
+
+
+def seed_order_counter(apps, schema_editor):
+    # Continue numbering after the highest existing ORD-xxxx order.
+    Order = apps.get_model('myapp', 'Order')
+    OrderCounter = apps.get_model('myapp', 'OrderCounter')
+    last = 0
+    for number in Order.objects.filter(order_number__startswith='ORD-').values_list('order_number', flat=True).iterator():
+        suffix = number[4:]
+        if suffix.isdigit():
+            last = max(last, int(suffix))
+    OrderCounter.objects.update_or_create(key='ORD', defaults={'last_number': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_requisition_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'order_counter',
+            },
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+        migrations.RunPython(seed_order_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_order_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryhistory',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_usage', to='myapp.order'),
+        ),
+        migrations.AddField(
+            model_name='inventoryhistory',
+            name='order_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_usage', to='myapp.orderitem'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cogs_total',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=12),
+        ),
+    ]
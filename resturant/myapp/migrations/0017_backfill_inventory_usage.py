@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:58
+
+import re
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+REASON_RE = re.compile(r'^Used for (?P<menu_item>.*) in order (?P<order_number>\S+)$')
+CHUNK_SIZE = 2000
+
+
+def link_history_to_orders(apps, schema_editor):
+    # Attach existing 'Used for <item> in order <number>' rows to their
+    # Order / OrderItem, then store each order's COGS in cogs_total.
+    InventoryHistory = apps.get_model('myapp', 'InventoryHistory')
+    Order = apps.get_model('myapp', 'Order')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+
+    rows = (
+        InventoryHistory.objects.filter(change_type='Used', order__isnull=True, reason__contains=' in order ')
+        .only('id', 'reason')
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        parsed = {}
+        for h in chunk:
+            match = REASON_RE.match(h.reason)
+            if match:
+                parsed[h.id] = (match['order_number'], match['menu_item'])
+        numbers = {number for number, _ in parsed.values()}
+        orders = dict(Order.objects.filter(order_number__in=numbers).values_list('order_number', 'id'))
+        items = {}
+        for item_id, order_id, name in (
+            OrderItem.objects.filter(order_id__in=orders.values())
+            .order_by('id')
+            .values_list('id', 'order_id', 'menu_item__name')
+        ):
+            items.setdefault((order_id, name), item_id)
+
+        updated = []
+        for h in chunk:
+            if h.id not in parsed:
+                continue
+            number, name = parsed[h.id]
+            order_id = orders.get(number)
+            if not order_id:
+                continue
+            h.order_id = order_id
+            h.order_item_id = items.get((order_id, name))
+            updated.append(h)
+        InventoryHistory.objects.bulk_update(updated, ['order', 'order_item'])
+
+    usage = (
+        InventoryHistory.objects.filter(order=OuterRef('pk'), change_type='Used')
+        .values('order')
+        .annotate(total=Sum(F('quantity') * F('unit_price')))
+        .values('total')
+    )
+    Order.objects.update(cogs_total=Coalesce(
+        Subquery(usage, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Decimal('0.00'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_inventoryhistory_order_links'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_history_to_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:02
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+BUSINESS_TZ = ZoneInfo('Africa/Nairobi')
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same aggregation as rollups.rebuild(), on the historical models, so
+    # the dashboard shows existing history as soon as the tables exist.
+    Order = apps.get_model('myapp', 'Order')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    InventoryHistory = apps.get_model('myapp', 'InventoryHistory')
+    DailySales = apps.get_model('myapp', 'DailySales')
+    DailyMenuItemSales = apps.get_model('myapp', 'DailyMenuItemSales')
+    DailyInventoryMovement = apps.get_model('myapp', 'DailyInventoryMovement')
+    day = TruncDate('timestamp', tzinfo=BUSINESS_TZ)
+
+    DailySales.objects.bulk_create(
+        (
+            DailySales(date=r['day'], orders=r['count'], revenue=r['revenue'] or 0)
+            for r in Order.objects.filter(status='Ready').annotate(day=day).values('day')
+            .annotate(count=Count('id'), revenue=Sum('total_price')).order_by('day')
+        ),
+        batch_size=2000,
+    )
+    DailyMenuItemSales.objects.bulk_create(
+        (
+            DailyMenuItemSales(date=r['day'], menu_item_id=r['menu_item_id'],
+                               quantity=r['total_quantity'] or 0, revenue=r['revenue'] or 0)
+            for r in OrderItem.objects.filter(order__status='Ready')
+            .annotate(day=TruncDate('order__timestamp', tzinfo=BUSINESS_TZ))
+            .values('day', 'menu_item_id')
+            .annotate(total_quantity=Sum('quantity'), revenue=Sum('total_price')).order_by('day')
+        ),
+        batch_size=2000,
+    )
+    DailyInventoryMovement.objects.bulk_create(
+        (
+            DailyInventoryMovement(date=r['day'], item_id=r['item_id'], change_type=r['change_type'],
+                                   quantity=r['total_quantity'] or 0, value=r['total_value'] or 0)
+            for r in InventoryHistory.objects.annotate(day=day).values('day', 'item_id', 'change_type')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_value=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField())),
+            ).order_by('day')
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_backfill_inventory_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyInventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('change_type', models.CharField(choices=[('Added', 'Added'), ('Used', 'Used'), ('Adjusted', 'Adjusted')], max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('value', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_movements', to='myapp.inventoryitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'item', 'change_type'), name='unique_daily_inventory_movement')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyMenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='myapp.menuitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'menu_item'), name='unique_daily_menu_item_sales')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryhistory',
+            index=models.Index(fields=['-timestamp', '-id'], name='invhist_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryhistory',
+            index=models.Index(fields=['item', '-timestamp'], name='invhist_item_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryhistory',
+            index=models.Index(fields=['change_type', 'timestamp'], name='invhist_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-timestamp', '-id'], name='order_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-timestamp'], name='order_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['Pending', 'Started'])), fields=['-timestamp'], name='order_active_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['user', 'is_archived'], name='req_user_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['-created_at'], name='req_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['operations_manager_approval', 'finance_approval', 'director_approval', '-created_at'], name='req_approvals_created_idx'),
+        ),
+    ]
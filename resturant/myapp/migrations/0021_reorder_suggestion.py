@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0020_menu_item_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_suggestion', serialize=False, to='myapp.inventoryitem')),
+                ('daily_usage', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('forecast_usage', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('safety_stock', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('par_level', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
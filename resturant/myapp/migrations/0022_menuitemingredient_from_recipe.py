@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0021_reorder_suggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitemingredient',
+            name='from_recipe',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
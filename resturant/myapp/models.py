@@ -10,7 +10,11 @@ from django.db import transaction
 from django.db import transaction, IntegrityError
 import time
 from django.contrib.auth import get_user_model
-from django.db.models import Max
+from django.db.models import Max, OuterRef, Subquery
+from django.conf import settings
+
+from .batching import CommitBatch
+from .numbering import BlockAllocator
 
 
 # ----------------------------------------------------------------------
@@ -74,6 +78,18 @@ class InventoryHistory(models.Model):
     reason = models.TextField()
     change_type = models.CharField(max_length=20, choices=CHANGE_TYPES)
     timestamp = models.DateTimeField(auto_now_add=True)
+    order = models.ForeignKey('Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_usage')
+    order_item = models.ForeignKey('OrderItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_usage')
+
+    class Meta:
+        indexes = [
+            # history tab / exports: newest first, keyset on (timestamp, id)
+            models.Index(fields=['-timestamp', '-id'], name='invhist_ts_id_idx'),
+            # per-item history filter
+            models.Index(fields=['item', '-timestamp'], name='invhist_item_ts_idx'),
+            # expense / usage queries by change type and period
+            models.Index(fields=['change_type', 'timestamp'], name='invhist_type_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.change_type} {self.quantity} {self.units} of {self.item.name}"
@@ -112,10 +128,9 @@ class Recipe(models.Model):
         return self.name
 
     def update_cost_and_price(self):
-        self.total_cost = sum(
-            Decimal(str(ing.quantity)) * ing.unit_price
-            for ing in self.ingredients.all()
-        ) or Decimal('0.00')
+        self.total_cost = self.ingredients.aggregate(
+            total=Sum(F('quantity') * F('unit_price'))
+        )['total'] or Decimal('0.00')
         profit_multiplier = Decimal('1.0') + (self.profit_percentage / Decimal('100.0'))
         self.selling_price = self.total_cost * profit_multiplier
         self.save(update_fields=['total_cost', 'selling_price'])
@@ -159,6 +174,9 @@ class MenuItemIngredient(models.Model):
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
     quantity_needed = models.DecimalField(max_digits=10, decimal_places=2)
+    # Set on rows mirrored from the recipe by myapp/menu_sync.py; only those
+    # are removed when the ingredient leaves the recipe (staff-added rows stay)
+    from_recipe = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return f"{self.quantity_needed} {self.inventory_item.units} of {self.inventory_item.name}"
@@ -174,7 +192,7 @@ class Order(models.Model):
         ('Ready', 'Ready'),
         ('Canceled', 'Canceled'),
     ]
-    order_number = models.CharField(max_length=20, unique=True)
+    order_number = models.CharField(max_length=32, unique=True)
     customer = models.CharField(max_length=100, blank=True, null=True)
     table = models.ForeignKey(DTable, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
@@ -182,18 +200,24 @@ class Order(models.Model):
     start_time = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    cogs_total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, editable=False)
+
+    class Meta:
+        indexes = [
+            # order history: newest first, keyset on (timestamp, id)
+            models.Index(fields=['-timestamp', '-id'], name='order_ts_id_idx'),
+            # history filtered by status, sales rollups for 'Ready' orders
+            models.Index(fields=['status', '-timestamp'], name='order_status_ts_idx'),
+            # kitchen board: only the few open orders are indexed
+            models.Index(
+                fields=['-timestamp'], name='order_active_ts_idx',
+                condition=models.Q(status__in=['Pending', 'Started']),
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            last = Order.objects.order_by('-id').first()
-            if last and last.order_number and last.order_number.startswith('ORD-'):
-                try:
-                    num = int(last.order_number[4:]) + 1
-                    self.order_number = f"ORD-{num:04d}"
-                except:
-                    self.order_number = "ORD-0001"
-            else:
-                self.order_number = "ORD-0001"
+            self.order_number = OrderCounter.next_order_number()
         super().save(*args, **kwargs)
 
     def time_taken(self):
@@ -206,13 +230,7 @@ class Order(models.Model):
         return "N/A"
 
     def cogs(self):
-        total = InventoryHistory.objects.filter(
-            reason__contains=f"order {self.order_number}",
-            change_type='Used'
-        ).aggregate(
-            total=Coalesce(Sum(F('quantity') * F('unit_price')), Decimal('0.00'))
-        )['total']
-        return total
+        return self.cogs_total
 
     def profit(self):
         return self.total_price - self.cogs()
@@ -231,6 +249,47 @@ class Order(models.Model):
         return f"Order {self.order_number} ({self.status})"
 
 
+class OrderCounter(models.Model):
+    """Per-prefix order number counter, leased to workers in blocks."""
+    key = models.CharField(max_length=32, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'order_counter'
+
+    def __str__(self):
+        return f"{self.key}: {self.last_number}"
+
+    @classmethod
+    def lease_block(cls, key, size):
+        # The counter row stays locked until the enclosing transaction ends.
+        # place_order numbers the order before opening its transaction, so a
+        # POS lease commits at once instead of holding the lock while the
+        # order is placed.
+        with transaction.atomic():
+            cls.objects.get_or_create(key=key)
+            cls.objects.filter(key=key).update(last_number=F('last_number') + size)
+            return cls.objects.filter(key=key).values_list('last_number', flat=True).get()
+
+    @classmethod
+    def current_key(cls):
+        key = getattr(settings, 'ORDER_NUMBER_PREFIX', 'ORD')
+        if getattr(settings, 'ORDER_NUMBER_DAILY', False):
+            key = f"{key}-{timezone.localdate():%Y%m%d}"
+        return key
+
+    @classmethod
+    def next_order_number(cls):
+        key = cls.current_key()
+        return f"{key}-{order_numbers.next_number(key):04d}"
+
+
+order_numbers = BlockAllocator(
+    OrderCounter.lease_block,
+    block_size=getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 20),
+)
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -271,6 +330,19 @@ class Requisition(models.Model):
         choices=STATUS_CHOICES,
         default="Pending")
 
+    class Meta:
+        indexes = [
+            # a user's open draft
+            models.Index(fields=['user', 'is_archived'], name='req_user_archived_idx'),
+            # pending tab: only the small open set is indexed
+            models.Index(fields=['-created_at'], name='req_pending_created_idx', condition=models.Q(is_archived=False)),
+            # approved / rejected tabs
+            models.Index(
+                fields=['operations_manager_approval', 'finance_approval', 'director_approval', '-created_at'],
+                name='req_approvals_created_idx',
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.requisition_number:
             next_num = RequisitionCounter.get_next_number()
@@ -330,43 +402,127 @@ class RequisitionCounter(models.Model):
         db_table = 'requisition_counter'
 
     @classmethod
-    def get_next_number(cls):
+    def lease_block(cls, key, size):
+        # Runs inside the caller's transaction on purpose: if creating the
+        # requisition rolls back, so does the lease, so numbers stay gapless.
+        # The counter row stays locked until that outer transaction commits.
         with transaction.atomic():
-            counter = cls.objects.select_for_update().first()
-            if not counter:
-                counter = cls.objects.create(last_number=0)
-            counter.last_number += 1
-            counter.save(update_fields=['last_number'])
-            return counter.last_number
+            counter = cls.objects.order_by('pk').first() or cls.objects.create(last_number=0)
+            cls.objects.filter(pk=counter.pk).update(last_number=F('last_number') + size)
+            return cls.objects.filter(pk=counter.pk).values_list('last_number', flat=True).get()
+
+    @classmethod
+    def get_next_number(cls):
+        return requisition_numbers.next_number()
+
+
+# Block size 1 (the default) keeps requisition numbers sequential; see
+# REQUISITION_NUMBER_BLOCK_SIZE in settings for the trade-off.
+requisition_numbers = BlockAllocator(
+    RequisitionCounter.lease_block,
+    block_size=getattr(settings, 'REQUISITION_NUMBER_BLOCK_SIZE', 1),
+)
+
+
+# ----------------------------------------------------------------------
+#  ROLLUPS (maintained by myapp/rollups.py)
+# ----------------------------------------------------------------------
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders, {self.revenue}"
+
+
+class DailyMenuItemSales(models.Model):
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='unique_daily_menu_item_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.quantity}x {self.menu_item_id}"
+
+
+class DailyInventoryMovement(models.Model):
+    date = models.DateField()
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='daily_movements')
+    change_type = models.CharField(max_length=20, choices=InventoryHistory.CHANGE_TYPES)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'item', 'change_type'], name='unique_daily_inventory_movement'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.change_type} {self.quantity} of {self.item_id}"
+
+
+# ----------------------------------------------------------------------
+#  AVAILABILITY (maintained by myapp/availability.py)
+# ----------------------------------------------------------------------
+class MenuItemAvailability(models.Model):
+    menu_item = models.OneToOneField(MenuItem, on_delete=models.CASCADE, primary_key=True, related_name='availability')
+    # Portions makeable from current stock; null when the item uses no ingredients
+    portions = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.menu_item_id}: {self.portions if self.portions is not None else 'unlimited'}"
+
+
+# ----------------------------------------------------------------------
+#  REORDER SUGGESTIONS (maintained by myapp/forecasting.py)
+# ----------------------------------------------------------------------
+class ReorderSuggestion(models.Model):
+    item = models.OneToOneField(InventoryItem, on_delete=models.CASCADE, primary_key=True, related_name='reorder_suggestion')
+    # Smoothed usage per day (weekday effect removed) and the forecast over the cover period
+    daily_usage = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    forecast_usage = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    safety_stock = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Stock to hold at the start of the cover period; the shortfall below it is reordered
+    par_level = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.item_id}: par {self.par_level}"
+
+
 # ----------------------------------------------------------------------
 #  SIGNALS
 # ----------------------------------------------------------------------
-@receiver(post_save, sender=Recipe)
-def create_or_update_menu_item_for_recipe(sender, instance, **kwargs):
-    if not instance.ingredients.exists():
-        return
-    category_map = {
-        'Starter': 'Starters', 'Main Course': 'Main Course',
-        'Dessert': 'Desserts', 'Break Fast': 'Break Fast'
-    }
-    menu_category = category_map.get(instance.category, 'Main Course')
-    selling_price = instance.selling_price if instance.selling_price > 0 else Decimal('0.01')
-
-    menu_item, _ = MenuItem.objects.update_or_create(
-        recipe=instance,
-        defaults={'name': instance.name, 'category': menu_category, 'price': selling_price}
+# Recipe -> menu item sync lives in myapp/menu_sync.py
+
+
+def recompute_order_totals(order_ids):
+    """Set total_price of ``order_ids`` to the sum of their items in one UPDATE."""
+    totals = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum('total_price'))
+        .values('total')
+    )
+    Order.objects.filter(pk__in=order_ids).update(
+        total_price=Coalesce(Subquery(totals), Decimal('0.00'), output_field=models.DecimalField())
     )
-    for ing in instance.ingredients.all():
-        MenuItemIngredient.objects.update_or_create(
-            menu_item=menu_item,
-            inventory_item=ing.inventory_item,
-            defaults={'quantity_needed': ing.quantity}
-        )
+
+
+# Item saves/deletes mark their order dirty; totals are recomputed once per
+# transaction. Wrap bulk item edits in order_totals.suppressed() and call
+# recompute_order_totals() yourself to skip even the bookkeeping.
+order_totals = CommitBatch(recompute_order_totals)
 
 
 @receiver([post_save, post_delete], sender=OrderItem)
-def update_order_total(sender, instance, **kwargs):
-    if not instance.order_id:
-        return
-    total = OrderItem.objects.filter(order=instance.order).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-    Order.objects.filter(pk=instance.order.pk).update(total_price=total)
\ No newline at end of file
+def update_order_total(sender, instance, raw=False, **kwargs):
+    if not raw:
+        order_totals.add(instance.order_id)
\ No newline at end of file
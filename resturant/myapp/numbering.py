@@ -0,0 +1,54 @@
+import threading
+
+from django.db import transaction
+
+
+# ----------------------------------------------------------------------
+#  BLOCK ALLOCATOR
+# ----------------------------------------------------------------------
+class BlockAllocator:
+    """Hand out sequence numbers from blocks leased from a counter row.
+
+    ``lease(key, size)`` must reserve ``size`` numbers for ``key`` and
+    return the last number of the reserved block. Each process keeps the
+    unused rest of its block in memory, so the counter row is only touched
+    once every ``block_size`` numbers instead of once per number.
+
+    The rest of a block is only made available after the leasing
+    transaction commits; if it rolls back, the lease is undone in the
+    database and nothing is cached, so numbers are never handed out twice.
+    Numbers still cached when a worker exits are skipped (gaps).
+    """
+
+    def __init__(self, lease, block_size=1):
+        self.lease = lease
+        self.block_size = max(int(block_size), 1)
+        self._free = {}
+        self._lock = threading.Lock()
+
+    def next_number(self, key=''):
+        with self._lock:
+            ranges = self._free.get(key)
+            if ranges:
+                start, end = ranges[0]
+                if start < end:
+                    ranges[0] = (start + 1, end)
+                else:
+                    ranges.pop(0)
+                return start
+
+        size = self.block_size
+        last = self.lease(key, size)
+        first = last - size + 1
+        if size > 1:
+            transaction.on_commit(lambda: self._release(key, first + 1, last))
+        return first
+
+    def _release(self, key, start, end):
+        with self._lock:
+            self._free.setdefault(key, []).append((start, end))
+
+    def reset(self):
+        """Forget every cached block (numbers in them are skipped)."""
+        with self._lock:
+            self._free.clear()
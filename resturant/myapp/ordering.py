@@ -0,0 +1,165 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from . import events
+from .models import (
+    DTable, InventoryHistory, MenuItem, MenuItemIngredient, Order, OrderCounter,
+    OrderItem, RecipeIngredient,
+)
+from .rollups import record_movements
+from .signals import order_status_changed
+from .stock import reserve_stock
+
+
+# ----------------------------------------------------------------------
+#  CART RESOLUTION
+# ----------------------------------------------------------------------
+def resolve_cart(items_data):
+    """Turn raw POS cart lines into (menu_item, quantity) pairs.
+
+    Menu items are looked up by id first and by case-insensitive name
+    second, with one query per lookup style for the whole cart.
+    """
+    parsed = []
+    ids, names = set(), set()
+    for it in items_data:
+        quantity = int(it.get('quantity', 0))
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be greater than 0, got {quantity}")
+        menu_id = it.get('id') or it.get('menu_item_id')
+        menu_id = int(menu_id) if menu_id else None
+        name = (it.get('name') or '').strip()
+        if menu_id:
+            ids.add(menu_id)
+        if name:
+            names.add(name.lower())
+        parsed.append((menu_id, name, quantity, it))
+
+    by_id = MenuItem.objects.select_related('recipe').in_bulk(ids) if ids else {}
+    by_name = {}
+    if names:
+        matches = (
+            MenuItem.objects.select_related('recipe')
+            .annotate(lower_name=Lower('name'))
+            .filter(lower_name__in=names)
+            .order_by('pk')
+        )
+        for mi in matches:
+            by_name.setdefault(mi.lower_name, mi)
+
+    lines = []
+    for menu_id, name, quantity, it in parsed:
+        menu_item = by_id.get(menu_id) or by_name.get(name.lower())
+        if not menu_item:
+            raise ValueError(f"Menu item not found: '{it.get('name') or it.get('id')}'")
+        lines.append((menu_item, quantity))
+    return lines
+
+
+# ----------------------------------------------------------------------
+#  INGREDIENT DEMAND
+# ----------------------------------------------------------------------
+def ingredient_usage(lines):
+    """Expand cart lines into (line_no, menu_item, inventory_item_id, needed) rows.
+
+    Both recipe ingredients and direct menu item ingredients are read
+    with one query each for the whole cart.
+    """
+    recipe_ids = {mi.recipe_id for mi, _ in lines if mi.recipe_id}
+    menu_ids = {mi.pk for mi, _ in lines}
+
+    per_recipe = defaultdict(list)
+    if recipe_ids:
+        rows = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+            'recipe_id', 'inventory_item_id', 'quantity'
+        )
+        for recipe_id, inv_id, qty in rows:
+            per_recipe[recipe_id].append((inv_id, qty))
+
+    per_menu = defaultdict(list)
+    rows = MenuItemIngredient.objects.filter(menu_item_id__in=menu_ids).values_list(
+        'menu_item_id', 'inventory_item_id', 'quantity_needed'
+    )
+    for menu_id, inv_id, qty in rows:
+        per_menu[menu_id].append((inv_id, qty))
+
+    usage = []
+    for line_no, (menu_item, quantity) in enumerate(lines):
+        for inv_id, qty in per_recipe.get(menu_item.recipe_id, []):
+            usage.append((line_no, menu_item, inv_id, qty * Decimal(quantity)))
+        for inv_id, qty in per_menu.get(menu_item.pk, []):
+            usage.append((line_no, menu_item, inv_id, qty * Decimal(quantity)))
+    return usage
+
+
+def total_demand(usage):
+    """Sum needed quantities per inventory item id."""
+    demand = defaultdict(Decimal)
+    for _, _, inv_id, needed in usage:
+        demand[inv_id] += needed
+    return dict(demand)
+
+
+# ----------------------------------------------------------------------
+#  PLACEMENT
+# ----------------------------------------------------------------------
+def place_order(order, lines, usage):
+    """Save ``order`` with its items and deduct stock using bulk writes.
+
+    Stock is reserved first under row locks (see stock.reserve_stock), so
+    a shortfall raises InsufficientStock before anything is written. The
+    order total and COGS are computed in memory and items and history rows
+    are bulk inserted, with each history row linked to its order item.
+
+    The order number is taken before the placement transaction opens, so
+    a block lease commits on its own and the counter row is not locked
+    while stock is reserved. A placement that then fails skips its number.
+    """
+    demand = total_demand(usage)
+    if not order.order_number:
+        order.order_number = OrderCounter.next_order_number()
+    with transaction.atomic():
+        inventory = reserve_stock(demand)
+
+        order.status = 'Pending'
+        order.total_price = sum(
+            (mi.price * quantity for mi, quantity in lines), Decimal('0.00')
+        )
+        order.cogs_total = sum(
+            (needed * inventory[inv_id].unit_price for _, _, inv_id, needed in usage),
+            Decimal('0.00')
+        ).quantize(Decimal('0.01'))
+        order.save()
+
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, menu_item=mi, quantity=quantity,
+                total_price=mi.price * quantity
+            )
+            for mi, quantity in lines
+        ])
+
+        history = InventoryHistory.objects.bulk_create([
+            InventoryHistory(
+                item_id=inv_id,
+                units=inventory[inv_id].units,
+                quantity=needed,
+                unit_price=inventory[inv_id].unit_price,
+                reason=f'Used for {menu_item.name} in order {order.order_number}',
+                change_type='Used',
+                order=order,
+                order_item=order_items[line_no],
+            )
+            for line_no, menu_item, inv_id, needed in usage
+        ])
+        record_movements(history)
+
+        if order.table_id:
+            DTable.objects.filter(pk=order.table_id).update(is_occupied=True)
+            order.table.is_occupied = True
+            events.table_changed(order.table)
+        order_status_changed.send(sender=Order, order_ids=[order.pk], status=order.status)
+    return order
@@ -0,0 +1,123 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+# ----------------------------------------------------------------------
+#  CURSORS
+# ----------------------------------------------------------------------
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_plain(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """Return the values in ``cursor`` converted by ``fields`` (None if there is no cursor).
+
+    ``fields`` are the model fields of the ordering columns; each value goes
+    through the field's to_python(). Raises ValueError for a malformed or
+    tampered cursor (bad encoding, wrong length, null or wrongly typed values).
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError('Invalid cursor.')
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, TypeError, ValueError):
+        raise ValueError('Invalid cursor.')
+    if any(value is None for value in values):
+        raise ValueError('Invalid cursor.')
+    return values
+
+
+def page_size_from(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+# ----------------------------------------------------------------------
+#  KEYSET PAGINATION
+# ----------------------------------------------------------------------
+def _row_value(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    value = row
+    for part in field.split('__'):
+        value = getattr(value, part)
+    return value
+
+
+def ordering_fields(queryset, ordering):
+    """Model (or annotation output) field behind each name in ``ordering``."""
+    fields = []
+    for name in ordering:
+        name = name.lstrip('-')
+        if name in queryset.query.annotations:
+            fields.append(queryset.query.annotations[name].output_field)
+            continue
+        model, parts = queryset.model, name.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        try:
+            fields.append(model._meta.get_field(parts[-1]))
+        except FieldDoesNotExist:
+            raise ValueError(f'Cannot paginate on {name}.')
+    return fields
+
+
+def _after(ordering, values):
+    """Q selecting rows strictly after ``values`` in ``ordering``."""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Return ``(rows, next_cursor)`` for one page of ``queryset``.
+
+    ``ordering`` is a list such as ['-timestamp', '-id'] whose last field
+    must be unique. Instead of OFFSET, the next page starts after the last
+    row's ordering values, so every page costs the same index range scan
+    however deep the user scrolls. Columns must be non-null. Raises
+    ValueError for an invalid cursor.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, ordering_fields(queryset, ordering))
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([_row_value(last, f.lstrip('-')) for f in ordering])
+    return rows, next_cursor
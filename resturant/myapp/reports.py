@@ -0,0 +1,143 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, TruncDate
+
+from .models import InventoryHistory, MenuItem, OrderItem, RecipeIngredient
+from .rollups import BUSINESS_TZ
+
+LEVELS = ('orders', 'menu_items', 'categories', 'days')
+MEASURES = ['quantity', 'revenue', 'theoretical_cogs', 'actual_cogs']
+MONEY = ['revenue', 'theoretical_cogs', 'actual_cogs', 'theoretical_margin', 'actual_margin', 'variance']
+
+
+# ----------------------------------------------------------------------
+#  EXTRACTS (one flat query each, money cast to float in the database)
+# ----------------------------------------------------------------------
+def period_bounds(start, end):
+    """Aware datetimes covering business dates ``start`` to ``end`` inclusive."""
+    return (
+        datetime.combine(start, time.min, tzinfo=BUSINESS_TZ),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=BUSINESS_TZ),
+    )
+
+
+def _money(*fields):
+    expression = F(fields[0])
+    for field in fields[1:]:
+        expression = expression * F(field)
+    return Cast(expression, FloatField())
+
+
+def extract_lines(start, end):
+    """Order items of completed ('Ready') orders placed in the period."""
+    lo, hi = period_bounds(start, end)
+    rows = (
+        OrderItem.objects.filter(order__status='Ready', order__timestamp__gte=lo, order__timestamp__lt=hi)
+        .annotate(day=TruncDate('order__timestamp', tzinfo=BUSINESS_TZ), revenue=_money('total_price'))
+        .values_list('id', 'order_id', 'order__order_number', 'day', 'menu_item_id', 'quantity', 'revenue')
+    )
+    return pd.DataFrame.from_records(
+        list(rows),
+        columns=['order_item_id', 'order_id', 'order_number', 'day', 'menu_item_id', 'quantity', 'revenue'],
+    )
+
+
+def extract_usage(start, end):
+    """Actual ingredient cost ('Used' inventory history) of the same orders."""
+    lo, hi = period_bounds(start, end)
+    rows = (
+        InventoryHistory.objects.filter(
+            change_type='Used', order__status='Ready', order__timestamp__gte=lo, order__timestamp__lt=hi,
+        )
+        .annotate(cost=_money('quantity', 'unit_price'))
+        .values_list('order_id', 'order_item_id', 'cost')
+    )
+    return pd.DataFrame.from_records(list(rows), columns=['order_id', 'order_item_id', 'cost'])
+
+
+def extract_menu():
+    """Menu items with their recipe cost per portion (as Order.original_cogs prices it)."""
+    costs = pd.DataFrame.from_records(
+        list(RecipeIngredient.objects.annotate(cost=_money('quantity', 'unit_price')).values_list('recipe_id', 'cost')),
+        columns=['recipe_id', 'cost'],
+    ).groupby('recipe_id')['cost'].sum()
+    menu = pd.DataFrame.from_records(
+        list(MenuItem.objects.values_list('id', 'name', 'category', 'recipe_id')),
+        columns=['menu_item_id', 'menu_item', 'category', 'recipe_id'],
+    ).set_index('menu_item_id')
+    menu['unit_cost'] = menu['recipe_id'].map(costs).fillna(0.0)
+    return menu
+
+
+# ----------------------------------------------------------------------
+#  COMPUTATION
+# ----------------------------------------------------------------------
+def cost_lines(lines, usage, menu):
+    """Add theoretical and actual COGS columns to the order lines.
+
+    Theoretical COGS is quantity x recipe cost per portion. Actual COGS
+    is the usage recorded against each order item; usage linked only to
+    the order is spread over its lines by revenue share.
+    """
+    lines = lines.copy()
+    lines['theoretical_cogs'] = lines['quantity'] * lines['menu_item_id'].map(menu['unit_cost']).fillna(0.0)
+
+    linked = usage['order_item_id'].notna()
+    lines['actual_cogs'] = lines['order_item_id'].map(
+        usage[linked].groupby('order_item_id')['cost'].sum()
+    ).fillna(0.0)
+    unallocated = usage[~linked].groupby('order_id')['cost'].sum()
+    if not unallocated.empty:
+        share = (lines['revenue'] / lines.groupby('order_id')['revenue'].transform('sum')).fillna(0.0)
+        lines['actual_cogs'] += lines['order_id'].map(unallocated).fillna(0.0) * share
+    return lines
+
+
+def with_ratios(frame):
+    """Add margins, food-cost percentages and actual-vs-theoretical variance."""
+    revenue = frame['revenue'].replace(0, np.nan)
+    frame['theoretical_margin'] = frame['revenue'] - frame['theoretical_cogs']
+    frame['actual_margin'] = frame['revenue'] - frame['actual_cogs']
+    frame['theoretical_food_cost_pct'] = (frame['theoretical_cogs'] / revenue * 100).round(1)
+    frame['actual_food_cost_pct'] = (frame['actual_cogs'] / revenue * 100).round(1)
+    frame['variance'] = frame['actual_cogs'] - frame['theoretical_cogs']
+    frame[MONEY] = frame[MONEY].round(2)
+    return frame
+
+
+def records(frame):
+    """Rows as dicts of plain Python values (NaN becomes None), for templates and JSON."""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def build(start, end):
+    """Revenue, COGS and margin for ``start`` to ``end`` (business dates, inclusive).
+
+    Returns {'summary': dict, 'orders', 'menu_items', 'categories',
+    'days': DataFrames}. Three flat extracts are read and every level is
+    a pandas groupby over them, so the cost does not grow with query
+    round trips per order.
+    """
+    menu = extract_menu()
+    lines = cost_lines(extract_lines(start, end), extract_usage(start, end), menu)
+    lines['menu_item'] = lines['menu_item_id'].map(menu['menu_item'])
+    lines['category'] = lines['menu_item_id'].map(menu['category'])
+
+    def level(keys, sort, ascending=False):
+        frame = lines.groupby(keys, sort=False, dropna=False)[MEASURES].sum().reset_index()
+        return with_ratios(frame).sort_values(sort, ascending=ascending, ignore_index=True)
+
+    totals = lines[MEASURES].sum()
+    summary = with_ratios(pd.DataFrame([totals]))[MONEY + ['theoretical_food_cost_pct', 'actual_food_cost_pct']]
+    summary = {k: (None if pd.isna(v) else float(v)) for k, v in summary.iloc[0].items()}
+    summary.update(start=start, end=end, orders=int(lines['order_id'].nunique()), items_sold=int(totals['quantity']))
+    return {
+        'summary': summary,
+        'orders': level(['order_id', 'order_number', 'day'], ['day', 'order_number'], ascending=True),
+        'menu_items': level(['menu_item_id', 'menu_item', 'category'], 'revenue'),
+        'categories': level(['category'], 'revenue'),
+        'days': level(['day'], 'day', ascending=True),
+    }
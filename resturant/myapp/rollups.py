@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    DailyInventoryMovement, DailyMenuItemSales, DailySales, InventoryHistory,
+    Order, OrderItem,
+)
+from .signals import order_status_changed
+
+# Days are bucketed in the restaurant's local time, like the rest of the UI
+BUSINESS_TZ = ZoneInfo('Africa/Nairobi')
+
+
+def business_date(ts):
+    return timezone.localtime(ts, BUSINESS_TZ).date()
+
+
+def _add(model, key_fields, rows):
+    """Add ``rows`` ({field: value}) into ``model``'s rollup rows with one statement.
+
+    ``INSERT ... ON CONFLICT (key_fields) DO UPDATE`` adds every non-key
+    value to the existing row, or inserts the row if its key is new, so
+    any number of keys costs one query and concurrent writers cannot lose
+    an increment. Both PostgreSQL and SQLite support this syntax.
+    """
+    if not rows:
+        return
+    opts = model._meta
+    fields = [opts.get_field(name) for name in rows[0]]
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    columns = ', '.join(qn(f.column) for f in fields)
+    keys = ', '.join(qn(opts.get_field(name).column) for name in key_fields)
+    increments = ', '.join(
+        f'{qn(f.column)} = {table}.{qn(f.column)} + EXCLUDED.{qn(f.column)}'
+        for f in fields if f.name not in key_fields
+    )
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    params = [
+        f.get_db_prep_save(row[f.name], connection)
+        for row in rows for f in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholders] * len(rows))} '
+            f'ON CONFLICT ({keys}) DO UPDATE SET {increments}',
+            params,
+        )
+
+
+# ----------------------------------------------------------------------
+#  INCREMENTAL UPDATES
+# ----------------------------------------------------------------------
+def record_sales(order_ids):
+    """Add newly completed ('Ready') orders to the sales rollups.
+
+    Call exactly once per order, when it transitions to 'Ready'.
+    """
+    per_day = defaultdict(lambda: [0, Decimal('0.00')])
+    rows = Order.objects.filter(pk__in=order_ids, status='Ready').values_list('timestamp', 'total_price')
+    for ts, total in rows:
+        day = per_day[business_date(ts)]
+        day[0] += 1
+        day[1] += total
+
+    per_item = defaultdict(lambda: [0, Decimal('0.00')])
+    rows = OrderItem.objects.filter(order_id__in=order_ids, order__status='Ready').values_list(
+        'order__timestamp', 'menu_item_id', 'quantity', 'total_price'
+    )
+    for ts, menu_item_id, quantity, total in rows:
+        line = per_item[(business_date(ts), menu_item_id)]
+        line[0] += quantity
+        line[1] += total
+
+    with transaction.atomic(savepoint=False):
+        _add(DailySales, ['date'], [
+            {'date': date, 'orders': count, 'revenue': revenue}
+            for date, (count, revenue) in sorted(per_day.items())
+        ])
+        _add(DailyMenuItemSales, ['date', 'menu_item'], [
+            {'date': date, 'menu_item': menu_item_id, 'quantity': quantity, 'revenue': revenue}
+            for (date, menu_item_id), (quantity, revenue) in sorted(per_item.items())
+        ])
+
+    # An order placed before midnight and readied after it changes a past
+    # day, which long-cached menu engineering ranges would otherwise miss
+    if any(date < business_date(timezone.now()) for date, _ in per_item):
+        from . import menu_engineering  # imports this module
+        menu_engineering.mark_stale()
+
+
+def record_movements(entries):
+    """Add InventoryHistory rows (saved or about to be committed) to the rollups."""
+    per_key = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00')])
+    for h in entries:
+        ts = h.timestamp or timezone.now()
+        movement = per_key[(business_date(ts), h.item_id, h.change_type)]
+        movement[0] += h.quantity
+        movement[1] += h.quantity * h.unit_price
+
+    _add(DailyInventoryMovement, ['date', 'item', 'change_type'], [
+        {'date': date, 'item': item_id, 'change_type': change_type, 'quantity': quantity, 'value': value}
+        for (date, item_id, change_type), (quantity, value) in sorted(per_key.items())
+    ])
+
+
+@receiver(order_status_changed)
+def order_rollups(sender, order_ids, status, **kwargs):
+    if status == 'Ready':
+        record_sales(order_ids)
+
+
+@receiver(post_save, sender=InventoryHistory)
+def inventory_rollups(sender, instance, created, raw=False, **kwargs):
+    # bulk_create() skips this; callers that bulk insert call record_movements()
+    if created and not raw:
+        record_movements([instance])
+
+
+# ----------------------------------------------------------------------
+#  FULL REBUILD
+# ----------------------------------------------------------------------
+def rebuild(since=None):
+    """Recompute every rollup row from raw data, optionally from ``since`` (a date) on."""
+    day = TruncDate('timestamp', tzinfo=BUSINESS_TZ)
+    orders = Order.objects.filter(status='Ready')
+    items = OrderItem.objects.filter(order__status='Ready')
+    history = InventoryHistory.objects.all()
+    sales = DailySales.objects.all()
+    item_sales = DailyMenuItemSales.objects.all()
+    movements = DailyInventoryMovement.objects.all()
+    if since:
+        start = datetime.combine(since, time.min, tzinfo=BUSINESS_TZ)
+        orders = orders.filter(timestamp__gte=start)
+        items = items.filter(order__timestamp__gte=start)
+        history = history.filter(timestamp__gte=start)
+        sales = sales.filter(date__gte=since)
+        item_sales = item_sales.filter(date__gte=since)
+        movements = movements.filter(date__gte=since)
+
+    with transaction.atomic():
+        sales.delete()
+        item_sales.delete()
+        movements.delete()
+
+        DailySales.objects.bulk_create(
+            DailySales(date=r['day'], orders=r['count'], revenue=r['revenue'] or 0)
+            for r in orders.annotate(day=day).values('day')
+            .annotate(count=Count('id'), revenue=Sum('total_price')).order_by('day')
+        )
+        DailyMenuItemSales.objects.bulk_create(
+            DailyMenuItemSales(date=r['day'], menu_item_id=r['menu_item_id'],
+                               quantity=r['total_quantity'] or 0, revenue=r['revenue'] or 0)
+            for r in items.annotate(day=TruncDate('order__timestamp', tzinfo=BUSINESS_TZ))
+            .values('day', 'menu_item_id')
+            .annotate(total_quantity=Sum('quantity'), revenue=Sum('total_price')).order_by('day')
+        )
+        DailyInventoryMovement.objects.bulk_create(
+            DailyInventoryMovement(date=r['day'], item_id=r['item_id'], change_type=r['change_type'],
+                                   quantity=r['total_quantity'] or 0, value=r['total_value'] or 0)
+            for r in history.annotate(day=day).values('day', 'item_id', 'change_type')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_value=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField())),
+            ).order_by('day')
+        )
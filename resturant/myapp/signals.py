@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after one or more orders change status, including set-based
+# updates that bypass Order.save(), and with status 'Pending' when an
+# order is placed. Arguments: order_ids, status.
+order_status_changed = Signal()
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from django.db.models import Case, When, Value, F, DecimalField
+
+from . import availability
+from .models import InventoryItem
+
+
+class InsufficientStock(ValueError):
+    """Raised when a reservation cannot be met; carries the shortfall report."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        super().__init__('; '.join(
+            f"Not enough {s['name']}: {s['needed']} needed, only {s['available']} available"
+            for s in shortfalls
+        ))
+
+
+# ----------------------------------------------------------------------
+#  LOCKING
+# ----------------------------------------------------------------------
+def lock_inventory(item_ids):
+    """SELECT ... FOR UPDATE the given rows, always in primary key order.
+
+    Locking in a deterministic order means two terminals reserving
+    overlapping ingredients queue behind each other instead of
+    deadlocking. Must run inside transaction.atomic().
+    """
+    rows = InventoryItem.objects.select_for_update().filter(pk__in=item_ids).order_by('pk')
+    return {inv.pk: inv for inv in rows}
+
+
+def shortfall_report(demand, inventory):
+    """List every ingredient in ``demand`` that current stock cannot cover."""
+    shortfalls = []
+    for inv_id in sorted(demand):
+        needed = demand[inv_id]
+        inv = inventory.get(inv_id)
+        available = inv.quantity if inv else Decimal('0.00')
+        if available < needed:
+            shortfalls.append({
+                'item_id': inv_id,
+                'name': inv.name if inv else f'item #{inv_id}',
+                'units': inv.units if inv else '',
+                'needed': needed,
+                'available': available,
+                'short': needed - available,
+            })
+    return shortfalls
+
+
+# ----------------------------------------------------------------------
+#  RESERVATION
+# ----------------------------------------------------------------------
+def reserve_stock(demand):
+    """Atomically deduct ``demand`` ({inventory_item_id: quantity}) from stock.
+
+    Only the affected rows are locked, so orders touching different
+    ingredients proceed in parallel. Returns the locked id -> InventoryItem
+    map with quantities already reduced; raises InsufficientStock without
+    touching stock if any ingredient falls short. Must run inside
+    transaction.atomic().
+    """
+    inventory = lock_inventory(demand.keys())
+    shortfalls = shortfall_report(demand, inventory)
+    if shortfalls:
+        raise InsufficientStock(shortfalls)
+    if demand:
+        InventoryItem.objects.filter(pk__in=demand.keys()).update(
+            quantity=F('quantity') - Case(
+                *[When(pk=pk, then=Value(qty)) for pk, qty in demand.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+        for inv_id, needed in demand.items():
+            inventory[inv_id].quantity -= needed
+        availability.stock_changed(demand.keys())
+    return inventory
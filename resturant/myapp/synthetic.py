@@ -0,0 +1,391 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import availability, catalog, dashboard, forecasting, menu_engineering, rollups
+from .menu_sync import CATEGORY_MAP
+from .ordering import ingredient_usage
+from .models import (
+    DTable, InventoryHistory, InventoryItem, MenuItem, MenuItemIngredient, Order,
+    OrderCounter, OrderItem, Recipe, RecipeIngredient, Requisition, RequisitionCounter,
+    RequisitionHistory, RequisitionItem,
+)
+
+CHUNK_SIZE = 5000
+STOCK_LEVEL = Decimal('1000000')
+UNITS = ['kg', 'g', 'litres', 'pieces', 'packets']
+CATEGORIES = [choice for choice, _ in Recipe.CATEGORY_CHOICES]
+APPROVERS = ['operations_manager', 'finance', 'director']
+
+# Relative order volume by hour of day (lunch and dinner peaks) and by
+# weekday (Monday = 0), so reports and forecasts have a shape to find
+HOUR_WEIGHTS = {
+    7: 2, 8: 4, 9: 3, 10: 2, 11: 4, 12: 9, 13: 10, 14: 6, 15: 3,
+    16: 3, 17: 5, 18: 8, 19: 10, 20: 8, 21: 5, 22: 2,
+}
+WEEKDAY_WEIGHTS = [0.8, 0.85, 0.9, 1.0, 1.3, 1.5, 1.2]
+
+
+# ----------------------------------------------------------------------
+#  LOADING
+# ----------------------------------------------------------------------
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@contextmanager
+def _explicit_timestamps(*fields):
+    """Let inserts keep the timestamps we set on auto_now_add fields.
+
+    This flips the field definitions process-wide, which is fine for a
+    management command but not for a serving process.
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _copy_value(value):
+    # COPY text format: \N is NULL; backslash, tab and newlines are escaped
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _allocate_ids(model, count):
+    """Reserve ``count`` consecutive ids from the table's sequence; return the first."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+            [table, table, count],
+        )
+        return cursor.fetchone()[0] - count + 1
+
+
+def insert(model, objs):
+    """Insert unsaved ``objs`` and give them their primary keys.
+
+    PostgreSQL gets ids reserved from the sequence and one COPY per call,
+    several times faster than multi-row INSERTs at this volume. Other
+    databases use bulk_create.
+    """
+    if connection.vendor != 'postgresql' or not objs:
+        return model.objects.bulk_create(objs, batch_size=CHUNK_SIZE)
+
+    for pk, obj in enumerate(objs, _allocate_ids(model, len(objs))):
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = connection.alias
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write('\t'.join(
+            _copy_value(f.get_db_prep_save(f.pre_save(obj, True), connection)) for f in fields
+        ))
+        buffer.write('\n')
+
+    qn = connection.ops.quote_name
+    sql = f"COPY {qn(model._meta.db_table)} ({', '.join(qn(f.column) for f in fields)}) FROM STDIN"
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            buffer.seek(0)
+            raw.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    return objs
+
+
+def _timestamps(rng, count, days, now):
+    """``count`` timestamps over the last ``days`` days, oldest first."""
+    start = timezone.localdate(now) - timedelta(days=days - 1)
+    day_weights = [WEEKDAY_WEIGHTS[(start + timedelta(d)).weekday()] for d in range(days)]
+    hours, hour_weights = zip(*HOUR_WEIGHTS.items())
+    tz = timezone.get_current_timezone()
+    stamps = []
+    for day in rng.choices(range(days), weights=day_weights, k=count):
+        hour = rng.choices(hours, weights=hour_weights)[0]
+        moment = datetime.combine(start + timedelta(day), time(hour, rng.randrange(60), rng.randrange(60)))
+        stamps.append(min(timezone.make_aware(moment, tz), now))
+    return sorted(stamps)
+
+
+# ----------------------------------------------------------------------
+#  GENERATOR
+# ----------------------------------------------------------------------
+def generate(menu_items=50, ingredients=100, ingredients_per_recipe=5, orders=1000,
+             days=30, tables=20, requisitions=None, seed=0, progress=None):
+    """Create a synthetic restaurant dataset; the same arguments give the same data.
+
+    Builds ``ingredients`` inventory items, ``menu_items`` recipes with
+    their menu items (shaped as menu_sync would write them), ``tables``
+    tables, ``orders`` orders spread over the last ``days`` days with the
+    order items and inventory history place_order would record, weekly
+    restocks, and ``requisitions`` (default: two a day) with their items
+    and approval history. Rows are written in chunks (see insert()), then
+    the rollups, availability index and caches are rebuilt.
+
+    ``progress(message)`` is called after each chunk. Returns row counts.
+    """
+    if ingredients_per_recipe > ingredients:
+        raise ValueError('ingredients_per_recipe cannot exceed the number of ingredients.')
+    if days < 1:
+        raise ValueError('days must be at least 1.')
+    if requisitions is None:
+        requisitions = days * 2
+    progress = progress or (lambda message: None)
+    rng = random.Random(seed)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+
+    inv_names = [f'Ingredient {n:05d}' for n in range(1, ingredients + 1)]
+    if InventoryItem.objects.filter(name__in=inv_names[:1]).exists():
+        raise ValueError('Synthetic data is already present; use an empty database.')
+
+    history_ts = InventoryHistory._meta.get_field('timestamp')
+    with transaction.atomic():
+        inventory = InventoryItem.objects.bulk_create(
+            [
+                InventoryItem(
+                    name=name, units=rng.choice(UNITS), quantity=STOCK_LEVEL,
+                    unit_price=Decimal(rng.randrange(500, 20000, 50)),
+                )
+                for name in inv_names
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+        DTable.objects.bulk_create(
+            [DTable(name=f'Table {n}') for n in range(1, tables + 1)], ignore_conflicts=True,
+        )
+
+        recipes, recipe_ingredients = [], {}
+        for n in range(1, menu_items + 1):
+            rows = [(inv, Decimal(rng.randrange(5, 50)) / 100) for inv in rng.sample(inventory, ingredients_per_recipe)]
+            cost = sum((qty * inv.unit_price for inv, qty in rows), Decimal('0.00'))
+            profit = Decimal(rng.choice([20, 30, 40, 50, 60]))
+            recipe = Recipe(
+                name=f'Dish {n:05d}', category=rng.choice(CATEGORIES), profit_percentage=profit,
+                total_cost=cost.quantize(Decimal('0.01')),
+                selling_price=(cost * (1 + profit / 100)).quantize(Decimal('0.01')),
+            )
+            recipes.append(recipe)
+            recipe_ingredients[recipe.name] = rows
+        Recipe.objects.bulk_create(recipes, batch_size=CHUNK_SIZE)
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(recipe=r, inventory_item=inv, quantity=qty, unit_price=inv.unit_price)
+                for r in recipes for inv, qty in recipe_ingredients[r.name]
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+        menu = MenuItem.objects.bulk_create(
+            [
+                MenuItem(
+                    recipe=r, name=r.name, category=CATEGORY_MAP.get(r.category, 'Main Course'),
+                    price=max(r.selling_price, Decimal('0.01')),
+                )
+                for r in recipes
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+        MenuItemIngredient.objects.bulk_create(
+            [
+                MenuItemIngredient(menu_item=mi, inventory_item=inv, quantity_needed=qty, from_recipe=True)
+                for mi in menu for inv, qty in recipe_ingredients[mi.name]
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+
+        # opening stock, then a weekly delivery of every ingredient
+        restocks = []
+        for week in range(0, days, 7):
+            for inv in inventory:
+                restocks.append(InventoryHistory(
+                    item=inv, units=inv.units, unit_price=inv.unit_price, change_type='Added',
+                    quantity=inv.quantity if week == 0 else Decimal(rng.randrange(10, 500)),
+                    reason='Opening stock' if week == 0 else 'Weekly delivery',
+                    timestamp=start + timedelta(days=week, hours=6),
+                ))
+        with _explicit_timestamps(history_ts):
+            for chunk in _chunks(restocks):
+                insert(InventoryHistory, chunk)
+    progress(f'{len(inventory)} ingredients, {len(menu)} menu items, {len(restocks)} restocks')
+
+    counts = {
+        'inventory_items': len(inventory), 'recipes': len(recipes), 'menu_items': len(menu),
+        'tables': DTable.objects.count(), 'orders': orders, 'order_items': 0,
+        'inventory_history': len(restocks),
+    }
+    counts.update(_generate_orders(rng, menu, inventory, orders, days, now, progress))
+    counts['inventory_history'] += counts.pop('usage_history')
+    counts.update(_generate_requisitions(rng, inventory, requisitions, days, now, progress))
+
+    progress('Rebuilding rollups, availability and reorder suggestions')
+    rollups.rebuild()
+    availability.refresh()
+    forecasting.refresh()
+    catalog.invalidate()
+    dashboard.invalidate()
+    menu_engineering.invalidate()
+    return counts
+
+
+def _generate_orders(rng, menu, inventory, count, days, now, progress):
+    table_ids = list(DTable.objects.values_list('id', flat=True))
+    inventory = {inv.pk: inv for inv in inventory}
+    popularity = [rng.paretovariate(1.2) for _ in menu]
+    stamps = _timestamps(rng, count, days, now)
+    key = OrderCounter.current_key()
+    first_number = OrderCounter.lease_block(key, count) - count + 1 if count else 0
+    counts = {'order_items': 0, 'usage_history': 0}
+
+    with _explicit_timestamps(
+        Order._meta.get_field('timestamp'),
+        OrderItem._meta.get_field('created_at'),
+        InventoryHistory._meta.get_field('timestamp'),
+    ):
+        for offset, chunk in enumerate(_chunks(stamps)):
+            base = first_number + offset * CHUNK_SIZE
+            carts = []
+            for stamp in chunk:
+                cart = {}
+                for mi in rng.choices(menu, weights=popularity, k=rng.choice([1, 1, 2, 2, 3, 4])):
+                    cart[mi] = cart.get(mi, 0) + 1
+                carts.append(cart)
+
+            # Expand the whole chunk the way the POS does (recipe plus direct
+            # menu item ingredients), so usage history matches place_order's
+            lines, line_order = [], []
+            for n, cart in enumerate(carts):
+                lines.extend(cart.items())
+                line_order.extend([n] * len(cart))
+            usage = ingredient_usage(lines)
+            cogs = [Decimal('0.00')] * len(carts)
+            for line_no, _, inv_id, needed in usage:
+                cogs[line_order[line_no]] += needed * inventory[inv_id].unit_price
+
+            chunk_orders = []
+            for i, (stamp, cart) in enumerate(zip(chunk, carts)):
+                # the newest orders are still on the kitchen board
+                if now - stamp < timedelta(minutes=30):
+                    status = rng.choice(['Pending', 'Started'])
+                else:
+                    status = 'Canceled' if rng.random() < 0.04 else 'Ready'
+                started = stamp + timedelta(minutes=rng.randrange(1, 5))
+                chunk_orders.append(Order(
+                    order_number=f'{key}-{base + i:04d}', customer=f'Guest {rng.randrange(1, 500)}',
+                    table_id=rng.choice(table_ids) if table_ids else None, status=status,
+                    timestamp=stamp,
+                    start_time=started if status != 'Pending' else None,
+                    completed_at=started + timedelta(minutes=rng.randrange(5, 40))
+                    if status in ('Ready', 'Canceled') else None,
+                    total_price=sum((mi.price * q for mi, q in cart.items()), Decimal('0.00')),
+                    cogs_total=cogs[i].quantize(Decimal('0.01')),
+                ))
+
+            with transaction.atomic():
+                insert(Order, chunk_orders)
+                items = insert(OrderItem, [
+                    OrderItem(order=chunk_orders[line_order[line_no]], menu_item=mi, quantity=q,
+                              total_price=mi.price * q, created_at=chunk_orders[line_order[line_no]].timestamp)
+                    for line_no, (mi, q) in enumerate(lines)
+                ])
+                history = insert(InventoryHistory, [
+                    InventoryHistory(
+                        item=inventory[inv_id], units=inventory[inv_id].units, quantity=needed,
+                        unit_price=inventory[inv_id].unit_price,
+                        reason=f'Used for {menu_item.name} in order {items[line_no].order.order_number}',
+                        change_type='Used', order=items[line_no].order, order_item=items[line_no],
+                        timestamp=items[line_no].order.timestamp,
+                    )
+                    for line_no, menu_item, inv_id, needed in usage
+                    if items[line_no].order.status != 'Canceled'
+                ])
+            counts['order_items'] += len(items)
+            counts['usage_history'] += len(history)
+            progress(f'{min((offset + 1) * CHUNK_SIZE, count)} / {count} orders')
+    return counts
+
+
+def _generate_requisitions(rng, inventory, count, days, now, progress):
+    User = get_user_model()
+    users = {}
+    for role in ['staff'] + APPROVERS:
+        users[role], _ = User.objects.get_or_create(
+            username=f'seed_{role}', defaults={'role': role, 'is_approved': True},
+        )
+    stamps = _timestamps(rng, count, days, now)
+    first_number = RequisitionCounter.lease_block('', count) - count + 1 if count else 0
+    counts = {'requisitions': count, 'requisition_items': 0}
+
+    with _explicit_timestamps(
+        Requisition._meta.get_field('created_at'),
+        RequisitionHistory._meta.get_field('timestamp'),
+    ):
+        for offset, chunk in enumerate(_chunks(stamps)):
+            base = first_number + offset * CHUNK_SIZE
+            reqs, lines, events = [], [], []
+            for i, stamp in enumerate(chunk):
+                items = [
+                    RequisitionItem(
+                        item_name=inv.name, units=inv.units, quantity=Decimal(rng.randrange(5, 100)),
+                        unit_price=inv.unit_price,
+                    )
+                    for inv in rng.sample(inventory, min(rng.randint(3, 10), len(inventory)))
+                ]
+                for item in items:
+                    item.total_price = item.quantity * item.unit_price
+                # requisitions from the last two days are still going through approvals
+                decided = APPROVERS if now - stamp > timedelta(days=2) else APPROVERS[:rng.randrange(3)]
+                approvals, steps, moment = {}, [('submit', None)], stamp + timedelta(minutes=10)
+                for field in decided:
+                    approvals[field] = 'Rejected' if rng.random() < 0.05 else 'Approved'
+                    steps.append(('approve' if approvals[field] == 'Approved' else 'reject', field))
+                    if approvals[field] == 'Rejected':
+                        break
+                req = Requisition(
+                    requisition_number=f'REQ-{base + i:04d}', user=users['staff'], created_at=stamp,
+                    total_price=sum((item.total_price for item in items), Decimal('0.00')),
+                    is_archived=len(approvals) == 3 or 'Rejected' in approvals.values(),
+                    **{f'{field}_approval': value for field, value in approvals.items()},
+                )
+                reqs.append(req)
+                lines.append(items)
+                for action, field in steps:
+                    events.append((req, action, field, min(moment, now)))
+                    moment += timedelta(hours=rng.randrange(1, 12))
+
+            with transaction.atomic():
+                insert(Requisition, reqs)
+                items = []
+                for req, req_items in zip(reqs, lines):
+                    for item in req_items:
+                        item.requisition = req
+                    items.extend(req_items)
+                insert(RequisitionItem, items)
+                insert(RequisitionHistory, [
+                    RequisitionHistory(
+                        requisition=req, user=users[field or 'staff'], action=action, field=field,
+                        timestamp=moment,
+                    )
+                    for req, action, field, moment in events
+                ])
+            counts['requisition_items'] += len(items)
+            progress(f'{min((offset + 1) * CHUNK_SIZE, count)} / {count} requisitions')
+    return counts
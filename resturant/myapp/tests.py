@@ -1,3 +1,1349 @@
-from django.test import TestCase
+import csv
+import json
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import availability, catalog, costing, dashboard, forecasting, menu_engineering, rollups, synthetic
+from .batching import CommitBatch
+from .exports import HISTORY_COLUMNS
+from .menu_sync import pending_syncs, sync_menu_items
+from .numbering import BlockAllocator
+from .management.commands.check_query_plans import check_plans
+from .metrics import QueryBudgetExceeded
+from .models import (
+    CustomUser, DailyInventoryMovement, DailyMenuItemSales, DailySales, DTable, InventoryHistory,
+    InventoryItem, MenuItem, MenuItemAvailability, MenuItemIngredient, Order, OrderCounter, OrderItem,
+    Recipe, RecipeIngredient, ReorderSuggestion, Requisition, RequisitionCounter, order_numbers,
+)
+from .ordering import ingredient_usage, place_order, resolve_cart
+from .stock import InsufficientStock, reserve_stock
+from .transitions import MAX_BULK_ORDERS, TransitionConflict, transition_order
+
+
+def make_menu():
+    """Two dishes sharing rice: Beef Rice (0.5 rice, 0.25 beef) and Plain Rice (0.3 rice)."""
+    rice = InventoryItem.objects.create(name='Rice', units='kg', quantity=Decimal('10.00'), unit_price=Decimal('2000'))
+    beef = InventoryItem.objects.create(name='Beef', units='kg', quantity=Decimal('5.00'), unit_price=Decimal('15000'))
+    beef_rice = MenuItem.objects.create(name='Beef Rice', category='Main Course', price=Decimal('12000'))
+    plain_rice = MenuItem.objects.create(name='Plain Rice', category='Main Course', price=Decimal('3000'))
+    MenuItemIngredient.objects.bulk_create([
+        MenuItemIngredient(menu_item=beef_rice, inventory_item=rice, quantity_needed=Decimal('0.50')),
+        MenuItemIngredient(menu_item=beef_rice, inventory_item=beef, quantity_needed=Decimal('0.25')),
+        MenuItemIngredient(menu_item=plain_rice, inventory_item=rice, quantity_needed=Decimal('0.30')),
+    ])
+    return rice, beef, beef_rice, plain_rice
+
+
+def make_staff(username='kitchen'):
+    return CustomUser.objects.create_user(username=username, password='pw', is_staff=True, is_approved=True)
+
+
+# ----------------------------------------------------------------------
+#  STOCK RESERVATION
+# ----------------------------------------------------------------------
+class ReserveStockTests(TestCase):
+    def setUp(self):
+        self.rice, self.beef, self.beef_rice, self.plain_rice = make_menu()
+
+    def quantities(self):
+        return dict(InventoryItem.objects.values_list('name', 'quantity'))
+
+    def test_shortfall_is_reported_and_stock_untouched(self):
+        before = self.quantities()
+        with self.assertRaises(InsufficientStock) as ctx:
+            with transaction.atomic():
+                reserve_stock({self.rice.pk: Decimal('1.00'), self.beef.pk: Decimal('6.00')})
+        self.assertEqual(self.quantities(), before)
+        self.assertEqual(len(ctx.exception.shortfalls), 1)
+        shortfall = ctx.exception.shortfalls[0]
+        self.assertEqual(shortfall['item_id'], self.beef.pk)
+        self.assertEqual(shortfall['needed'], Decimal('6.00'))
+        self.assertEqual(shortfall['available'], Decimal('5.00'))
+        self.assertEqual(shortfall['short'], Decimal('1.00'))
+
+    def test_failed_order_writes_nothing(self):
+        lines = [(self.beef_rice, 30)]
+        with self.assertRaises(InsufficientStock):
+            place_order(Order(order_number='T-0001'), lines, ingredient_usage(lines))
+        self.assertEqual(self.quantities(), {'Rice': Decimal('10.00'), 'Beef': Decimal('5.00')})
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(InventoryHistory.objects.exists())
+
+    def test_pos_rejects_short_order_with_a_warning(self):
+        self.client.force_login(make_staff())
+        table = DTable.objects.create(name='T1')
+        with self.assertLogs('myapp.views', 'WARNING') as logs:
+            response = self.client.post(reverse('pos'), {
+                'submit-order': '1', 'table': table.pk, 'customer': 'Guest',
+                'order_items': json.dumps([{'id': self.beef_rice.pk, 'quantity': 30}]),
+            })
+        self.assertRedirects(response, reverse('pos'), fetch_redirect_response=False)
+        self.assertIn('Order rejected', logs.output[0])
+        self.assertFalse(Order.objects.exists())
+
+    def test_reservation_deducts_demand(self):
+        with transaction.atomic():
+            inventory = reserve_stock({self.rice.pk: Decimal('1.50'), self.beef.pk: Decimal('0.25')})
+        self.assertEqual(inventory[self.rice.pk].quantity, Decimal('8.50'))
+        self.assertEqual(self.quantities(), {'Rice': Decimal('8.50'), 'Beef': Decimal('4.75')})
+
+    def test_stock_decremented_once_per_line(self):
+        # both lines use rice: 2 x 0.5 + 3 x 0.3 = 1.9 kg, beef 2 x 0.25
+        lines = [(self.beef_rice, 2), (self.plain_rice, 3)]
+        order = place_order(Order(order_number='T-0002'), lines, ingredient_usage(lines))
+        self.assertEqual(self.quantities(), {'Rice': Decimal('8.10'), 'Beef': Decimal('4.50')})
+        used = order.inventory_usage.order_by('order_item_id', 'item_id')
+        self.assertEqual(
+            [(h.order_item.menu_item_id, h.item_id, h.quantity) for h in used],
+            [
+                (self.beef_rice.pk, self.rice.pk, Decimal('1.00')),
+                (self.beef_rice.pk, self.beef.pk, Decimal('0.50')),
+                (self.plain_rice.pk, self.rice.pk, Decimal('0.90')),
+            ],
+        )
+        self.assertEqual(order.total_price, Decimal('33000'))
+        self.assertEqual(order.cogs_total, Decimal('11300.00'))
+
+
+# ----------------------------------------------------------------------
+#  ORDER PLACEMENT
+# ----------------------------------------------------------------------
+class PlaceOrderQueryTests(TestCase):
+    def setUp(self):
+        self.table = DTable.objects.create(name='T1')
+        self.dishes = []
+        for n in range(12):
+            dish = MenuItem.objects.create(name=f'Dish {n}', category='Main Course', price=Decimal('5000'))
+            for part in ('a', 'b'):
+                item = InventoryItem.objects.create(
+                    name=f'Ingredient {n}{part}', units='kg', quantity=Decimal('100.00'), unit_price=Decimal('1000'))
+                MenuItemIngredient.objects.create(menu_item=dish, inventory_item=item, quantity_needed=Decimal('0.25'))
+            self.dishes.append(dish)
+
+    def place(self, number, dishes):
+        """Run the POS pipeline for one cart; returns the queries it ran, on-commit work included."""
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            lines = resolve_cart([{'id': dish.pk, 'quantity': 2} for dish in dishes])
+            place_order(Order(order_number=number, table=self.table), lines, ingredient_usage(lines))
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        one_line = self.place('Q-1', self.dishes[:1])
+        twelve_lines = self.place('Q-12', self.dishes)
+        self.assertEqual(one_line, twelve_lines)
+        self.assertEqual(Order.objects.get(order_number='Q-12').items.count(), 12)
+        self.assertEqual(InventoryHistory.objects.filter(order__order_number='Q-12').count(), 24)
+
+
+# ----------------------------------------------------------------------
+#  POS CATALOG
+# ----------------------------------------------------------------------
+class PosCatalogTests(TransactionTestCase):
+    """Real commits: menu item saves invalidate the catalog on commit."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(order_numbers.reset)
+        self.rice, self.beef, self.beef_rice, self.plain_rice = make_menu()
+        self.client.force_login(make_staff())
+
+    def fetch(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('pos_catalog'), **headers)
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()['items']], ['Beef Rice', 'Plain Rice'])
+        etag = response['ETag']
+        not_modified = self.fetch(etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_menu_item_change_invalidates(self):
+        etag = self.fetch()['ETag']
+        self.plain_rice.price = Decimal('3500')
+        self.plain_rice.save()
+        response = self.fetch(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(3500.0, [item['price'] for item in response.json()['items']])
+
+    @override_settings(QUERY_BUDGETS={})  # the flush removed the seeded order counter row
+    def test_order_submission_skips_catalog(self):
+        table = DTable.objects.create(name='T1')
+        with mock.patch.object(catalog, 'get_catalog') as get_catalog:
+            response = self.client.post(reverse('pos'), {
+                'submit-order': '1', 'table': table.pk, 'customer': 'Guest',
+                'order_items': json.dumps([{'id': self.plain_rice.pk, 'quantity': 1}]),
+            })
+        self.assertRedirects(response, reverse('pos'), fetch_redirect_response=False)
+        get_catalog.assert_not_called()
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class AvailabilityTests(TransactionTestCase):
+    """Real commits: stock and menu saves refresh the index on commit."""
+
+    def setUp(self):
+        self.rice, self.beef, self.beef_rice, self.plain_rice = make_menu()
+        self.water = MenuItem.objects.create(name='Water', category='Starters', price=Decimal('500'))
+        availability.refresh()
+        self.client.force_login(make_staff())
+
+    def portions(self):
+        return {
+            name: portions for name, portions in
+            MenuItemAvailability.objects.values_list('menu_item__name', 'portions')
+        }
+
+    def test_limiting_ingredient_sets_portions(self):
+        # 10 kg rice / 0.5 = 20, 5 kg beef / 0.25 = 20; 10 kg rice / 0.3 = 33
+        self.assertEqual(self.portions(), {'Beef Rice': 20, 'Plain Rice': 33, 'Water': None})
+        InventoryItem.objects.filter(pk=self.beef.pk).update(quantity=Decimal('2.00'))
+        self.assertEqual(availability.compute_portions([self.beef_rice.pk, self.plain_rice.pk]),
+                         {self.beef_rice.pk: 8, self.plain_rice.pk: 33})
+
+    def test_recipe_and_direct_ingredients_add_up(self):
+        recipe = Recipe.objects.create(name='Rice Bowl', category='Main Course')
+        RecipeIngredient.objects.create(recipe=recipe, inventory_item=self.rice, quantity=Decimal('0.20'))
+        self.plain_rice.recipe = recipe
+        self.plain_rice.save()
+        self.assertEqual(availability.compute_portions([self.plain_rice.pk]), {self.plain_rice.pk: 20})
+
+    def test_zero_stock_is_sold_out(self):
+        self.beef.quantity = Decimal('0.00')
+        self.beef.save()
+        self.assertEqual(self.portions(), {'Beef Rice': 0, 'Plain Rice': 33, 'Water': None})
+        InventoryItem.objects.filter(pk=self.beef.pk).update(quantity=Decimal('-1.00'))
+        self.assertEqual(availability.compute_portions([self.beef_rice.pk]), {self.beef_rice.pk: 0})
+
+    def test_refresh_upserts_only_changed_rows(self):
+        self.assertEqual(availability.refresh(), 0)
+        InventoryItem.objects.update(quantity=Decimal('1.50'))
+        table = connection.ops.quote_name(MenuItemAvailability._meta.db_table)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(availability.refresh(), 2)
+        writes = [q['sql'] for q in ctx.captured_queries if table in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(self.portions(), {'Beef Rice': 3, 'Plain Rice': 5, 'Water': None})
+
+    def test_etag_changes_with_stock(self):
+        response = self.client.get(reverse('pos_availability'))
+        self.assertEqual(response.json()[str(self.beef_rice.pk)], 20)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('pos_availability'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.beef.quantity = Decimal('1.00')
+        self.beef.save()
+        response = self.client.get(reverse('pos_availability'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[str(self.beef_rice.pk)], 4)
+
+
+# ----------------------------------------------------------------------
+#  RECIPE -> MENU SYNC
+# ----------------------------------------------------------------------
+class MenuSyncTests(TransactionTestCase):
+    """Real commits: the post_save sync runs once per transaction, on commit."""
+
+    def setUp(self):
+        self.rice = InventoryItem.objects.create(name='Rice', units='kg', quantity=Decimal('10.00'), unit_price=Decimal('2000'))
+        self.beef = InventoryItem.objects.create(name='Beef', units='kg', quantity=Decimal('5.00'), unit_price=Decimal('15000'))
+        self.salt = InventoryItem.objects.create(name='Salt', units='kg', quantity=Decimal('1.00'), unit_price=Decimal('500'))
+        self.recipe = Recipe.objects.create(name='Beef Rice', category='Main Course', profit_percentage=Decimal('20'))
+        RecipeIngredient.objects.create(recipe=self.recipe, inventory_item=self.rice, quantity=Decimal('0.50'))
+        RecipeIngredient.objects.create(recipe=self.recipe, inventory_item=self.beef, quantity=Decimal('0.25'))
+        self.recipe.update_cost_and_price()
+        self.menu_item = MenuItem.objects.get(recipe=self.recipe)
+
+    def rows(self):
+        return set(MenuItemIngredient.objects.filter(menu_item=self.menu_item).values_list(
+            'inventory_item__name', 'quantity_needed', 'from_recipe'))
+
+    def test_insert_mirrors_recipe(self):
+        self.assertEqual(self.menu_item.name, 'Beef Rice')
+        self.assertEqual(self.menu_item.category, 'Main Course')
+        self.assertEqual(self.menu_item.price, Decimal('5700.00'))  # (1000 + 3750) x 1.2
+        self.assertEqual(self.rows(), {('Rice', Decimal('0.50'), True), ('Beef', Decimal('0.25'), True)})
+
+    def test_update_changes_fields_and_quantities(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(name='Beef Fried Rice', category='Dessert')
+        RecipeIngredient.objects.filter(inventory_item=self.rice).update(quantity=Decimal('0.75'))
+        sync_menu_items([self.recipe.pk])
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.name, self.menu_item.category), ('Beef Fried Rice', 'Desserts'))
+        self.assertEqual(MenuItem.objects.count(), 1)
+        self.assertEqual(self.rows(), {('Rice', Decimal('0.75'), True), ('Beef', Decimal('0.25'), True)})
+
+    def test_delete_keeps_staff_added_rows(self):
+        MenuItemIngredient.objects.create(menu_item=self.menu_item, inventory_item=self.salt, quantity_needed=Decimal('0.01'))
+        RecipeIngredient.objects.filter(inventory_item=self.beef).delete()
+        sync_menu_items([self.recipe.pk])
+        self.assertEqual(self.rows(), {('Rice', Decimal('0.50'), True), ('Salt', Decimal('0.01'), False)})
+
+    def test_staff_row_for_a_recipe_ingredient_is_adopted(self):
+        MenuItemIngredient.objects.filter(inventory_item=self.beef).update(
+            quantity_needed=Decimal('0.40'), from_recipe=False)
+        sync_menu_items([self.recipe.pk])
+        self.assertEqual(self.rows(), {('Rice', Decimal('0.50'), True), ('Beef', Decimal('0.25'), True)})
+        RecipeIngredient.objects.filter(inventory_item=self.beef).delete()
+        sync_menu_items([self.recipe.pk])
+        self.assertEqual(self.rows(), {('Rice', Decimal('0.50'), True)})
+
+    def test_save_without_synced_fields_is_skipped(self):
+        self.recipe.description = 'House special'
+        with mock.patch.object(pending_syncs, 'handler') as handler:
+            self.recipe.save(update_fields=['description'])
+            handler.assert_not_called()
+        self.recipe.name = 'Beef Pilau'
+        self.recipe.save(update_fields=['name', 'description'])
+        self.menu_item.refresh_from_db()
+        self.assertEqual(self.menu_item.name, 'Beef Pilau')
+
+    def test_one_sync_per_transaction(self):
+        with mock.patch.object(pending_syncs, 'handler') as handler, transaction.atomic():
+            for quantity in ('0.60', '0.70'):
+                RecipeIngredient.objects.filter(inventory_item=self.rice).update(quantity=Decimal(quantity))
+                self.recipe.update_cost_and_price()
+        handler.assert_called_once_with({self.recipe.pk})
+
+
+# ----------------------------------------------------------------------
+#  RECIPE COSTING
+# ----------------------------------------------------------------------
+class RecipeCostingTests(TestCase):
+    def setUp(self):
+        self.rice = InventoryItem.objects.create(name='Rice', units='kg', quantity=Decimal('10.00'), unit_price=Decimal('2000'))
+        self.beef = InventoryItem.objects.create(name='Beef', units='kg', quantity=Decimal('5.00'), unit_price=Decimal('15000'))
+        self.recipes = {}
+        for name, percentage, ingredients in [
+            ('Beef Rice', '20', [(self.rice, '0.50'), (self.beef, '0.25')]),
+            ('Plain Rice', '50', [(self.rice, '0.30')]),
+            ('Beef Stew', '20', [(self.beef, '0.40')]),
+            ('Water', '20', []),
+        ]:
+            recipe = Recipe.objects.create(name=name, category='Main Course', profit_percentage=Decimal(percentage))
+            for item, quantity in ingredients:
+                RecipeIngredient.objects.create(recipe=recipe, inventory_item=item, quantity=Decimal(quantity))
+            MenuItem.objects.create(name=name, category='Main Course', price=Decimal('1.00'), recipe=recipe)
+            self.recipes[name] = recipe.pk
+        costing.recost_recipes(self.recipes.values(), reprice_menu=False)
+        # marks recipes the price change must not touch
+        Recipe.objects.filter(name__in=['Beef Stew', 'Water']).update(total_cost=Decimal('1.00'))
+
+    def costs(self):
+        return {name: (cost, price) for name, cost, price in Recipe.objects.values_list('name', 'total_cost', 'selling_price')}
+
+    def menu_prices(self):
+        return dict(MenuItem.objects.values_list('name', 'price'))
+
+    def change_rice_price(self, **kwargs):
+        InventoryItem.objects.filter(pk=self.rice.pk).update(unit_price=Decimal('4000'))
+        recipe_table = connection.ops.quote_name(Recipe._meta.db_table)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(costing.propagate_price_change([self.rice.pk], **kwargs), 2)
+        recipe_updates = [q for q in ctx.captured_queries if q['sql'].startswith(f'UPDATE {recipe_table}')]
+        self.assertEqual(len(recipe_updates), 1)
+
+    def test_price_change_recosts_only_affected_recipes(self):
+        self.change_rice_price(reprice_menu=False)
+        self.assertEqual(
+            set(RecipeIngredient.objects.filter(inventory_item=self.rice).values_list('unit_price', flat=True)),
+            {Decimal('4000.00')},
+        )
+        self.assertEqual(self.costs(), {
+            'Beef Rice': (Decimal('5750.00'), Decimal('6900.00')),   # 0.5 x 4000 + 0.25 x 15000, +20%
+            'Plain Rice': (Decimal('1200.00'), Decimal('1800.00')),  # 0.3 x 4000, +50%
+            'Beef Stew': (Decimal('1.00'), Decimal('7200.00')),
+            'Water': (Decimal('1.00'), Decimal('0.00')),
+        })
+
+    @override_settings(RECIPE_REPRICE_MENU_ITEMS=True)
+    def test_menu_items_follow_recipe_prices(self):
+        self.change_rice_price()
+        self.assertEqual(self.menu_prices(), {
+            'Beef Rice': Decimal('6900.00'), 'Plain Rice': Decimal('1800.00'),
+            'Beef Stew': Decimal('1.00'), 'Water': Decimal('1.00'),
+        })
+        self.assertEqual(costing.recost_recipes([self.recipes['Water']]), 1)
+        self.assertEqual(self.menu_prices()['Water'], Decimal('0.01'))  # floored, never free
+
+    @override_settings(RECIPE_REPRICE_MENU_ITEMS=False)
+    def test_menu_prices_kept_when_repricing_is_off(self):
+        self.change_rice_price()
+        self.assertEqual(self.costs()['Beef Rice'], (Decimal('5750.00'), Decimal('6900.00')))
+        self.assertEqual(set(self.menu_prices().values()), {Decimal('1.00')})
+
+
+# ----------------------------------------------------------------------
+#  ROLLUPS
+# ----------------------------------------------------------------------
+class RollupTests(TestCase):
+    def setUp(self):
+        self.rice, self.beef, self.beef_rice, self.plain_rice = make_menu()
+
+    def snapshot(self):
+        return (
+            sorted(DailySales.objects.values_list('date', 'orders', 'revenue')),
+            sorted(DailyMenuItemSales.objects.values_list('date', 'menu_item_id', 'quantity', 'revenue')),
+            sorted(DailyInventoryMovement.objects.values_list('date', 'item_id', 'change_type', 'quantity', 'value')),
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        for number, lines in enumerate([[(self.beef_rice, 2), (self.plain_rice, 1)], [(self.beef_rice, 1)]]):
+            order = place_order(Order(order_number=f'R-{number}'), lines, ingredient_usage(lines))
+            transition_order(order.pk, 'start')
+            transition_order(order.pk, 'ready')
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0][0][1:], (2, Decimal('39000.00')))
+        rollups.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_movements_upsert_in_one_query(self):
+        history = [
+            InventoryHistory(item=item, quantity=Decimal('1.00'), unit_price=item.unit_price, change_type=change_type)
+            for item in (self.rice, self.beef) for change_type in ('Added', 'Used')
+        ]
+        with self.assertNumQueries(1):
+            rollups.record_movements(history)
+        with self.assertNumQueries(1):
+            rollups.record_movements(history + history)
+        self.assertEqual(
+            set(DailyInventoryMovement.objects.values_list('item__name', 'change_type', 'quantity', 'value')),
+            {
+                ('Rice', 'Added', Decimal('3.00'), Decimal('6000.00')),
+                ('Rice', 'Used', Decimal('3.00'), Decimal('6000.00')),
+                ('Beef', 'Added', Decimal('3.00'), Decimal('45000.00')),
+                ('Beef', 'Used', Decimal('3.00'), Decimal('45000.00')),
+            },
+        )
+
+
+# ----------------------------------------------------------------------
+#  DASHBOARD
+# ----------------------------------------------------------------------
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rice, self.beef, self.beef_rice, self.plain_rice = make_menu()
+        self.today = rollups.business_date(timezone.now())
+
+    def test_ready_order_bumps_version(self):
+        lines = [(self.beef_rice, 1)]
+        order = place_order(Order(order_number='D-0001'), lines, ingredient_usage(lines))
+        version = dashboard.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order(order.pk, 'start')
+        self.assertEqual(dashboard.current_version(), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order(order.pk, 'ready')
+        self.assertEqual(dashboard.current_version(), version + 1)
+
+    def test_stock_added_bumps_version(self):
+        version = dashboard.current_version()
+        for change_type in ('Used', 'Added'):
+            with self.captureOnCommitCallbacks(execute=True):
+                InventoryHistory.objects.create(item=self.rice, units='kg', quantity=Decimal('1.00'),
+                                                unit_price=self.rice.unit_price, change_type=change_type)
+        self.assertEqual(dashboard.current_version(), version + 1)
+
+    def test_stale_entry_served_while_refreshing(self):
+        self.assertEqual(dashboard.get_context(self.today)['current_orders'], 0)
+        DailySales.objects.create(date=self.today, orders=3, revenue=Decimal('9000.00'))
+        dashboard.invalidate()
+        with mock.patch.object(dashboard.threading, 'Thread') as thread:
+            self.assertEqual(dashboard.get_context(self.today)['current_orders'], 0)
+            self.assertEqual(dashboard.get_context(self.today)['current_orders'], 0)
+        thread.assert_called_once()
+        # run the rebuild inline; the background wrapper would close the test's connection
+        dashboard._refresh(*thread.call_args.kwargs['args'])
+        self.assertEqual(dashboard.get_context(self.today)['current_orders'], 3)
+
+    def test_month_without_rollups_renders_zeros(self):
+        self.client.force_login(make_staff())
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        self.assertEqual(context['current_orders'], 0)
+        self.assertEqual(context['current_revenue'], Decimal('0.00'))
+        self.assertEqual(context['current_profit'], Decimal('0.00'))
+        self.assertEqual(context['top_items'], [])
+        revenue = json.loads(context['revenue_data'])
+        self.assertEqual(sorted(revenue), [str(year) for year in json.loads(context['years'])])
+        self.assertTrue(all(value == 0 for months in revenue.values() for value in months))
+
+
+# ----------------------------------------------------------------------
+#  ORDER NUMBERS
+# ----------------------------------------------------------------------
+class OrderNumberTests(TransactionTestCase):
+    def setUp(self):
+        self.allocator = BlockAllocator(OrderCounter.lease_block, block_size=5)
+
+    def counter(self, key='ORD'):
+        return OrderCounter.objects.filter(key=key).values_list('last_number', flat=True).first() or 0
+
+    def test_rest_of_block_is_released_on_commit(self):
+        with transaction.atomic():
+            self.assertEqual(self.allocator.next_number('ORD'), 1)
+            # not committed yet: a second number needs its own lease
+            self.assertEqual(self.allocator.next_number('ORD'), 6)
+        self.assertEqual(self.counter(), 10)
+        with self.assertNumQueries(0):
+            numbers = [self.allocator.next_number('ORD') for _ in range(8)]
+        self.assertEqual(numbers, [2, 3, 4, 5, 7, 8, 9, 10])
+        self.assertEqual(self.allocator.next_number('ORD'), 11)
+
+    def test_rolled_back_lease_reuses_its_numbers(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(self.allocator.next_number('ORD'), 1)
+                raise RuntimeError
+        self.assertEqual(self.counter(), 0)
+        self.assertEqual(self.allocator.next_number('ORD'), 1)
+        self.assertEqual(self.allocator.next_number('ORD'), 2)
+
+    @override_settings(ORDER_NUMBER_PREFIX='ORD', ORDER_NUMBER_DAILY=True)
+    def test_daily_key_restarts_numbering(self):
+        with mock.patch('myapp.models.timezone.localdate', return_value=date(2026, 1, 1)):
+            first = [OrderCounter.next_order_number() for _ in range(2)]
+        with mock.patch('myapp.models.timezone.localdate', return_value=date(2026, 1, 2)):
+            second = OrderCounter.next_order_number()
+        self.assertEqual(first, ['ORD-20260101-0001', 'ORD-20260101-0002'])
+        self.assertEqual(second, 'ORD-20260102-0001')
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite serialises writers by locking the whole table')
+    def test_concurrent_workers_get_unique_numbers(self):
+        # one allocator per thread, as in separate worker processes
+        numbers, errors = [], []
+
+        def worker():
+            allocator = BlockAllocator(OrderCounter.lease_block, block_size=3)
+            try:
+                for _ in range(10):
+                    numbers.append(allocator.next_number('ORD'))
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(numbers), 40)
+        self.assertEqual(len(set(numbers)), 40)
+        self.assertEqual(self.counter(), 4 * 12)
+
+    def test_failed_placement_does_not_hold_the_counter(self):
+        # the process-wide allocator would keep its block past the table flush
+        self.addCleanup(order_numbers.reset)
+        rice, beef, beef_rice, plain_rice = make_menu()
+        lines = [(beef_rice, 100)]
+        with self.assertRaises(InsufficientStock):
+            place_order(Order(), lines, ingredient_usage(lines))
+        # the lease committed on its own; the failed order skipped its number
+        self.assertEqual(OrderCounter.objects.get().last_number, getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 20))
+        self.assertFalse(Order.objects.exists())
+
+
+class ReconcileCountersTests(TestCase):
+    def setUp(self):
+        OrderCounter.objects.all().delete()
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_counters', *args, stdout=out)
+        return out.getvalue()
+
+    def test_counter_behind_is_moved_forward(self):
+        OrderCounter.objects.create(key='ORD', last_number=3)
+        Order.objects.create(order_number='ORD-0042')
+        self.assertIn('ORD: counter 3 -> 42', self.reconcile())
+        self.assertEqual(OrderCounter.objects.get(key='ORD').last_number, 42)
+
+    def test_counter_ahead_is_only_lowered_with_reclaim(self):
+        OrderCounter.objects.create(key='ORD', last_number=60)
+        Order.objects.create(order_number='ORD-0042')
+        self.assertIn('18 unused', self.reconcile())
+        self.assertEqual(OrderCounter.objects.get(key='ORD').last_number, 60)
+        self.reconcile('--reclaim', '--dry-run')
+        self.assertEqual(OrderCounter.objects.get(key='ORD').last_number, 60)
+        self.reconcile('--reclaim')
+        self.assertEqual(OrderCounter.objects.get(key='ORD').last_number, 42)
+
+    def test_requisition_counter_behind_is_moved_forward(self):
+        RequisitionCounter.objects.all().delete()
+        RequisitionCounter.objects.create(last_number=2)
+        user = make_staff()
+        Requisition.objects.bulk_create([
+            Requisition(user=user, requisition_number=f'REQ-{n:04d}') for n in (1, 7)
+        ])
+        self.assertIn('REQ: counter 2 -> 7', self.reconcile())
+        self.assertEqual(Requisition.objects.create(user=user).requisition_number, 'REQ-0008')
+
+
+class RequisitionNumberTests(TransactionTestCase):
+    """Requisition numbers are printed on approval documents: unique and gap-free."""
+
+    def setUp(self):
+        self.user = make_staff()
+
+    def create(self):
+        return Requisition.objects.create(user=self.user).requisition_number
+
+    def test_numbers_are_sequential(self):
+        self.assertEqual([self.create() for _ in range(3)], ['REQ-0001', 'REQ-0002', 'REQ-0003'])
+
+    def test_rolled_back_requisition_leaves_no_gap(self):
+        self.assertEqual(self.create(), 'REQ-0001')
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(self.create(), 'REQ-0002')
+                raise RuntimeError
+        self.assertEqual(RequisitionCounter.objects.get().last_number, 1)
+        self.assertEqual(self.create(), 'REQ-0002')
+        self.assertEqual(self.create(), 'REQ-0003')
+
+    def test_failed_save_leaves_no_gap(self):
+        self.assertEqual(self.create(), 'REQ-0001')
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Requisition.objects.create(user_id=self.user.pk + 1000)
+        self.assertEqual(self.create(), 'REQ-0002')
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite serialises writers by locking the whole table')
+    def test_concurrent_requisitions_are_unique_and_gap_free(self):
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(5):
+                    self.create()
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            sorted(Requisition.objects.values_list('requisition_number', flat=True)),
+            [f'REQ-{n:04d}' for n in range(1, 21)],
+        )
+
+
+# ----------------------------------------------------------------------
+#  REORDER FORECASTS
+# ----------------------------------------------------------------------
+class ForecastTests(TestCase):
+    def forecast(self, usage, cover_days=7):
+        return forecasting.forecast(np.array(usage, dtype=float), 0, cover_days, alpha=0.3, safety_factor=1.65)
+
+    def test_no_usage_forecasts_nothing(self):
+        level, expected, safety = self.forecast([[0.0] * 14, [0.0] * 14])
+        for values in (level, expected, safety):
+            self.assertEqual(values.tolist(), [0.0, 0.0])
+
+    def test_single_day_of_history(self):
+        level, expected, safety = self.forecast([[3.0]])
+        self.assertEqual(level.tolist(), [3.0])
+        self.assertAlmostEqual(expected[0], 21.0)
+        self.assertEqual(safety.tolist(), [0.0])
+
+    def test_steady_usage_has_no_safety_stock(self):
+        level, expected, safety = self.forecast([[2.0] * 21])
+        self.assertAlmostEqual(level[0], 2.0)
+        self.assertAlmostEqual(expected[0], 14.0)
+        self.assertAlmostEqual(safety[0], 0.0)
+
+    def test_refresh_stores_par_levels(self):
+        self.assertEqual(forecasting.refresh(), 0)
+        rice, beef, _, _ = make_menu()
+        today = rollups.business_date(timezone.now())
+        DailyInventoryMovement.objects.bulk_create([
+            DailyInventoryMovement(date=today - timedelta(days=day), item=rice, change_type='Used',
+                                   quantity=Decimal('2.00'), value=Decimal('4000.00'))
+            for day in range(1, 15)
+        ])
+        self.assertEqual(forecasting.refresh(history_days=14, cover_days=7), 2)
+        self.assertEqual(
+            dict(ReorderSuggestion.objects.values_list('item__name', 'par_level')),
+            {'Rice': Decimal('14.00'), 'Beef': Decimal('0.00')},
+        )
+        self.assertEqual(
+            [(s.item.name, s.shortfall, s.value) for s in forecasting.suggestions()],
+            [('Rice', Decimal('4.00'), Decimal('8000.00'))],
+        )
+
+
+class RequisitionPrefillTests(TestCase):
+    def setUp(self):
+        self.rice, self.beef, _, _ = make_menu()
+        ReorderSuggestion.objects.bulk_create([
+            ReorderSuggestion(item=self.rice, par_level=Decimal('14.00')),
+            ReorderSuggestion(item=self.beef, par_level=Decimal('6.50')),
+        ])
+        self.client.force_login(make_staff())
+
+    def prefill(self, item_ids):
+        response = self.client.post(reverse('requisition_prefill'), {'item_ids': item_ids})
+        self.assertRedirects(response, reverse('requisitions'), fetch_redirect_response=False)
+
+    def lines(self):
+        return list(Requisition.objects.get().items.order_by('item_name').values_list(
+            'item_name', 'units', 'quantity', 'unit_price', 'total_price'))
+
+    def test_selected_shortfalls_fill_one_draft(self):
+        self.prefill([self.rice.pk])
+        self.assertEqual(self.lines(), [('Rice', 'kg', Decimal('4.00'), Decimal('2000.00'), Decimal('8000.00'))])
+        self.prefill([self.rice.pk, self.beef.pk])
+        self.assertEqual(self.lines(), [
+            ('Beef', 'kg', Decimal('1.50'), Decimal('15000.00'), Decimal('22500.00')),
+            ('Rice', 'kg', Decimal('4.00'), Decimal('2000.00'), Decimal('8000.00')),
+        ])
+        draft = Requisition.objects.get()
+        self.assertEqual(draft.total_price, Decimal('30500.00'))
+        self.assertEqual(self.client.session['requisition_draft'], draft.pk)
+
+    def test_nothing_selected_creates_no_draft(self):
+        self.prefill([])
+        self.prefill(['abc'])
+        self.assertFalse(Requisition.objects.exists())
+
+
+# ----------------------------------------------------------------------
+#  COMMIT BATCHING
+# ----------------------------------------------------------------------
+class CommitBatchTests(TransactionTestCase):
+    """Real transactions: CommitBatch relies on Django's on_commit bookkeeping."""
+
+    def setUp(self):
+        self.calls = []
+        self.batch = CommitBatch(lambda ids: self.calls.append(set(ids)))
+
+    def test_one_handler_call_per_transaction(self):
+        with transaction.atomic():
+            for pk in (1, 2, 1, 3):
+                self.batch.add(pk)
+            self.assertEqual(len(connection.run_on_commit), 1)
+            self.assertEqual(self.calls, [])
+        self.assertEqual(self.calls, [{1, 2, 3}])
+
+    def test_outside_a_transaction_runs_immediately(self):
+        self.batch.add(7)
+        self.assertEqual(self.calls, [{7}])
+
+    def test_rolled_back_savepoint_drops_its_ids(self):
+        with transaction.atomic():
+            self.batch.add(1)
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.batch.add(2)
+                    raise RuntimeError
+            self.batch.add(3)
+        self.assertEqual(self.calls, [{1, 3}])
+
+    def test_rolled_back_savepoint_then_new_savepoint(self):
+        with transaction.atomic():
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.batch.add(1)
+                    raise RuntimeError
+            with transaction.atomic():
+                self.batch.add(2)
+        self.assertEqual(self.calls, [{2}])
+
+    def test_released_savepoint_keeps_its_ids(self):
+        with transaction.atomic():
+            self.batch.add(1)
+            with transaction.atomic():
+                self.batch.add(2)
+        self.assertEqual(self.calls, [{1}, {2}])
+
+    def test_block_without_savepoint_joins_its_parent(self):
+        with transaction.atomic():
+            self.batch.add(1)
+            with transaction.atomic(savepoint=False):
+                self.batch.add(2)
+        self.assertEqual(self.calls, [{1, 2}])
+
+    def test_new_transaction_after_outer_rollback(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.batch.add(1)
+                raise RuntimeError
+        self.assertEqual(self.calls, [])
+        with transaction.atomic():
+            self.batch.add(2)
+        self.assertEqual(self.calls, [{2}])
+
+    def test_suppressed_ids_are_dropped(self):
+        with transaction.atomic():
+            with self.batch.suppressed():
+                self.batch.add(1)
+            self.batch.add(2)
+        with self.batch.suppressed():
+            self.batch.add(3)
+        self.assertEqual(self.calls, [{2}])
+
+    def test_order_total_after_item_edits_in_one_transaction(self):
+        rice, beef, beef_rice, plain_rice = make_menu()
+        order = Order.objects.create(order_number='C-0001')
+        with CaptureQueriesContext(connection) as ctx, transaction.atomic():
+            first = OrderItem.objects.create(order=order, menu_item=beef_rice, quantity=1)
+            second = OrderItem.objects.create(order=order, menu_item=plain_rice, quantity=2)
+            OrderItem.objects.create(order=order, menu_item=plain_rice, quantity=5)
+            first.quantity = 3
+            first.save()
+            second.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('51000.00'))  # 3 x 12000 + 5 x 3000
+        order_updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_order"')]
+        self.assertEqual(len(order_updates), 1)
+
+
+# ----------------------------------------------------------------------
+#  DATA MIGRATIONS
+# ----------------------------------------------------------------------
+class MigrationTestCase(TransactionTestCase):
+    """Roll myapp back to ``migrate_from``, seed rows with setUpBeforeMigration(apps), then apply ``migrate_to``."""
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('myapp', self.migrate_from)])
+        self.setUpBeforeMigration(executor.loader.project_state([('myapp', self.migrate_from)]).apps)
+        executor = MigrationExecutor(connection)
+        executor.migrate([('myapp', self.migrate_to)])
+        self.apps = executor.loader.project_state([('myapp', self.migrate_to)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+
+class BackfillInventoryUsageMigrationTests(MigrationTestCase):
+    migrate_from = '0016_inventoryhistory_order_links'
+    migrate_to = '0017_backfill_inventory_usage'
+
+    def setUpBeforeMigration(self, apps):
+        InventoryItem = apps.get_model('myapp', 'InventoryItem')
+        MenuItem = apps.get_model('myapp', 'MenuItem')
+        Order = apps.get_model('myapp', 'Order')
+        OrderItem = apps.get_model('myapp', 'OrderItem')
+        InventoryHistory = apps.get_model('myapp', 'InventoryHistory')
+        rice = InventoryItem.objects.create(name='Rice', units='kg', quantity=Decimal('10.00'), unit_price=Decimal('2000'))
+        beef = InventoryItem.objects.create(name='Beef', units='kg', quantity=Decimal('5.00'), unit_price=Decimal('15000'))
+        beef_rice = MenuItem.objects.create(name='Beef Rice', category='Main Course', price=Decimal('12000'))
+        plain_rice = MenuItem.objects.create(name='Plain Rice', category='Main Course', price=Decimal('3000'))
+        order = Order.objects.create(order_number='M-1', status='Ready', total_price=Decimal('15000'))
+        Order.objects.create(order_number='M-2', status='Ready', total_price=Decimal('3000'))
+        self.beef_rice_line = OrderItem.objects.create(order=order, menu_item=beef_rice, quantity=1, total_price=Decimal('12000')).pk
+        self.plain_rice_line = OrderItem.objects.create(order=order, menu_item=plain_rice, quantity=1, total_price=Decimal('3000')).pk
+        self.order = order.pk
+        for item, quantity, reason, change_type in [
+            (rice, '0.50', 'Used for Beef Rice in order M-1', 'Used'),
+            (beef, '0.25', 'Used for Beef Rice in order M-1', 'Used'),
+            (rice, '0.30', 'Used for Plain Rice in order M-1', 'Used'),
+            (rice, '0.30', 'Used for Plain Rice in order M-9', 'Used'),
+            (rice, '5.00', 'Restock', 'Added'),
+        ]:
+            InventoryHistory.objects.create(item=item, units=item.units, quantity=Decimal(quantity),
+                                            unit_price=item.unit_price, reason=reason, change_type=change_type)
+
+    def test_usage_is_linked_and_costed(self):
+        InventoryHistory = self.apps.get_model('myapp', 'InventoryHistory')
+        Order = self.apps.get_model('myapp', 'Order')
+        self.assertEqual(
+            sorted(InventoryHistory.objects.values_list('reason', 'item__name', 'order_id', 'order_item_id')),
+            [
+                ('Restock', 'Rice', None, None),
+                ('Used for Beef Rice in order M-1', 'Beef', self.order, self.beef_rice_line),
+                ('Used for Beef Rice in order M-1', 'Rice', self.order, self.beef_rice_line),
+                ('Used for Plain Rice in order M-1', 'Rice', self.order, self.plain_rice_line),
+                ('Used for Plain Rice in order M-9', 'Rice', None, None),
+            ],
+        )
+        self.assertEqual(dict(Order.objects.values_list('order_number', 'cogs_total')),
+                         {'M-1': Decimal('5350.00'), 'M-2': Decimal('0.00')})
+
+
+class BackfillRollupsMigrationTests(MigrationTestCase):
+    migrate_from = '0017_backfill_inventory_usage'
+    migrate_to = '0018_daily_rollups'
+
+    def setUpBeforeMigration(self, apps):
+        rice = apps.get_model('myapp', 'InventoryItem').objects.create(
+            name='Rice', units='kg', quantity=Decimal('10.00'), unit_price=Decimal('2000'))
+        dish = apps.get_model('myapp', 'MenuItem').objects.create(
+            name='Plain Rice', category='Main Course', price=Decimal('3000'))
+        Order = apps.get_model('myapp', 'Order')
+        for number, status in enumerate(['Ready', 'Ready', 'Pending']):
+            order = Order.objects.create(order_number=f'M-{number}', status=status, total_price=Decimal('6000'))
+            apps.get_model('myapp', 'OrderItem').objects.create(
+                order=order, menu_item=dish, quantity=2, total_price=Decimal('6000'))
+        apps.get_model('myapp', 'InventoryHistory').objects.create(
+            item=rice, units='kg', quantity=Decimal('0.60'), unit_price=Decimal('2000'),
+            reason='Used for Plain Rice in order M-0', change_type='Used')
+
+    def test_existing_history_is_rolled_up(self):
+        DailySales = self.apps.get_model('myapp', 'DailySales')
+        DailyMenuItemSales = self.apps.get_model('myapp', 'DailyMenuItemSales')
+        DailyInventoryMovement = self.apps.get_model('myapp', 'DailyInventoryMovement')
+        today = rollups.business_date(timezone.now())
+        self.assertEqual(list(DailySales.objects.values_list('date', 'orders', 'revenue')),
+                         [(today, 2, Decimal('12000.00'))])
+        self.assertEqual(list(DailyMenuItemSales.objects.values_list('quantity', 'revenue')),
+                         [(4, Decimal('12000.00'))])
+        self.assertEqual(list(DailyInventoryMovement.objects.values_list('change_type', 'quantity', 'value')),
+                         [('Used', Decimal('0.60'), Decimal('1200.00'))])
+
+
+# ----------------------------------------------------------------------
+#  ORDER TRANSITIONS
+# ----------------------------------------------------------------------
+class TransitionOrderTests(TestCase):
+    def setUp(self):
+        self.table = DTable.objects.create(name='T1', is_occupied=True)
+        self.order = Order.objects.create(order_number='T-0001', table=self.table)
+        self.client.force_login(make_staff())
+
+    def post(self, action, order_id=None, **data):
+        url = reverse('order_transition', args=[order_id or self.order.pk])
+        return self.client.post(url, {'action': action, **data})
+
+    def refresh(self):
+        self.order.refresh_from_db()
+        self.table.refresh_from_db()
+
+    def test_start_keeps_table_occupied(self):
+        response = self.post('start')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['order']['status'], 'Started')
+        self.refresh()
+        self.assertEqual(self.order.status, 'Started')
+        self.assertIsNotNone(self.order.start_time)
+        self.assertTrue(self.table.is_occupied)
+
+    def test_ready_frees_table(self):
+        transition_order(self.order.pk, 'start')
+        self.assertEqual(self.post('ready').status_code, 200)
+        self.refresh()
+        self.assertEqual(self.order.status, 'Ready')
+        self.assertIsNotNone(self.order.completed_at)
+        self.assertFalse(self.table.is_occupied)
+
+    def test_cancel_frees_table(self):
+        self.assertEqual(self.post('cancel').status_code, 200)
+        self.refresh()
+        self.assertEqual(self.order.status, 'Canceled')
+        self.assertFalse(self.table.is_occupied)
+
+    def test_wrong_state_returns_409_and_changes_nothing(self):
+        response = self.post('ready')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['current_status'], 'Pending')
+        self.refresh()
+        self.assertEqual(self.order.status, 'Pending')
+        self.assertIsNone(self.order.completed_at)
+        self.assertTrue(self.table.is_occupied)
+
+    def test_second_of_two_racing_requests_conflicts(self):
+        transition_order(self.order.pk, 'start')
+        transition_order(self.order.pk, 'ready')
+        with self.assertRaises(TransitionConflict) as ctx:
+            transition_order(self.order.pk, 'cancel')
+        self.assertEqual(ctx.exception.current_status, 'Ready')
+
+    def test_stale_expected_status_returns_409(self):
+        transition_order(self.order.pk, 'start')
+        response = self.post('cancel', expected='Pending')
+        self.assertEqual(response.status_code, 409)
+        self.refresh()
+        self.assertEqual(self.order.status, 'Started')
+
+    def test_missing_order_and_unknown_action(self):
+        self.assertEqual(self.post('start', order_id=self.order.pk + 1000).status_code, 404)
+        self.assertEqual(self.post('serve').status_code, 400)
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.tables = [DTable.objects.create(name=f'T{n}', is_occupied=True) for n in range(1, 4)]
+        self.pending, self.started, self.ready = [
+            Order.objects.create(order_number=f'B-000{n}', table=table, status=status)
+            for n, (table, status) in enumerate(zip(self.tables, ['Pending', 'Started', 'Ready']), 1)
+        ]
+        self.client.force_login(make_staff())
+
+    def post(self, action, order_ids):
+        return self.client.post(reverse('orders_bulk_transition'), {'action': action, 'order_ids': order_ids})
+
+    def statuses(self):
+        return dict(Order.objects.values_list('order_number', 'status'))
+
+    def occupied(self):
+        return dict(DTable.objects.values_list('name', 'is_occupied'))
+
+    def test_conflicts_and_missing_orders_are_reported_and_skipped(self):
+        missing = self.ready.pk + 1000
+        response = self.post('start', [self.pending.pk, self.started.pk, self.ready.pk, missing])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['updated'], 1)
+        self.assertEqual(body['results'], [
+            {'id': self.pending.pk, 'result': 'ok', 'status': 'Started'},
+            {'id': self.started.pk, 'result': 'conflict', 'status': 'Started'},
+            {'id': self.ready.pk, 'result': 'conflict', 'status': 'Ready'},
+            {'id': missing, 'result': 'not_found', 'status': None},
+        ])
+        self.assertEqual(self.statuses(), {'B-0001': 'Started', 'B-0002': 'Started', 'B-0003': 'Ready'})
+        self.assertEqual(self.occupied(), {'T1': True, 'T2': True, 'T3': True})
+
+    def test_terminal_action_frees_only_updated_tables(self):
+        body = self.post('cancel', [self.pending.pk, self.started.pk, self.ready.pk]).json()
+        self.assertEqual(body['updated'], 2)
+        self.assertEqual([r['result'] for r in body['results']], ['ok', 'ok', 'conflict'])
+        self.assertEqual(self.statuses(), {'B-0001': 'Canceled', 'B-0002': 'Canceled', 'B-0003': 'Ready'})
+        # T3's order was already Ready and stays untouched
+        self.assertEqual(self.occupied(), {'T1': False, 'T2': False, 'T3': True})
+
+    def test_duplicate_ids_are_applied_once(self):
+        body = self.post('ready', [self.started.pk, self.started.pk]).json()
+        self.assertEqual(body['updated'], 1)
+        self.assertEqual(len(body['results']), 1)
+        self.assertFalse(DTable.objects.get(name='T2').is_occupied)
+
+    def test_invalid_requests_return_400(self):
+        self.assertEqual(self.post('serve', [self.pending.pk]).status_code, 400)
+        self.assertEqual(self.post('start', ['abc']).status_code, 400)
+        self.assertEqual(self.post('start', list(range(1, MAX_BULK_ORDERS + 2))).status_code, 400)
+        self.assertEqual(self.statuses()['B-0001'], 'Pending')
+
+
+# ----------------------------------------------------------------------
+#  EXPORTS
+# ----------------------------------------------------------------------
+class InventoryHistoryExportTests(TestCase):
+    def setUp(self):
+        rice, beef, _, _ = make_menu()
+        InventoryHistory.objects.bulk_create([
+            InventoryHistory(item=item, units=item.units, quantity=Decimal('1.00'), unit_price=item.unit_price,
+                             change_type=change_type, reason='')
+            for item in (rice, beef) for change_type in ('Added', 'Used')
+        ])
+        self.client.force_login(make_staff())
+
+    def export(self, kind):
+        return self.client.get(reverse('inventory_history'), {'export': kind})
+
+    def test_csv_streams_every_row(self):
+        response = self.export('csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="inventory_history.csv"')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], HISTORY_COLUMNS)
+        self.assertEqual(len(rows) - 1, 4)
+        self.assertEqual({row[7] for row in rows[1:]}, {'Manual'})
+
+    def test_xlsx_has_every_row(self):
+        response = self.export('excel')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="inventory_history.xlsx"')
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.values)
+        self.assertEqual(list(rows[0]), HISTORY_COLUMNS)
+        self.assertEqual(len(rows) - 1, 4)
+
+    @override_settings(XLSX_EXPORT_MAX_ROWS=3)
+    def test_large_xlsx_falls_back_to_csv(self):
+        response = self.export('excel')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="inventory_history.csv"')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 5)
+
+
+# ----------------------------------------------------------------------
+#  PROFIT REPORT
+# ----------------------------------------------------------------------
+class ProfitReportTests(TestCase):
+    def setUp(self):
+        self.rice, self.beef, self.beef_rice, self.plain_rice = make_menu()
+        recipe = Recipe.objects.create(name='Beef Rice', category='Main Course')
+        RecipeIngredient.objects.create(recipe=recipe, inventory_item=self.rice, quantity=Decimal('0.50'))
+        RecipeIngredient.objects.create(recipe=recipe, inventory_item=self.beef, quantity=Decimal('0.25'))
+        MenuItem.objects.filter(pk=self.beef_rice.pk).update(recipe=recipe)
+        for number, lines, ready in [
+            ('P-1', [(self.beef_rice, 2)], True),
+            ('P-2', [(self.plain_rice, 1)], True),
+            ('P-3', [(self.beef_rice, 1)], False),
+        ]:
+            order = place_order(Order(order_number=number), lines, ingredient_usage(lines))
+            if ready:
+                transition_order(order.pk, 'start')
+                transition_order(order.pk, 'ready')
+        self.today = rollups.business_date(timezone.now())
+        self.client.force_login(make_staff())
+
+    def report(self, start, end, **params):
+        return self.client.get(reverse('reports'), {'start_date': start, 'end_date': end, **params})
+
+    def test_range_with_orders(self):
+        response = self.report(self.today, self.today)
+        self.assertEqual(response.status_code, 200)
+        summary = response.context['summary']
+        self.assertEqual((summary['orders'], summary['items_sold']), (2, 3))
+        self.assertEqual(summary['revenue'], 27000.0)
+        self.assertEqual(summary['theoretical_cogs'], 9500.0)  # 2 x (0.5 x 2000 + 0.25 x 15000); Plain Rice has no recipe
+        self.assertEqual(summary['actual_cogs'], 10100.0)      # + 0.3 x 2000 used for Plain Rice
+        self.assertEqual(summary['variance'], 600.0)
+        self.assertEqual(
+            [(row['menu_item'], row['quantity'], row['revenue']) for row in response.context['menu_items']],
+            [('Beef Rice', 2, 24000.0), ('Plain Rice', 1, 3000.0)],
+        )
+
+    def test_csv_export_of_a_level(self):
+        response = self.report(self.today, self.today, export='csv', level='menu_items')
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="profit_menu_items_{self.today:%Y%m%d}_{self.today:%Y%m%d}.csv"')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:3], ['menu_item_id', 'menu_item', 'category'])
+        self.assertEqual(len(rows) - 1, 2)
+
+    def test_empty_range(self):
+        response = self.report('2020-01-01', '2020-01-31')
+        self.assertEqual(response.status_code, 200)
+        summary = response.context['summary']
+        self.assertEqual((summary['orders'], summary['items_sold'], summary['revenue']), (0, 0, 0.0))
+        self.assertIsNone(summary['actual_food_cost_pct'])
+        self.assertEqual(response.context['menu_items'], [])
+        self.assertEqual(response.context['days'], [])
+
+    def test_range_over_limit_is_rejected(self):
+        first_of_month = self.today.replace(day=1)
+        response = self.report('2024-01-01', '2024-12-31')  # 366 days, the limit
+        self.assertEqual(response.context['start_date'], '2024-01-01')
+        response = self.report('2024-01-01', '2025-01-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('at most 366 days', [str(m) for m in response.context['messages']][0])
+        self.assertEqual(response.context['start_date'], first_of_month.strftime('%Y-%m-%d'))
+        self.assertEqual(
+            self.client.get(reverse('menu_engineering'), {'start_date': '2024-01-01', 'end_date': '2025-01-01'}).status_code,
+            400,
+        )
+
+
+# ----------------------------------------------------------------------
+#  MENU ENGINEERING
+# ----------------------------------------------------------------------
+class MenuEngineeringTests(TestCase):
+    start, end = date(2026, 1, 1), date(2026, 1, 31)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(make_staff())
+
+    def seed(self):
+        # (price, food cost, units): unit margins 600 / 200 / 1000 / 200
+        for name, price, food_cost, units in [
+            ('Steak', '1000', '400', 40),
+            ('Chips', '200', None, 40),
+            ('Lobster', '1000', None, 5),
+            ('Soup', '200', None, 5),
+        ]:
+            recipe = None
+            if food_cost:
+                recipe = Recipe.objects.create(name=name, category='Main Course')
+                Recipe.objects.filter(pk=recipe.pk).update(total_cost=Decimal(food_cost))
+            item = MenuItem.objects.create(name=name, category='Main Course', price=Decimal(price), recipe=recipe)
+            DailyMenuItemSales.objects.create(date=date(2026, 1, 5), menu_item=item, quantity=units,
+                                              revenue=Decimal(price) * units)
+        # outside the range
+        DailyMenuItemSales.objects.create(date=date(2026, 2, 1), menu_item=item, quantity=100, revenue=Decimal('20000'))
+
+    def analysis(self):
+        response = self.client.get(reverse('menu_engineering'), {'start_date': '2026-01-01', 'end_date': '2026-01-31'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['status'], 'success')
+        return body
+
+    def test_items_are_classified(self):
+        self.seed()
+        body = self.analysis()
+        # 0.7 / 4 items; (40 x 600 + 40 x 200 + 5 x 1000 + 5 x 200) / 90 units
+        self.assertEqual(body['thresholds'], {'popularity_share': 0.175, 'unit_margin': 422.22})
+        self.assertEqual(body['totals'], {'units': 90, 'revenue': 54000.0, 'margin': 38000.0})
+        self.assertEqual(body['counts'], {'star': 1, 'plowhorse': 1, 'puzzle': 1, 'dog': 1})
+        self.assertEqual(
+            [(item['name'], item['class'], item['unit_margin'], item['has_recipe']) for item in body['items']],
+            [('Steak', 'star', 600.0, True), ('Chips', 'plowhorse', 200.0, False),
+             ('Lobster', 'puzzle', 1000.0, False), ('Soup', 'dog', 200.0, False)],
+        )
+
+    def test_empty_menu(self):
+        body = self.analysis()
+        self.assertEqual(body['items'], [])
+        self.assertEqual(body['totals'], {'units': 0, 'revenue': 0.0, 'margin': 0.0})
+        self.assertEqual(body['thresholds'], {'popularity_share': 0.0, 'unit_margin': 0.0})
+        self.assertEqual(body['counts'], {'star': 0, 'plowhorse': 0, 'puzzle': 0, 'dog': 0})
+
+    def test_no_sales_in_range(self):
+        self.seed()
+        result = menu_engineering.analyze(date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(result['totals']['units'], 0)
+        self.assertEqual({item['units'] for item in result['items']}, {0})
+        # nothing sold: nothing is popular, and every margin clears the 0 threshold
+        self.assertEqual(result['counts'], {'star': 0, 'plowhorse': 0, 'puzzle': 4, 'dog': 0})
+
+
+# ----------------------------------------------------------------------
+#  QUERY PLANS
+# ----------------------------------------------------------------------
+@skipUnless(connection.vendor in ('postgresql', 'sqlite'), 'EXPLAIN output is only parsed for PostgreSQL and SQLite')
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_an_index(self):
+        for label, scans in check_plans():
+            with self.subTest(label):
+                self.assertEqual(scans, [])
+
+
+# ----------------------------------------------------------------------
+#  QUERY BUDGETS
+# ----------------------------------------------------------------------
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class QueryBudgetTests(TestCase):
+    """Load the busy pages against seeded data; an over-budget view raises."""
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.generate(menu_items=12, ingredients=30, ingredients_per_recipe=4, orders=300, days=14, tables=6)
+        cls.user = make_staff()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_orders(self):
+        next_page = self.get('orders').context['next_page']
+        self.assertTrue(next_page)
+        self.get('orders', **QueryDict(next_page).dict())
+        self.get('orders', status='Ready', period='monthly')
+
+    def test_orders_history_data(self):
+        body = self.get('orders_history_data').json()
+        self.assertTrue(body['results'] and body['next_cursor'])
+        self.get('orders_history_data', cursor=body['next_cursor'])
+        self.get('orders_history_data', status='Canceled')
+
+    def test_inventory_history_data(self):
+        for sort in ('-date', 'item', '-value', 'type'):
+            body = self.get('inventory_history_data', sort=sort).json()
+            self.assertTrue(body['results'] and body['next_cursor'])
+            self.get('inventory_history_data', sort=sort, cursor=body['next_cursor'])
+        self.get('inventory_history_data', type='Used')
+
+    def test_pos_catalog(self):
+        self.assertTrue(self.get('pos_catalog').json())
+        self.get('pos_catalog')
+
+    def test_dashboard(self):
+        self.get('dashboard')
+        self.get('dashboard')
+
+    @override_settings(QUERY_BUDGETS={'pos_catalog': 1})
+    def test_over_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('pos_catalog'))
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class WriteQueryBudgetTests(TransactionTestCase):
+    """Submit the write paths with real commits, so on-commit work is counted like in production."""
+
+    def setUp(self):
+        cache.clear()
+        synthetic.generate(menu_items=12, ingredients=30, ingredients_per_recipe=4, orders=60, days=3, tables=4)
+        InventoryItem.objects.update(quantity=Decimal('10000.00'))
+        DTable.objects.update(is_occupied=True)
+        self.client.force_login(make_staff())
+
+    def post(self, url, data, status=302):
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def pending(self, count):
+        return list(Order.objects.filter(status='Pending').order_by('pk').values_list('pk', flat=True)[:count])
+
+    def test_pos_submit(self):
+        table = DTable.objects.first()
+        menu = list(MenuItem.objects.order_by('pk'))
+        for cart in (menu[:1], menu[:12], menu[:12]):
+            self.post(reverse('pos'), {
+                'submit-order': '1', 'table': table.pk, 'customer': 'Guest',
+                'order_items': json.dumps([{'id': mi.pk, 'quantity': 2} for mi in cart]),
+            })
+        self.assertEqual(Order.objects.filter(customer='Guest').count(), 3)
+
+    def test_orders_post(self):
+        order_id = self.pending(1)[0]
+        for action in ('start', 'ready'):
+            self.post(reverse('orders'), {'order_id': order_id, 'action': action})
+        self.post(reverse('orders'), {'order_id': self.pending(1)[0], 'action': 'cancel'})
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'Ready')
+
+    def test_order_transition(self):
+        order_id = self.pending(1)[0]
+        for action in ('start', 'ready'):
+            self.post(reverse('order_transition', args=[order_id]), {'action': action}, status=200)
+        self.post(reverse('order_transition', args=[self.pending(1)[0]]), {'action': 'cancel'}, status=200)
+
+    def test_orders_bulk_transition(self):
+        order_ids = self.pending(10)
+        for action in ('start', 'ready'):
+            body = self.post(reverse('orders_bulk_transition'), {'action': action, 'order_ids': order_ids}, status=200).json()
+            self.assertEqual(body['updated'], len(order_ids))
+        self.post(reverse('orders_bulk_transition'), {'action': 'cancel', 'order_ids': self.pending(10)}, status=200)
+
+    def test_inventory_post(self):
+        item = InventoryItem.objects.filter(recipeingredient__isnull=False).first()
+        self.post(reverse('inventory'), {'restock-item': item.pk, 'quantity': '12000', 'unit_price': item.unit_price + 100})
+        self.post(reverse('inventory'), {'restock-item': item.pk, 'quantity': '11000', 'unit_price': item.unit_price + 100})
+        self.post(reverse('inventory'), {'add-new': '1', 'name': 'Saffron', 'units': 'g', 'quantity': '50', 'unit_price': '900'})
+        self.assertTrue(InventoryItem.objects.filter(name='Saffron').exists())
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import events
+from .models import DTable, Order
+from .signals import order_status_changed
+
+# action -> (statuses it may start from, new status, timestamp it sets, frees the table)
+TRANSITIONS = {
+    'start': (('Pending',), 'Started', 'start_time', False),
+    'ready': (('Started',), 'Ready', 'completed_at', True),
+    'cancel': (('Pending', 'Started'), 'Canceled', 'completed_at', True),
+}
+
+MAX_BULK_ORDERS = 500
+
+
+class TransitionConflict(ValueError):
+    """The order is missing or no longer in a state the action applies to."""
+
+    def __init__(self, order_id, action, current_status):
+        self.order_id = order_id
+        self.action = action
+        self.current_status = current_status
+        if current_status is None:
+            message = f"Order {order_id} not found."
+        else:
+            message = f"Cannot {action} order {order_id}: it is {current_status}."
+        super().__init__(message)
+
+
+def free_tables(orders):
+    """Mark the tables of ``orders`` (a queryset) free and announce them."""
+    tables = list(DTable.objects.filter(order__in=orders, is_occupied=True).distinct())
+    DTable.objects.filter(pk__in=[t.pk for t in tables]).update(is_occupied=False)
+    for table in tables:
+        table.is_occupied = False
+        events.table_changed(table)
+
+
+def transition_order(order_id, action, expected=None):
+    """Apply ``action`` ('start', 'ready', 'cancel') to one order.
+
+    The status change is a single ``UPDATE ... WHERE status IN (...)``:
+    when two requests race, the second one matches no row and raises
+    TransitionConflict instead of overwriting. ``expected`` narrows the
+    condition to the status the caller last saw. Returns the new state.
+    """
+    if action not in TRANSITIONS:
+        raise ValueError(f"Unknown action: {action}")
+    sources, status, stamp, frees_table = TRANSITIONS[action]
+    if expected:
+        if expected not in sources:
+            raise ValueError(f"Cannot {action} an order that is {expected}.")
+        sources = (expected,)
+
+    now = timezone.now()
+    with transaction.atomic():
+        order = Order.objects.filter(pk=order_id)
+        if not order.filter(status__in=sources).update(status=status, **{stamp: now}):
+            raise TransitionConflict(order_id, action, order.values_list('status', flat=True).first())
+        if frees_table:
+            free_tables(order)
+        order_status_changed.send(sender=Order, order_ids=[order_id], status=status)
+    return {'id': order_id, 'status': status, stamp: now}
+
+
+def transition_orders(order_ids, action):
+    """Apply ``action`` to many orders in one transaction.
+
+    The orders are locked and read in one query. The ones in a valid
+    state move together with one UPDATE, and their tables are freed with
+    another. Returns a result per requested id:
+    {'id', 'result': 'ok' | 'conflict' | 'not_found', 'status'}.
+    """
+    if action not in TRANSITIONS:
+        raise ValueError(f"Unknown action: {action}")
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise ValueError(f"At most {MAX_BULK_ORDERS} orders per request.")
+    sources, status, stamp, frees_table = TRANSITIONS[action]
+
+    now = timezone.now()
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(pk__in=order_ids).values_list('id', 'status')
+        )
+        eligible = [pk for pk, s in current.items() if s in sources]
+        if eligible:
+            orders = Order.objects.filter(pk__in=eligible)
+            orders.filter(status__in=sources).update(status=status, **{stamp: now})
+            if frees_table:
+                free_tables(orders)
+            order_status_changed.send(sender=Order, order_ids=eligible, status=status)
+
+    results = []
+    for pk in order_ids:
+        if pk not in current:
+            results.append({'id': pk, 'result': 'not_found', 'status': None})
+        elif current[pk] in sources:
+            results.append({'id': pk, 'result': 'ok', 'status': status})
+        else:
+            results.append({'id': pk, 'result': 'conflict', 'status': current[pk]})
+    return results
@@ -1,13 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.views.decorators.http import require_POST
-from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Sum, Count, F, ExpressionWrapper, DecimalField
 from django.db import transaction
 from django.db.models.functions import Coalesce
+from django.core.exceptions import ValidationError
 from .models import (
     InventoryItem, DTable, MenuItem, Order, OrderItem, Requisition,
     InventoryHistory, MenuItemIngredient, Recipe, RecipeIngredient,
@@ -16,8 +19,17 @@ from .forms import (
     InventoryItemForm, UseItemForm, OrderForm, OrderItemForm,
     RecipeForm,RequisitionItemForm
 )
+from .ordering import resolve_cart, ingredient_usage, place_order
+from .stock import InsufficientStock
+from .pagination import keyset_page, page_size_from
+from .exports import HISTORY_COLUMNS, history_rows, stream_csv, xlsx_allowed, xlsx_response
+from .transitions import TransitionConflict, transition_order, transition_orders
+from .metrics import registry as metrics_registry
+from .rollups import business_date
+from . import availability, catalog, costing, dashboard, events, forecasting, menu_engineering, reports
 
 import json
+import logging
 from decimal import Decimal
 import pytz
 from reportlab.lib.pagesizes import letter
@@ -46,6 +58,7 @@ from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, TableStyle, Paragraph, Spacer
 
+logger = logging.getLogger(__name__)
 
 
 
@@ -57,13 +70,6 @@ def pos_view(request):
     timezone.activate(pytz.timezone('Africa/Nairobi'))
     tables = DTable.objects.all()
 
-    try:
-        menu_items = MenuItem.objects.select_related('recipe').all()
-    except Exception as e:
-        messages.error(request, f'Error fetching menu items: {str(e)}')
-        menu_items = []
-
-    inventory_items = InventoryItem.objects.all()
     order_form = OrderForm()
     order_item_form = OrderItemForm()
 
@@ -86,133 +92,73 @@ def pos_view(request):
             messages.error(request, 'No items provided.')
             return redirect('pos')
 
-        # === PHASE 1: VALIDATE ITEMS & INVENTORY (ROBUST NAME + ID LOOKUP) ===
-        validated_items = []
+        # === PHASE 1: RESOLVE CART & INGREDIENTS (BATCHED) ===
         try:
-            for it in items_data:
-                quantity = int(it.get('quantity', 0))
-                if quantity <= 0:
-                    raise ValueError(f"Quantity must be greater than 0, got {quantity}")
-
-                menu_item = None
-
-                # 1. Try by ID
-                menu_id = it.get('id') or it.get('menu_item_id')
-                if menu_id:
-                    menu_item = MenuItem.objects.filter(pk=menu_id).first()
-
-                # 2. Try by name (case-insensitive, strip whitespace)
-                if not menu_item:
-                    name = it.get('name', '').strip()
-                    if name:
-                        menu_item = MenuItem.objects.filter(name__iexact=name).first()
-
-                if not menu_item:
-                    raise ValueError(f"Menu item not found: '{it.get('name') or it.get('id')}'")
-
-                # 3. Validate inventory: Recipe ingredients
-                if menu_item.recipe:
-                    for ing in menu_item.recipe.ingredients.all():
-                        needed = ing.quantity * Decimal(quantity)
-                        if ing.inventory_item.quantity < needed:
-                            raise ValueError(
-                                f"Not enough {ing.inventory_item.name}: "
-                                f"{needed} needed, only {ing.inventory_item.quantity} available"
-                            )
-
-                # 4. Validate inventory: Direct MenuItem ingredients
-                for ing in menu_item.menuitemingredient_set.all():
-                    needed = ing.quantity_needed * Decimal(quantity)
-                    if ing.inventory_item.quantity < needed:
-                        raise ValueError(
-                            f"Not enough {ing.inventory_item.name}: "
-                            f"{needed} needed, only {ing.inventory_item.quantity} available"
-                        )
-
-                validated_items.append((menu_item, quantity))
-
+            lines = resolve_cart(items_data)
+            usage = ingredient_usage(lines)
         except Exception as e:
             messages.error(request, f"Order validation failed: {str(e)}")
             print(f"[ORDER VALIDATION ERROR] {e}")
             return redirect('pos')
 
-        # === PHASE 2: SAVE ORDER & DEDUCT INVENTORY ===
+        # === PHASE 2: RESERVE STOCK, SAVE ORDER (ONE TRANSACTION) ===
         try:
-            with transaction.atomic():
-                order = order_form.save(commit=False)
-                order.status = 'Pending'
-                order.total_price = Decimal('0.00')
-                order.save()  # Save to get order.id
-
-                # Create OrderItems (total_price calculated in OrderItem.save())
-                for menu_item, quantity in validated_items:
-                    OrderItem.objects.create(
-                        order=order,
-                        menu_item=menu_item,
-                        quantity=quantity
-                    )
-
-                # Recompute total from OrderItems (signal will also do this)
-                total = OrderItem.objects.filter(order=order).aggregate(
-                    t=Sum('total_price')
-                )['t'] or Decimal('0.00')
-                order.total_price = total
-                order.save(update_fields=['total_price'])
-
-                # Deduct inventory
-                for menu_item, quantity in validated_items:
-                    # Recipe ingredients
-                    if menu_item.recipe:
-                        for ing in menu_item.recipe.ingredients.all():
-                            needed = ing.quantity * Decimal(quantity)
-                            inv = ing.inventory_item
-                            inv.quantity -= needed
-                            inv.save()
-                            InventoryHistory.objects.create(
-                                item=inv,
-                                units=inv.units,
-                                quantity=needed,
-                                unit_price=inv.unit_price,
-                                reason=f'Used for {menu_item.name} in order {order.order_number}',
-                                change_type='Used'
-                            )
-                    # Direct ingredients
-                    for ing in menu_item.menuitemingredient_set.all():
-                        needed = ing.quantity_needed * Decimal(quantity)
-                        inv = ing.inventory_item
-                        inv.quantity -= needed
-                        inv.save()
-                        InventoryHistory.objects.create(
-                            item=inv,
-                            units=inv.units,
-                            quantity=needed,
-                            unit_price=inv.unit_price,
-                            reason=f'Used for {menu_item.name} in order {order.order_number}',
-                            change_type='Used'
-                        )
-
-                # Mark table as occupied
-                if order.table:
-                    order.table.is_occupied = True
-                    order.table.save()
-
+            order = place_order(order_form.save(commit=False), lines, usage)
             messages.success(request, f'Order {order.order_number} submitted successfully!')
             return redirect('pos')
 
+        except InsufficientStock as e:
+            messages.error(request, f"Order validation failed: {str(e)}")
+            logger.warning("Order rejected: %s", e)
+            return redirect('pos')
         except Exception as e:
             messages.error(request, f'Error saving order: {str(e)}')
             print(f"[ORDER SAVE ERROR] {e}")
             return redirect('pos')
 
+    # Menu comes from the cached catalog; terminals refresh it via pos_catalog
+    # (only when rendering; order submissions redirect)
+    try:
+        menu_catalog = catalog.get_catalog()
+        menu_items = menu_catalog['data']['items']
+        catalog_etag = menu_catalog['etag']
+    except Exception as e:
+        messages.error(request, f'Error fetching menu items: {str(e)}')
+        menu_items, catalog_etag = [], ''
+
     return render(request, 'pos.html', {
         'tables': tables,
         'menu_items': menu_items,
-        'inventory_items': inventory_items,
+        'catalog_etag': catalog_etag,
+        'catalog_poll_seconds': getattr(settings, 'POS_CATALOG_POLL_SECONDS', 60),
+        'availability_poll_seconds': getattr(settings, 'POS_AVAILABILITY_POLL_SECONDS', 10),
         'order_form': order_form,
         'order_item_form': order_item_form
     })
 
 
+# ------------------- POS CATALOG (JSON, ETag) -------------------
+@login_required
+@require_GET
+@condition(etag_func=lambda request: catalog.get_catalog()['etag'])
+def pos_catalog(request):
+    response = HttpResponse(catalog.get_catalog()['body'], content_type='application/json')
+    # Let terminals keep a copy but revalidate it with If-None-Match every poll
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# ------------------- POS AVAILABILITY (JSON, ETag) -------------------
+@login_required
+@require_GET
+@condition(etag_func=lambda request: availability.etag())
+def pos_availability(request):
+    portions = availability.snapshot()
+    response = JsonResponse({str(menu_id): value for menu_id, value in portions.items()})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # ------------------- INVENTORY -------------------
 # ------------------- INVENTORY (RESTOCK + PRICE UPDATE) -------------------
 @login_required
@@ -221,10 +167,6 @@ def inventory_view(request):
 
     timezone.activate(pytz.timezone('Africa/Nairobi'))
     items = InventoryItem.objects.all().order_by('name')
-    total_cost = items.aggregate(
-        total=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField()))
-    )['total'] or Decimal('0.00')
-
     form = InventoryItemForm()
 
     # === EXPORT CURRENT STOCK ===
@@ -255,39 +197,11 @@ def inventory_view(request):
             df.to_csv(response, index=False)
         return response
 
-    # === HISTORY DATA (for History Tab) ===
-    history = InventoryHistory.objects.select_related('item').all().order_by('-timestamp')
+    # === HISTORY FILTERS (rows are loaded by inventory_history_data) ===
     start = request.GET.get('start_date')
     end = request.GET.get('end_date')
     item_id = request.GET.get('item')
 
-    if start:
-        history = history.filter(timestamp__date__gte=start)
-    if end:
-        history = history.filter(timestamp__date__lte=end)
-    if item_id:
-        history = history.filter(item_id=item_id)
-
-    hist_data = []
-    for h in history:
-        hist_data.append({
-            'Date': h.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'Item': h.item.name,
-            'Qty': float(h.quantity),
-            'Units': h.units,
-            'Price': float(h.unit_price),
-            'Value': float(h.quantity * h.unit_price),
-            'Type': h.change_type,
-            'Reason': h.reason or 'Manual'
-        })
-    expected_cols = ['Date', 'Item', 'Qty', 'Units', 'Price', 'Value', 'Type', 'Reason']
-    if hist_data:
-         hist_df = pd.DataFrame(hist_data)[expected_cols]
-    else:
-         hist_df = pd.DataFrame(columns=expected_cols)
-    # hist_df = pd.DataFrame(hist_data)
-    # hist_df = hist_df[['Date', 'Item', 'Qty', 'Units', 'Price', 'Value', 'Type', 'Reason']]
-
     # === FORM HANDLING ===
     if request.method == 'POST':
         if 'add-new' in request.POST:
@@ -315,6 +229,8 @@ def inventory_view(request):
                 item.quantity = Decimal(request.POST.get('quantity'))
                 item.unit_price = Decimal(request.POST.get('unit_price'))
                 item.save()
+                if item.unit_price != old_price:
+                    costing.propagate_price_change([item.id])
 
                 change_qty = abs(item.quantity - old_qty)
                 change_type = 'Added' if item.quantity > old_qty else 'Adjusted'
@@ -327,9 +243,11 @@ def inventory_view(request):
                 messages.error(request, f'Error: {str(e)}')
             return redirect('inventory')
 
+    total_cost = items.aggregate(
+        total=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField()))
+    )['total'] or Decimal('0.00')
     return render(request, 'inventory.html', {
         'items': items, 'total_cost': total_cost, 'form': form,
-        'history_html': hist_df.to_html(classes='table table-sm table-bordered', index=False),
         'start': start, 'end': end, 'item_id': item_id
     })
 # ------------------- GET INVENTORY ITEM (AJAX) -------------------
@@ -348,18 +266,12 @@ def get_inventory_item(request, item_id):
 
 
 # ------------------- INVENTORY HISTORY -------------------
-@login_required
-def inventory_history_view(request):
-    import pandas as pd
-    from django.http import HttpResponse
-
-    history = InventoryHistory.objects.select_related('item').all().order_by('-timestamp')
-    items = InventoryItem.objects.all()
-
+def _filtered_history(request):
+    """InventoryHistory filtered by the start_date / end_date / item GET params."""
+    history = InventoryHistory.objects.all()
     start = request.GET.get('start_date')
     end = request.GET.get('end_date')
     item_id = request.GET.get('item')
-    export = request.GET.get('export')
 
     if start:
         history = history.filter(timestamp__date__gte=start)
@@ -367,43 +279,85 @@ def inventory_history_view(request):
         history = history.filter(timestamp__date__lte=end)
     if item_id:
         history = history.filter(item_id=item_id)
+    return history, start, end, item_id
 
-    # === PANDAS TABLE ===
-    data = []
-    for h in history:
-        data.append({
-            'Date': h.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'Item': h.item.name,
-            'Qty': float(h.quantity),
-            'Units': h.units,
-            'Price': float(h.unit_price),
-            'Value': float(h.quantity * h.unit_price),
-            'Type': h.change_type,
-            'Reason': h.reason or 'Manual'
-        })
-    df = pd.DataFrame(data)
-    df = df[['Date', 'Item', 'Qty', 'Units', 'Price', 'Value', 'Type', 'Reason']]
 
+@login_required
+def inventory_history_view(request):
+    items = InventoryItem.objects.all()
+    history, start, end, item_id = _filtered_history(request)
+    history = history.order_by('-timestamp')
+    export = request.GET.get('export')
+
+    # === EXPORT (CSV streams; large Excel requests fall back to CSV) ===
+    if export == 'excel' and xlsx_allowed(history.count()):
+        return xlsx_response('inventory_history.xlsx', HISTORY_COLUMNS, history_rows(history))
     if export in ['csv', 'excel']:
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            if export == 'excel' else 'text/csv'
-        )
-        response['Content-Disposition'] = f'attachment; filename="inventory_history.{export}"'
-        with pd.ExcelWriter(response, engine='openpyxl') if export == 'excel' else open(response, 'w') as f:
-            if export == 'excel':
-                df.to_excel(f, index=False)
-            else:
-                df.to_csv(f, index=False)
-        return response
+        return stream_csv('inventory_history.csv', HISTORY_COLUMNS, history_rows(history))
 
+    # Rows are loaded page by page from inventory_history_data
     return render(request, 'inventory_history.html', {
-        'history_html': df.to_html(classes='table table-sm table-bordered', index=False),
         'items': items,
         'start': start, 'end': end, 'item_id': item_id
     })
 
 
+# ------------------- INVENTORY HISTORY DATA (AJAX) -------------------
+HISTORY_SORTS = {
+    'date': 'timestamp',
+    'item': 'item__name',
+    'qty': 'quantity',
+    'price': 'unit_price',
+    'value': 'value',
+    'type': 'change_type',
+}
+
+
+@login_required
+def inventory_history_data(request):
+    history, start, end, item_id = _filtered_history(request)
+    change_type = request.GET.get('type')
+    if change_type in dict(InventoryHistory.CHANGE_TYPES):
+        history = history.filter(change_type=change_type)
+
+    sort = request.GET.get('sort', '-date')
+    descending = sort.startswith('-')
+    field = HISTORY_SORTS.get(sort.lstrip('-'))
+    if not field:
+        return JsonResponse({'error': f'Unknown sort: {sort}'}, status=400)
+    prefix = '-' if descending else ''
+    ordering = [prefix + field, prefix + 'id']
+
+    rows = history.annotate(
+        value=ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField())
+    ).values(
+        'id', 'timestamp', 'item__name', 'quantity', 'units', 'unit_price', 'value', 'change_type', 'reason'
+    )
+    try:
+        rows, next_cursor = keyset_page(
+            rows, ordering, cursor=request.GET.get('cursor'), page_size=page_size_from(request)
+        )
+    except (ValidationError, TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    tz = pytz.timezone('Africa/Nairobi')
+    results = [
+        {
+            'id': r['id'],
+            'date': r['timestamp'].astimezone(tz).strftime('%Y-%m-%d %H:%M'),
+            'item': r['item__name'],
+            'qty': float(r['quantity']),
+            'units': r['units'],
+            'price': float(r['unit_price']),
+            'value': float(r['value']),
+            'type': r['change_type'],
+            'reason': r['reason'] or 'Manual',
+        }
+        for r in rows
+    ]
+    return JsonResponse({'results': results, 'next_cursor': next_cursor, 'sort': sort})
+
+
 # ------------------- RECIPES -------------------
 @login_required
 def recipes_view(request):
@@ -621,56 +575,204 @@ def add_recipe_ingredients(request):
 
 
 # ------------------- ORDERS VIEW -------------------
+HISTORY_ORDERING = ['-timestamp', '-id']
+
+
+def _filtered_history_orders(request):
+    """Apply the history filters (status, table, date range) from GET.
+
+    Returns the unevaluated queryset plus the parsed filter values; callers
+    paginate it with keyset_page() so only one page is ever loaded.
+    """
+    orders = Order.objects.all()
+    status = request.GET.get('status', '')
+    table_id = request.GET.get('table', '')
+    period = request.GET.get('period', 'weekly')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    errors = []
+
+    if status in dict(Order.STATUS_CHOICES):
+        orders = orders.filter(status=status)
+    else:
+        status = ''
+    if table_id.isdigit():
+        orders = orders.filter(table_id=table_id)
+    else:
+        table_id = ''
+
+    tz = timezone.get_current_timezone()
+    try:
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=tz)
+            orders = orders.filter(timestamp__gte=start_date)
+        if end_date:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').replace(tzinfo=tz)
+            orders = orders.filter(timestamp__lt=end_date + timedelta(days=1))
+        elif start_date:
+            orders = orders.filter(timestamp__lte=start_date + timedelta(days=6 if period == 'weekly' else 30))
+    except ValueError:
+        errors.append('Invalid date format.')
+        start_date = end_date = None
+
+    filters = {
+        'status': status,
+        'table': table_id,
+        'period': period,
+        'start_date': start_date.strftime('%Y-%m-%d') if start_date else '',
+        'end_date': end_date.strftime('%Y-%m-%d') if end_date else '',
+    }
+    return orders, filters, errors
+
+
+def _prevailing_orders():
+    return (
+        Order.objects.filter(status__in=['Pending', 'Started'])
+        .select_related('table')
+        .prefetch_related('items__menu_item')
+        .order_by('-timestamp')
+    )
+
+
 @login_required
 def orders_view(request):
     timezone.activate(pytz.timezone('Africa/Nairobi'))
-    prevailing_orders = Order.objects.filter(status__in=['Pending', 'Started']).prefetch_related('items__menu_item').order_by('-timestamp')
-    history_orders = Order.objects.prefetch_related('items__menu_item').all().order_by('-timestamp')
-    start_date = request.GET.get('start_date')
-    period = request.GET.get('period', 'weekly')
+    prevailing_orders = _prevailing_orders()
 
     if request.method == 'POST':
         order_id = request.POST.get('order_id')
         action = request.POST.get('action')
         try:
-            order = Order.objects.get(id=order_id)
-            if action == 'start' and order.status == 'Pending':
-                order.status = 'Started'
-                order.start_time = timezone.now()
-            elif action == 'ready' and order.status == 'Started':
-                order.status = 'Ready'
-                order.completed_at = timezone.now()
-                if order.table:
-                    order.table.is_occupied = False
-                    order.table.save()
-            elif action == 'cancel' and order.status in ['Pending', 'Started']:
-                order.status = 'Canceled'
-                order.completed_at = timezone.now()
-                if order.table:
-                    order.table.is_occupied = False
-                    order.table.save()
-            order.save()
-            messages.success(request, f'Order {order.order_number} updated.')
-        except Order.DoesNotExist:
-            messages.error(request, 'Order not found.')
+            transition_order(int(order_id), action)
+            order_number = Order.objects.filter(pk=order_id).values_list('order_number', flat=True).first()
+            messages.success(request, f'Order {order_number} updated.')
+        except TransitionConflict as e:
+            messages.error(request, str(e))
+        except (TypeError, ValueError):
+            messages.error(request, 'Invalid order action.')
         return redirect('orders')
 
-    if start_date:
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=timezone.get_current_timezone())
-            end_date = start_date + timedelta(days=6 if period == 'weekly' else 30)
-            history_orders = history_orders.filter(timestamp__range=[start_date, end_date])
-        except ValueError:
-            messages.error(request, 'Invalid date format.')
+    history_orders, filters, errors = _filtered_history_orders(request)
+    for error in errors:
+        messages.error(request, error)
+
+    # Only the visible page is loaded and prefetched
+    history_orders = history_orders.select_related('table').prefetch_related('items__menu_item')
+    try:
+        history_orders, next_cursor = keyset_page(
+            history_orders, HISTORY_ORDERING, cursor=request.GET.get('cursor'), page_size=page_size_from(request),
+        )
+    except (ValidationError, TypeError, ValueError):
+        # a tampered cursor: start again from the first page
+        messages.error(request, 'Invalid page link; showing the first page.')
+        history_orders, next_cursor = keyset_page(history_orders, HISTORY_ORDERING, page_size=page_size_from(request))
+
+    next_query = request.GET.copy()
+    next_query['cursor'] = next_cursor or ''
+    first_query = request.GET.copy()
+    first_query.pop('cursor', None)
 
     return render(request, 'orders.html', {
         'prevailing_orders': prevailing_orders,
         'history_orders': history_orders,
-        'start_date': start_date.strftime('%Y-%m-%d') if start_date else '',
-        'period': period,
+        'tables': DTable.objects.order_by('name'),
+        'status_choices': Order.STATUS_CHOICES,
+        'next_page': next_query.urlencode() if next_cursor else '',
+        'first_page': first_query.urlencode(),
+        'paged': bool(request.GET.get('cursor')),
+        **filters,
     })
 
 
+# ------------------- ORDER TRANSITION (AJAX) -------------------
+@login_required
+@require_POST
+def order_transition(request, order_id):
+    try:
+        state = transition_order(order_id, request.POST.get('action'), expected=request.POST.get('expected'))
+    except TransitionConflict as e:
+        return JsonResponse(
+            {'status': 'error', 'message': str(e), 'current_status': e.current_status},
+            status=404 if e.current_status is None else 409,
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'order': state})
+
+
+# ------------------- BULK ORDER TRANSITION (AJAX) -------------------
+@login_required
+@require_POST
+def orders_bulk_transition(request):
+    try:
+        order_ids = [int(pk) for pk in request.POST.getlist('order_ids')]
+        results = transition_orders(order_ids, request.POST.get('action'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    updated = sum(1 for r in results if r['result'] == 'ok')
+    return JsonResponse({'status': 'success', 'updated': updated, 'results': results})
+
+
+# ------------------- ACTIVE ORDERS (PARTIAL) -------------------
+@login_required
+def active_orders(request):
+    # Re-fetched by the kitchen screen when the event stream reports a change
+    return render(request, 'active_orders_rows.html', {'prevailing_orders': _prevailing_orders()})
+
+
+# ------------------- LIVE EVENTS (SSE) -------------------
+@login_required
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the whole stream; 204 tells
+        # EventSource not to reconnect and the pages fall back to reloads.
+        return HttpResponse(status=204)
+    topics = set(request.GET.get('topics', 'orders,tables').split(',')) & events.TOPICS
+    response = StreamingHttpResponse(events.stream(topics), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ------------------- ORDERS HISTORY DATA (AJAX) -------------------
+@login_required
+def orders_history_data(request):
+    orders, filters, errors = _filtered_history_orders(request)
+    if errors:
+        return JsonResponse({'error': errors[0]}, status=400)
+
+    try:
+        orders, next_cursor = keyset_page(
+            orders.select_related('table').prefetch_related('items__menu_item'),
+            HISTORY_ORDERING,
+            cursor=request.GET.get('cursor'),
+            page_size=page_size_from(request),
+        )
+    except (ValidationError, TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+    results = [
+        {
+            'id': order.id,
+            'order_number': order.order_number,
+            'customer': order.customer,
+            'table': order.table.name if order.table else None,
+            'status': order.status,
+            'total_price': float(order.total_price),
+            'timestamp': order.timestamp.isoformat(),
+            'items': [
+                {
+                    'name': item.menu_item.name,
+                    'quantity': item.quantity,
+                    'total_price': float(item.total_price),
+                }
+                for item in order.items.all()
+            ],
+        }
+        for order in orders
+    ]
+    return JsonResponse({'results': results, 'next_cursor': next_cursor, 'filters': filters})
+
+
 # ------------------- REQUISITIONS -------------------
 
 @login_required
@@ -770,18 +872,18 @@ def requisitions_view(request):
     #         messages.error(request, "Add items first.")
     #     return redirect('requisitions')
 
-    pending = Requisition.objects.filter(is_archived=False).prefetch_related('history__user', 'items')
+    pending = Requisition.objects.filter(is_archived=False).select_related('user').prefetch_related('history__user', 'items')
     approved = Requisition.objects.filter(
         is_archived=True,
         operations_manager_approval='Approved',
         finance_approval='Approved',
         director_approval='Approved'
-    ).prefetch_related('history__user', 'items')
+    ).select_related('user').prefetch_related('history__user', 'items')
     rejected = Requisition.objects.filter(is_archived=True).exclude(
         operations_manager_approval='Approved',
         finance_approval='Approved',
         director_approval='Approved'
-    ).prefetch_related('history__user', 'items')
+    ).select_related('user').prefetch_related('history__user', 'items')
 
     context = {
         'form': form,
@@ -790,6 +892,8 @@ def requisitions_view(request):
         'pending_requisitions': pending,
         'approved_requisitions': approved,
         'rejected_requisitions': rejected,
+        # precomputed nightly by forecast_demand; shortfall is against current stock
+        'reorder_suggestions': forecasting.suggestions(),
         'approval_fields': {
             'operations_manager_approval': 'Ops Mgr',
             'finance_approval': 'Finance',
@@ -932,6 +1036,34 @@ def requisition_add_item(request):
 #         messages.error(request, "Error submitting requisition.")
 #     return redirect('requisitions')
 
+@login_required
+@require_POST
+def requisition_prefill(request):
+    # Add the selected reorder suggestions to the user's draft (creating it if needed)
+    item_ids = [int(i) for i in request.POST.getlist('item_ids') if i.isdigit()]
+    if not item_ids:
+        messages.error(request, "Select at least one suggested item.")
+        return redirect('requisitions')
+
+    with transaction.atomic():
+        draft_id = request.session.get('requisition_draft')
+        draft = None
+        if draft_id:
+            draft = Requisition.objects.filter(id=draft_id, user=request.user, is_archived=False).exclude(
+                history__action='submit'
+            ).first()
+        if not draft:
+            draft = Requisition.objects.create(user=request.user)
+            request.session['requisition_draft'] = draft.id
+        added = forecasting.prefill(draft, item_ids)
+
+    if added:
+        messages.success(request, f"Added {len(added)} suggested item(s) to {draft.requisition_number}.")
+    else:
+        messages.info(request, "The selected items are already on the draft or no longer below par.")
+    return redirect('requisitions')
+
+
 @login_required
 @require_POST
 def requisition_submit(request):
@@ -1135,103 +1267,81 @@ def get_inventory_items(request):
 
 @login_required
 def dashboard_view(request):
-    today = datetime.today()
-    current_year = today.year
-    current_month = today.month
-    current_month_name = today.strftime('%B')
-
-    # ---------- CURRENT MONTH ----------
-    current_orders = Order.objects.filter(
-        status='Ready',
-        timestamp__year=current_year,
-        timestamp__month=current_month
-    ).count()
-
-    current_revenue = Order.objects.filter(
-        status='Ready',
-        timestamp__year=current_year,
-        timestamp__month=current_month
-    ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-
-    current_expense = InventoryHistory.objects.filter(
-        change_type='Added',
-        # reason__contains='order',
-        timestamp__year=current_year,
-        timestamp__month=current_month
-    ).aggregate(
-        total=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField()))
-    )['total'] or Decimal('0.00')
+    # rollups are bucketed by business date, so the month must be too
+    context = dashboard.get_context(business_date(timezone.now()))
+    return render(request, 'dashboard.html', context)
 
-    current_profit = current_revenue - current_expense
 
-    # ---------- LAST 3 YEARS ----------
-    years = [current_year - 2, current_year - 1, current_year]
+# ------------------- PROFIT & COGS REPORT -------------------
+REPORT_MAX_DAYS = 366
 
-    revenue_data = {y: [0.0] * 12 for y in years}
-    orders_data  = {y: [0]   * 12 for y in years}
-    expense_data = {y: [0.0] * 12 for y in years}
 
-    # Revenue & Orders
-    sales = (
-        Order.objects.filter(status='Ready', timestamp__year__in=years)
-        .annotate(year=ExtractYear('timestamp'), month=ExtractMonth('timestamp'))
-        .values('year', 'month')
-        .annotate(revenue=Sum('total_price'), count=Count('id'))
-        .order_by('year', 'month')
-    )
-    for s in sales:
-        y, m = s['year'], s['month'] - 1
-        revenue_data[y][m] = float(s['revenue'] or 0)
-        orders_data[y][m]  = s['count']
-
-    # Expense
-    expenses = (
-        InventoryHistory.objects.filter(
-            change_type='Added',
-            # reason__contains='order',
-            timestamp__year__in=years
-        )
-        .annotate(year=ExtractYear('timestamp'), month=ExtractMonth('timestamp'))
-        .values('year', 'month')
-        .annotate(cost=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField())))
-        .order_by('year', 'month')
-    )
-    for e in expenses:
-        y, m = e['year'], e['month'] - 1
-        expense_data[y][m] = float(e['cost'] or 0)
-
-    # ---------- TOP 5 MENU ITEMS (current year) ----------
-    top_items = (
-        OrderItem.objects.filter(
-            order__status='Ready',
-            order__timestamp__year=current_year
-        )
-        .values('menu_item__name')
-        .annotate(total_qty=Sum('quantity'), total_sales=Sum('total_price'))
-        .order_by('-total_sales')[:5]
-    )
-    top_items_list = [
-        {
-            'name': i['menu_item__name'],
-            'quantity': i['total_qty'],
-            'sales': float(i['total_sales'] or 0)
-        }
-        for i in top_items
-    ]
+def _report_period(request):
+    """Parse start_date / end_date (YYYY-MM-DD); defaults to this month so far."""
+    today = business_date(timezone.now())
+    start, end = today.replace(day=1), today
+    try:
+        if request.GET.get('start_date'):
+            start = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date()
+        if request.GET.get('end_date'):
+            end = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date()
+    except ValueError:
+        return today.replace(day=1), today, 'Invalid date format.'
+    if end < start:
+        return today.replace(day=1), today, 'End date is before start date.'
+    if (end - start).days >= REPORT_MAX_DAYS:
+        return today.replace(day=1), today, f'Pick at most {REPORT_MAX_DAYS} days; use the profit_report command for longer ranges.'
+    return start, end, None
 
-    # ---------- CONTEXT ----------
-    context = {
-        'current_year': current_year,
-        'current_month': current_month_name,
-        'current_revenue': current_revenue,
-        'current_orders': current_orders,
-        'current_expense': current_expense,
-        'current_profit': current_profit,
-        'years': json.dumps(years),
-        'revenue_data': json.dumps(revenue_data),
-        'orders_data': json.dumps(orders_data),
-        'expense_data': json.dumps(expense_data),
-        'top_items': top_items_list,
-    }
 
-    return render(request, 'dashboard.html', context)
\ No newline at end of file
+@login_required
+def reports_view(request):
+    start, end, error = _report_period(request)
+    if error:
+        messages.error(request, error)
+    report = reports.build(start, end)
+
+    export = request.GET.get('export')
+    level = request.GET.get('level', 'menu_items')
+    if export in ['csv', 'excel'] and level in reports.LEVELS:
+        frame = report[level]
+        rows = ([v if v is not None else '' for v in row.values()] for row in reports.records(frame))
+        filename = f"profit_{level}_{start:%Y%m%d}_{end:%Y%m%d}"
+        if export == 'excel' and xlsx_allowed(len(frame)):
+            return xlsx_response(f'{filename}.xlsx', list(frame.columns), rows)
+        return stream_csv(f'{filename}.csv', list(frame.columns), rows)
+
+    return render(request, 'reports.html', {
+        'summary': report['summary'],
+        'categories': reports.records(report['categories']),
+        'menu_items': reports.records(report['menu_items']),
+        'days': reports.records(report['days']),
+        # orders whose ingredients cost the largest share of their price
+        'worst_orders': reports.records(
+            report['orders'].sort_values('actual_food_cost_pct', ascending=False).head(20)
+        ),
+        'start_date': start.strftime('%Y-%m-%d'),
+        'end_date': end.strftime('%Y-%m-%d'),
+        'levels': reports.LEVELS,
+    })
+
+
+# ------------------- MENU ENGINEERING -------------------
+@login_required
+@require_GET
+def menu_engineering_view(request):
+    # Same start_date / end_date parameters and limits as the profit report
+    start, end, error = _report_period(request)
+    if error:
+        return JsonResponse({'status': 'error', 'message': error}, status=400)
+    return JsonResponse({'status': 'success', **menu_engineering.get_analysis(start, end)})
+
+
+# ------------------- METRICS (PROMETHEUS) -------------------
+@require_GET
+def metrics_view(request):
+    # Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; staff can view it in a browser
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not (token and request.headers.get('Authorization') == f'Bearer {token}') and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -64,6 +64,7 @@ AUTH_USER_MODEL = 'myapp.CustomUser'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'myapp.middleware.QueryMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -135,6 +136,106 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Order numbering: numbers are leased to each worker in blocks so
+# concurrent POS submissions never contend on one counter row.
+# ORDER_NUMBER_PREFIX can carry a branch code (e.g. 'KLA-ORD');
+# ORDER_NUMBER_DAILY restarts numbering every day (ORD-20250101-0001).
+ORDER_NUMBER_PREFIX = 'ORD'
+ORDER_NUMBER_DAILY = False
+ORDER_NUMBER_BLOCK_SIZE = 20
+
+# Requisition numbering uses the same block leasing. Requisition numbers
+# are printed on approval documents, so the default of 1 keeps them
+# gapless and in creation order: the counter row is updated inside the
+# transaction that creates the requisition and stays locked until it
+# commits (requisitions are created one at a time, so this is cheap).
+# A larger block avoids that lock but numbers become gap-tolerant and
+# out of order across workers (cached numbers are skipped on restart).
+# Run `manage.py reconcile_counters` after imports or restores.
+REQUISITION_NUMBER_BLOCK_SIZE = 1
+
+# Cache. Local memory is per process; with several gunicorn workers use a
+# shared backend (Redis/Memcached) so dashboard invalidation reaches all.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Dashboard payloads are cached per month and invalidated when an order
+# becomes Ready or stock is added; the timeout bounds staleness anyway.
+# With stale-while-revalidate on, a stale payload is served while one
+# background thread rebuilds it.
+DASHBOARD_CACHE_TIMEOUT = 300
+DASHBOARD_CACHE_STALE_WHILE_REVALIDATE = True
+
+# Excel exports are built in full before anything is sent (an .xlsx is a
+# zip archive); larger exports are streamed as CSV instead.
+XLSX_EXPORT_MAX_ROWS = 50000
+
+# When an ingredient's unit price changes, affected recipes are recosted;
+# set to False to keep manually set menu prices instead of repricing them.
+RECIPE_REPRICE_MENU_ITEMS = True
+
+# POS menu catalog: rebuilt when menu, recipe or stock data changes; the
+# timeout is only a safety net for writes that bypass invalidation.
+POS_CATALOG_CACHE_TIMEOUT = 600
+POS_CATALOG_POLL_SECONDS = 60
+POS_AVAILABILITY_POLL_SECONDS = 10
+
+# Menu engineering analyses are cached per date range and invalidated when
+# prices, recipe costs or rollups change; ranges reaching today still gain
+# sales, so they use the short live timeout.
+MENU_ENGINEERING_CACHE_TIMEOUT = 86400
+MENU_ENGINEERING_LIVE_TIMEOUT = 60
+
+# Reorder suggestions (forecast_demand, run nightly): daily 'Used' quantities
+# over FORECAST_HISTORY_DAYS are smoothed with a weekday-seasonal model; par
+# level = forecast usage over REORDER_COVER_DAYS + REORDER_SAFETY_FACTOR
+# standard deviations of daily usage (1.65 ~ 95% of cover periods).
+FORECAST_HISTORY_DAYS = 56
+FORECAST_SMOOTHING = 0.3
+REORDER_COVER_DAYS = 7
+REORDER_SAFETY_FACTOR = 1.65
+
+# Live order/table events for kitchen and floor screens (/events/, served
+# by the ASGI app). LocalBroker only reaches streams in the same process;
+# with several workers use 'myapp.events.PostgresBroker' (LISTEN/NOTIFY).
+EVENT_BROKER = 'myapp.events.LocalBroker'
+EVENT_STREAM_HEARTBEAT = 15
+
+# Per-request query/latency instrumentation (myapp/middleware.py), served
+# in Prometheus format at /metrics/. Budgets are max SQL queries per URL
+# name ("name:METHOD" for one method); over-budget requests are logged,
+# or raise with QUERY_BUDGET_ACTION = 'raise' (use that in test settings).
+QUERY_METRICS_HEADERS = DEBUG
+QUERY_BUDGET_ACTION = 'log'
+QUERY_BUDGETS = {
+    'home': 5,
+    'pos': 5,
+    # the first order of each ORDER_NUMBER_BLOCK_SIZE also leases a block
+    'home:POST': 28,
+    'pos:POST': 28,
+    'pos_catalog': 4,
+    'pos_availability': 4,
+    'orders': 9,
+    'orders:POST': 11,
+    'active_orders': 5,
+    'order_transition': 10,
+    'orders_bulk_transition': 11,
+    'orders_history_data': 5,
+    'inventory': 4,
+    'inventory:POST': 24,
+    'inventory_history_data': 3,
+    'recipes': 7,
+    'requisitions': 19,
+    'requisition_prefill': 20,
+    'dashboard': 7,
+    'reports': 6,
+    'menu_engineering': 4,
+}
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
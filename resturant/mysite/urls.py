@@ -8,13 +8,21 @@ urlpatterns = [
     # Home / POS
     path('', views.pos_view, name='home'),
     path('pos/', views.pos_view, name='pos'),
+    path('pos/catalog/', views.pos_catalog, name='pos_catalog'),
+    path('pos/availability/', views.pos_availability, name='pos_availability'),
+    path('events/', views.event_stream, name='event_stream'),
 
     # Orders
     path('orders/', views.orders_view, name='orders'),
+    path('orders/active/', views.active_orders, name='active_orders'),
+    path('orders/transition/', views.orders_bulk_transition, name='orders_bulk_transition'),
+    path('orders/<int:order_id>/transition/', views.order_transition, name='order_transition'),
+    path('orders/history/data/', views.orders_history_data, name='orders_history_data'),
 
     # Inventory
     path('inventory/', views.inventory_view, name='inventory'),
     path('inventory/history/', views.inventory_history_view, name='inventory_history'),
+    path('inventory/history/data/', views.inventory_history_data, name='inventory_history_data'),
     path('get-inventory/<int:item_id>/', views.get_inventory_item, name='get_inventory_item'),  # ADD THIS
 
     # Recipes
@@ -30,12 +38,16 @@ urlpatterns = [
     path('requisition/<int:requisition_id>/pdf/', views.requisition_pdf, name='requisition_pdf'),
     path('requisition/add_item/', views.requisition_add_item, name='requisition_add_item'),
     path('requisitions/submit/', views.requisition_submit, name='requisition_submit'),
+    path('requisitions/prefill/', views.requisition_prefill, name='requisition_prefill'),
 
 
     # Table AJAX updates
     path('table/update/', views.update_table_status, name='update_table_status'),
 
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('reports/', views.reports_view, name='reports'),
+    path('reports/menu-engineering/', views.menu_engineering_view, name='menu_engineering'),
+    path('metrics/', views.metrics_view, name='metrics'),
 
     # User accounts
     path('accounts/', include('allauth.urls')),